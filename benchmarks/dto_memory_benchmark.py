@@ -0,0 +1,130 @@
+'''
+Memory and allocation benchmark for the printer object DTOs and the PrinterSnapshot.
+
+Applies a stream of typical status updates while printing (file position, print duration, gcode position) with
+`updateWith`, takes a snapshot after every update and keeps the last snapshots queued, like a backlog of
+evaluations. Reports the retained heap per snapshot and the allocations per update measured with tracemalloc.
+
+Usage:
+    python -m benchmarks.dto_memory_benchmark [--updates 5000] [--retained 1000]
+'''
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List
+
+from mobileraker.data.dtos.moonraker.printer_objects import (DisplayStatus, FilamentSensor, GCodeFile, GCodeMove,
+                                                             PrintStats, Toolhead, VirtualSDCard)
+from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
+
+
+class PrinterState:
+    '''
+    The printer objects of a DataSyncService, without the websocket.
+    '''
+
+    def __init__(self) -> None:
+        self.print_stats = PrintStats(filename='benchy.gcode', state='printing')
+        self.virtual_sdcard = VirtualSDCard()
+        self.display_status = DisplayStatus()
+        self.toolhead = Toolhead()
+        self.gcode_move = GCodeMove()
+        self.current_file = GCodeFile(filename='benchy.gcode', gcode_start_byte=1000, gcode_end_byte=1001000,
+                                      estimated_time=4000, filament_total=5200, layer_count=120)
+        self.filament_sensors = {'runout': FilamentSensor('runout', 'filament_switch_sensor', enabled=True)}
+
+    def apply(self, status: Dict[str, Any]) -> None:
+        if 'virtual_sdcard' in status:
+            self.virtual_sdcard = self.virtual_sdcard.updateWith(status['virtual_sdcard'])
+        if 'print_stats' in status:
+            self.print_stats = self.print_stats.updateWith(status['print_stats'])
+        if 'gcode_move' in status:
+            self.gcode_move = self.gcode_move.updateWith(status['gcode_move'])
+
+    def take_snapshot(self) -> PrinterSnapshot:
+        snapshot = PrinterSnapshot(True, self.print_stats.state)
+        snapshot.print_stats = self.print_stats
+        snapshot.virtual_sdcard = self.virtual_sdcard
+        snapshot.toolhead = self.toolhead
+        snapshot.gcode_move = self.gcode_move
+        snapshot.current_file = self.current_file
+        snapshot.m117 = self.display_status.message
+        snapshot.m117_hash = ''
+        snapshot.gcode_response = None
+        snapshot.gcode_response_hash = ''
+        snapshot.timelapse_pause = False
+        snapshot.filament_sensors = dict(self.filament_sensors)
+        return snapshot.freeze()
+
+
+def status_updates(count: int) -> Iterator[Dict[str, Any]]:
+    for i in range(count):
+        yield {
+            'virtual_sdcard': {'file_position': 1000 + i * 100, 'progress': i / count},
+            'print_stats': {'print_duration': i * 0.25, 'filament_used': i * 0.5},
+            'gcode_move': {'gcode_position': [10.0 + i % 50, 20.0, 0.2 + (i // 100) * 0.2, 100.0 + i]},
+        }
+
+
+def instance_sizes(count: int = 1000) -> None:
+    factories: List[Callable[[], Any]] = [
+        PrintStats, VirtualSDCard, GCodeMove, Toolhead, DisplayStatus,
+        lambda: FilamentSensor('runout', 'filament_switch_sensor'), lambda: GCodeFile('benchy.gcode'),
+        lambda: PrinterSnapshot(True, 'printing'),
+    ]
+    print(f"{'object':<16} {'bytes':>6}")
+    for factory in factories:
+        gc.collect()
+        tracemalloc.start()
+        objects = [factory() for _ in range(count)]
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # Without the list holding the objects
+        print(f"{type(objects[0]).__name__:<16} {(size - sys.getsizeof(objects)) / count:>6.0f}")
+
+
+def run(updates: int, retained: int) -> None:
+    instance_sizes()
+
+    statuses = list(status_updates(updates))
+    state = PrinterState()
+    backlog: Deque[PrinterSnapshot] = deque(maxlen=retained)
+    started = time.perf_counter()
+    for status in statuses:
+        state.apply(status)
+        backlog.append(state.take_snapshot())
+    elapsed = time.perf_counter() - started
+
+    state = PrinterState()
+    backlog = deque(maxlen=retained)
+    gc.collect()
+    tracemalloc.start()
+    start_current, _ = tracemalloc.get_traced_memory()
+    for status in statuses:
+        state.apply(status)
+        backlog.append(state.take_snapshot())
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    blocks = sum(stat.count for stat in snapshot.statistics('filename'))
+    print()
+    print(f"{updates} updates, {retained} snapshots retained")
+    print(f"retained {(current - start_current) / 1024:.0f} KiB, {(current - start_current) / retained:.0f} bytes "
+          f"per snapshot, peak {(peak - start_current) / 1024:.0f} KiB, {blocks / retained:.1f} live blocks per snapshot")
+    print(f"{elapsed / updates * 1e6:.1f} us per update and snapshot")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=5000)
+    parser.add_argument('--retained', type=int, default=1000)
+    args = parser.parse_args()
+    run(args.updates, args.retained)
+
+
+if __name__ == '__main__':
+    main()
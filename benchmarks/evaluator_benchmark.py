@@ -0,0 +1,64 @@
+'''
+Benchmark for the batched notification evaluation.
+
+Evaluates the notifications of N devices against a printing snapshot, once per device with
+`evaluate_all_notifications_for_device` and once with `evaluate_all_notifications_for_devices`, which evaluates
+devices with equivalent settings and snaps only once. The devices are the ones of the moonraker simulator, see
+benchmarks.fixtures.
+
+Usage:
+    python -m benchmarks.evaluator_benchmark [--devices 1 10 100] [--rounds 20]
+'''
+import argparse
+import time
+from typing import Callable, List
+
+from benchmarks.fixtures import devices, notification_evaluator
+from benchmarks.snapshot_benchmark import printing_snapshot
+from mobileraker.data.dtos.mobileraker.notification_config_dto import DeviceNotificationEntry
+from mobileraker.service.notification_evaluator import NotificationEvaluator
+
+
+def per_device(evaluator: NotificationEvaluator, cfgs: List[DeviceNotificationEntry]) -> None:
+    last = printing_snapshot(0.40, True)
+    snapshot = printing_snapshot(0.52, True)
+    for cfg in cfgs:
+        evaluator.evaluate_all_notifications_for_device(cfg, snapshot, last, [])
+
+
+def batched(evaluator: NotificationEvaluator, cfgs: List[DeviceNotificationEntry]) -> None:
+    last = printing_snapshot(0.40, True)
+    snapshot = printing_snapshot(0.52, True)
+    evaluator.evaluate_all_notifications_for_devices(cfgs, snapshot, last, [[] for _ in cfgs])
+
+
+def best_of(fn: Callable[[], None], rounds: int) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(device_counts: List[int], rounds: int) -> None:
+    evaluator = notification_evaluator()
+    print(f"best of {rounds} rounds, one evaluation of all devices")
+    print(f"{'devices':>8} {'per device ms':>14} {'batched ms':>11} {'speedup':>8} {'devices/s':>10}")
+    for count in device_counts:
+        cfgs = devices(count)
+        single = best_of(lambda: per_device(evaluator, cfgs), rounds)
+        batch = best_of(lambda: batched(evaluator, cfgs), rounds)
+        print(f"{count:>8} {single * 1000:>14.2f} {batch * 1000:>11.2f} {single / batch:>7.1f}x {count / batch:>10.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--devices', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+    run(args.devices, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
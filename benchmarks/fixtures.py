@@ -0,0 +1,56 @@
+'''
+Devices and services shared by the simulator, the benchmarks and the tests.
+'''
+import os
+import tempfile
+from typing import Any, Dict, List
+
+from mobileraker.data.dtos.mobileraker.notification_config_dto import DeviceNotificationEntry
+from mobileraker.service.notification_evaluator import NotificationEvaluator
+from mobileraker.util.configs import CompanionLocalConfig, CompanionRemoteConfig
+
+
+def machine_id(index: int) -> str:
+    return f'00000000-0000-4000-8000-{index:012d}'
+
+
+def device_json(printer_name: str, index: int) -> Dict[str, Any]:
+    '''
+    The notification config of an app device as stored in Moonraker's database.
+    Devices alternate between Android and iOS and two progress settings.
+    '''
+    return {
+        'created': '2024-01-01T00:00:00.000000',
+        'lastModified': '2024-01-01T00:00:00.000000',
+        'fcmToken': f'sim-token-{printer_name}-{index}',
+        'machineName': printer_name,
+        'language': 'en',
+        'settings': {
+            'created': '2024-01-01T00:00:00.000000',
+            'lastModified': '2024-01-01T00:00:00.000000',
+            'progress': 0.25 if index % 2 else 0.1,
+            'states': ['paused', 'complete', 'error', 'printing', 'standby'],
+            'androidProgressbar': True,
+            'etaSources': ['filament', 'slicer'],
+        },
+        'snap': {'progress': 0.0, 'state': 'standby'},
+        'version': '2.8.0-android' if index % 2 else '2.8.0-ios',
+    }
+
+
+def devices(count: int, printer_name: str = 'bench') -> List[DeviceNotificationEntry]:
+    return [DeviceNotificationEntry.fromJSON(machine_id(index), device_json(printer_name, index))
+            for index in range(count)]
+
+
+def notification_evaluator() -> NotificationEvaluator:
+    '''
+    A NotificationEvaluator with a minimal local config (UTC) and the default remote config.
+    '''
+    fd, config_path = tempfile.mkstemp(suffix='.conf')
+    with os.fdopen(fd, 'w') as f:
+        f.write('[general]\ntimezone: UTC\n')
+    try:
+        return NotificationEvaluator(CompanionLocalConfig(config_path), CompanionRemoteConfig())
+    finally:
+        os.remove(config_path)
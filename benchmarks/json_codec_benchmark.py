@@ -0,0 +1,63 @@
+'''
+Microbenchmark for the JSON codecs used by the MoonrakerClient.
+
+Decodes (and re-encodes) Moonraker websocket traffic with every installed codec.
+
+Usage:
+    python -m benchmarks.json_codec_benchmark [--frames <file> | --recording <recording.jsonl.gz>] [--rounds 5]
+'''
+import argparse
+import sys
+import time
+from typing import List
+
+from benchmarks.traffic import read_frames, recorded_frames, synthetic_status_frames
+from mobileraker.util.json_codec import available_codecs
+
+
+def bench(frames: List[str], rounds: int) -> None:
+    frames_bytes = [f.encode('utf-8') for f in frames]
+    total_bytes = sum(len(f) for f in frames_bytes)
+    print(f"{len(frames)} frames, {total_bytes / 1024:.0f} KiB, best of {rounds} rounds")
+    print(f"{'codec':<8} {'loads(str)':>12} {'loads(bytes)':>13} {'dumps':>10} {'MiB/s':>8}")
+
+    for name, codec_cls in available_codecs().items():
+        codec = codec_cls()
+        best_str = best_bytes = best_dumps = float('inf')
+        for _ in range(rounds):
+            start = time.perf_counter()
+            decoded = [codec.loads(f) for f in frames]
+            best_str = min(best_str, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for f in frames_bytes:
+                codec.loads(f)
+            best_bytes = min(best_bytes, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for obj in decoded:
+                codec.dumps(obj)
+            best_dumps = min(best_dumps, time.perf_counter() - start)
+
+        throughput = total_bytes / best_str / 1024 / 1024
+        print(f"{name:<8} {best_str * 1000:>10.1f}ms {best_bytes * 1000:>11.1f}ms {best_dumps * 1000:>8.1f}ms {throughput:>8.1f}")
+
+
+def main(args: List[str]) -> None:
+    parser = argparse.ArgumentParser(description="Compare the JSON codecs on Moonraker traffic")
+    parser.add_argument("--frames", metavar='<file>', help="File with one recorded frame per line, synthetic traffic is used if omitted")
+    parser.add_argument("--recording", metavar='<file>', help="Recording created with --record, its received frames are used")
+    parser.add_argument("--rounds", type=int, default=5, help="Number of rounds, the best one is reported")
+    parsed = parser.parse_args(args)
+
+    if parsed.recording:
+        frames = recorded_frames(parsed.recording)
+    elif parsed.frames:
+        frames = list(read_frames(parsed.frames))
+    else:
+        frames = synthetic_status_frames()
+    bench(frames, parsed.rounds)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
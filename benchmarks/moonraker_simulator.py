@@ -0,0 +1,502 @@
+'''
+Local Moonraker stand-in for load and soak testing the companion.
+
+Simulates a fleet of virtual printers in a single process. Every printer has its own websocket endpoint
+(ws://<host>:<port>/<printer>/websocket), webcam snapshot (http://<host>:<port>/<printer>/snapshot) and MJPEG
+webcam stream (http://<host>:<stream-port>/<printer>/stream) and speaks the JSON-RPC subset the companion uses:
+    server.info, printer.objects.list/query/subscribe, server.files.list/get_directory/metadata,
+    server.database.get_item/post_item/delete_item/list, server.webcams.get_item/list
+and emits notify_status_update, notify_klippy_ready/disconnected, notify_gcode_response and notify_filelist_changed.
+
+The printers run an endless cycle of print jobs: standby -> printing (optionally paused by a filament runout)
+-> complete -> next job. All printers are driven by one clock, so hundreds of printers are cheap.
+
+Usage:
+    python -m benchmarks.moonraker_simulator --printers 200 [--speed 10] [--devices 2] [--write-config Mobileraker.conf]
+'''
+import argparse
+import asyncio
+import configparser
+import http
+import json
+import logging
+import random
+import sys
+import time
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import websockets
+from PIL import Image, ImageDraw
+
+from benchmarks.fixtures import device_json, machine_id
+
+_logger = logging.getLogger('mobileraker.simulator')
+
+_OBJECTS = ['webhooks', 'print_stats', 'display_status', 'virtual_sdcard', 'toolhead', 'gcode_move',
+            'filament_switch_sensor runout', 'gcode_macro TIMELAPSE_TAKE_FRAME']
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code: int = code
+        self.message: str = message
+
+
+class SimConnection:
+    '''
+    A websocket connection to a virtual printer and the objects it subscribed to.
+    '''
+
+    def __init__(self, websocket: Any) -> None:
+        self.websocket = websocket
+        self.subscription: Dict[str, Optional[List[str]]] = {}
+
+    def send(self, message: Dict[str, Any]) -> None:
+        # Fire and forget, a slow client must not stall the clock of the whole fleet
+        asyncio.ensure_future(self._send(json.dumps(message)))
+
+    async def _send(self, raw: str) -> None:
+        try:
+            await self.websocket.send(raw)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+
+class VirtualPrinter:
+    '''
+    The state of a single simulated printer.
+
+    Attributes:
+        name (str): The name of the printer, also used in its endpoints.
+        print_time (float): Mean duration of a print job in simulated seconds.
+        idle_time (float): Duration between two print jobs in simulated seconds.
+        runout_chance (float): Chance that a print job is paused by a filament runout.
+        notify_chance (float): Chance per simulated minute that the printer sends an MR_NOTIFY gcode response.
+        stream_base_url (Optional[str]): Base url of the MJPEG streams, defaults to the base url.
+    '''
+
+    def __init__(
+            self,
+            name: str,
+            base_url: str,
+            rnd: random.Random,
+            print_time: float,
+            idle_time: float,
+            devices: int,
+            runout_chance: float,
+            notify_chance: float,
+            stream_base_url: Optional[str] = None,
+    ) -> None:
+        self.name: str = name
+        self.print_time: float = print_time
+        self.idle_time: float = idle_time
+        self.runout_chance: float = runout_chance
+        self.notify_chance: float = notify_chance
+        self._rnd: random.Random = rnd
+        self.connections: Set[SimConnection] = set()
+        self.klippy_state: str = 'ready'
+        self._klippy_down_for: float = 0
+        self._job: int = 0
+        self._job_time: float = 0
+        self._idle_for: float = rnd.uniform(0, idle_time)
+        self._runout_at: Optional[float] = None
+        self._paused_for: float = 0
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.status: Dict[str, Dict[str, Any]] = {
+            'webhooks': {'state': 'ready', 'state_message': 'Printer is ready'},
+            'print_stats': {'filename': '', 'total_duration': 0.0, 'print_duration': 0.0, 'filament_used': 0.0,
+                            'state': 'standby', 'message': '', 'info': {'total_layer': None, 'current_layer': None}},
+            'display_status': {'message': None, 'progress': 0.0},
+            'virtual_sdcard': {'file_position': 0, 'progress': 0.0, 'is_active': False, 'file_path': None},
+            'toolhead': {'active_extruder': 'extruder', 'max_velocity': 300.0, 'max_accel': 3000.0,
+                         'square_corner_velocity': 5.0, 'print_time': 0.0, 'estimated_print_time': 0.0},
+            'gcode_move': {'gcode_position': [0.0, 0.0, 0.0, 0.0], 'speed': 1500.0},
+            'filament_switch_sensor runout': {'enabled': True, 'filament_detected': True},
+            'gcode_macro TIMELAPSE_TAKE_FRAME': {'is_paused': False},
+        }
+        self.webcams: List[Dict[str, Any]] = [{
+            'name': 'cam', 'uid': f'{name}-cam', 'enabled': True, 'service': 'mjpegstreamer-adaptive',
+            'stream_url': f'{stream_base_url or base_url}/{name}/stream', 'snapshot_url': f'{base_url}/{name}/snapshot',
+            'rotation': 0, 'flip_horizontal': False, 'flip_vertical': False,
+        }]
+        self.database: Dict[str, Any] = {'mobileraker': {'fcm': {
+            machine_id(index): device_json(name, index) for index in range(devices)
+        }}}
+
+    # ---- Simulation ----
+
+    def tick(self, dt: float, eventtime: float) -> None:
+        '''
+        Advance the printer by dt simulated seconds and notify the subscribers about the changed fields.
+        '''
+        if self._klippy_down_for > 0:
+            self._klippy_down_for -= dt
+            if self._klippy_down_for <= 0:
+                self.klippy_state = 'ready'
+                self.broadcast('notify_klippy_ready', None)
+            return
+
+        changes: Dict[str, Dict[str, Any]] = {}
+        stats = self.status['print_stats']
+        if stats['state'] in ('standby', 'complete'):
+            self._idle_for -= dt
+            if self._idle_for <= 0:
+                self._start_job(changes)
+        elif stats['state'] == 'paused':
+            self._paused_for -= dt
+            self._set(changes, 'print_stats', total_duration=stats['total_duration'] + dt)
+            if self._paused_for <= 0:
+                self._set(changes, 'filament_switch_sensor runout', filament_detected=True)
+                self._set(changes, 'print_stats', state='printing')
+                self._set(changes, 'gcode_macro TIMELAPSE_TAKE_FRAME', is_paused=False)
+        else:
+            self._advance_job(dt, changes)
+
+        if changes:
+            self.broadcast_status(changes, eventtime)
+
+    def _start_job(self, changes: Dict[str, Dict[str, Any]]) -> None:
+        self._job += 1
+        filename = f'{self.name}/job_{self._job}.gcode'
+        self._job_time = self.print_time * self._rnd.uniform(0.8, 1.2)
+        layers = self._rnd.randint(50, 400)
+        size = self._rnd.randint(500_000, 20_000_000)
+        self.files[filename] = {
+            'filename': filename, 'modified': time.time(), 'size': size, 'print_start_time': None,
+            'job_id': None, 'slicer': 'PrusaSlicer', 'slicer_version': '2.6.0', 'layer_count': layers,
+            'object_height': layers * 0.2, 'estimated_time': round(self._job_time), 'nozzle_diameter': 0.4,
+            'layer_height': 0.2, 'first_layer_height': 0.2, 'filament_total': self._job_time * 3.0,
+            'filament_weight_total': self._job_time * 0.01, 'gcode_start_byte': 1000, 'gcode_end_byte': size - 1000,
+        }
+        self.broadcast('notify_filelist_changed', [{
+            'action': 'create_file',
+            'item': {'path': filename, 'root': 'gcodes', 'size': size, 'modified': self.files[filename]['modified']},
+        }])
+        self._runout_at = self._rnd.uniform(0.1, 0.9) if self._rnd.random() < self.runout_chance else None
+        self._set(changes, 'print_stats', filename=filename, state='printing', total_duration=0.0, print_duration=0.0,
+                  filament_used=0.0, message='', info={'total_layer': layers, 'current_layer': 0})
+        self._set(changes, 'virtual_sdcard', file_position=0, progress=0.0, is_active=True, file_path=filename)
+        self._set(changes, 'display_status', progress=0.0, message=None)
+
+    def _advance_job(self, dt: float, changes: Dict[str, Dict[str, Any]]) -> None:
+        stats = self.status['print_stats']
+        meta = self.files[stats['filename']]
+        duration = stats['print_duration'] + dt
+        progress = min(1.0, duration / self._job_time)
+        layers = stats['info']['total_layer']
+        size = meta['gcode_end_byte'] - meta['gcode_start_byte']
+
+        self._set(changes, 'print_stats', print_duration=duration, total_duration=stats['total_duration'] + dt,
+                  filament_used=round(meta['filament_total'] * progress, 2),
+                  info={'total_layer': layers, 'current_layer': min(layers, int(progress * layers) + 1)})
+        self._set(changes, 'virtual_sdcard', progress=round(progress, 4),
+                  file_position=meta['gcode_start_byte'] + int(size * progress))
+        self._set(changes, 'display_status', progress=round(progress, 2))
+        self._set(changes, 'gcode_move', gcode_position=[
+            round(self._rnd.uniform(0, 250), 3), round(self._rnd.uniform(0, 250), 3),
+            round(0.2 * (int(progress * layers) + 1), 2), round(meta['filament_total'] * progress, 3)])
+        self._set(changes, 'toolhead', print_time=duration, estimated_print_time=duration)
+
+        if self._runout_at is not None and progress >= self._runout_at:
+            self._runout_at = None
+            self._paused_for = self._rnd.uniform(30, 120)
+            self._set(changes, 'filament_switch_sensor runout', filament_detected=False)
+            self._set(changes, 'print_stats', state='paused')
+            return
+
+        if self._rnd.random() < self.notify_chance * dt / 60:
+            self.broadcast('notify_gcode_response', [f'MR_NOTIFY:Simulated event at {progress:.0%}'])
+
+        if progress >= 1.0:
+            self._idle_for = self.idle_time
+            self._set(changes, 'print_stats', state='complete')
+            self._set(changes, 'virtual_sdcard', is_active=False)
+
+    def _set(self, changes: Dict[str, Dict[str, Any]], obj: str, **fields: Any) -> None:
+        current = self.status[obj]
+        for key, value in fields.items():
+            if current.get(key) != value:
+                current[key] = value
+                changes.setdefault(obj, {})[key] = value
+
+    def restart_klippy(self, down_for: float) -> None:
+        self.klippy_state = 'startup'
+        self._klippy_down_for = down_for
+        self.broadcast('notify_klippy_disconnected', None)
+
+    # ---- Notifications ----
+
+    def broadcast(self, method: str, params: Optional[List[Any]]) -> None:
+        message: Dict[str, Any] = {'jsonrpc': '2.0', 'method': method}
+        if params is not None:
+            message['params'] = params
+        for conn in self.connections:
+            conn.send(message)
+
+    def broadcast_status(self, changes: Dict[str, Dict[str, Any]], eventtime: float) -> None:
+        for conn in self.connections:
+            status = self._filter(changes, conn.subscription)
+            if status:
+                conn.send({'jsonrpc': '2.0', 'method': 'notify_status_update', 'params': [status, eventtime]})
+
+    @staticmethod
+    def _filter(status: Dict[str, Dict[str, Any]], objects: Dict[str, Optional[List[str]]]) -> Dict[str, Dict[str, Any]]:
+        filtered: Dict[str, Dict[str, Any]] = {}
+        for obj, fields in objects.items():
+            values = status.get(obj)
+            if not values:
+                continue
+            selected = dict(values) if fields is None else {k: v for k, v in values.items() if k in fields}
+            if selected:
+                filtered[obj] = selected
+        return filtered
+
+    # ---- JSON-RPC ----
+
+    def handle(self, conn: SimConnection, method: str, params: Dict[str, Any], eventtime: float) -> Any:
+        if method == 'server.info':
+            return {
+                'klippy_connected': True, 'klippy_state': self.klippy_state, 'components': ['database', 'file_manager', 'webcam'],
+                'failed_components': [], 'registered_directories': ['config', 'gcodes'], 'warnings': [],
+                'websocket_count': len(self.connections), 'moonraker_version': 'v0.8.0-simulator',
+                'api_version': [1, 4, 0], 'api_version_string': '1.4.0',
+            }
+        if method.startswith('printer.'):
+            if self.klippy_state != 'ready':
+                raise RpcError(503, 'Klippy Host not connected')
+            if method == 'printer.objects.list':
+                return {'objects': list(_OBJECTS)}
+            if method in ('printer.objects.query', 'printer.objects.subscribe'):
+                objects: Dict[str, Optional[List[str]]] = params.get('objects') or {}
+                if method == 'printer.objects.subscribe':
+                    conn.subscription = dict(objects)
+                return {'eventtime': eventtime, 'status': self._filter(self.status, objects)}
+        if method == 'server.files.list':
+            return [{'path': name, 'modified': meta['modified'], 'size': meta['size'], 'permissions': 'rw'}
+                    for name, meta in self.files.items()]
+        if method == 'server.files.get_directory':
+            directory = params.get('path', 'gcodes').partition('/')[2]
+            prefix = f'{directory}/' if directory else ''
+            return {'dirs': [], 'files': [
+                {'filename': name[len(prefix):], 'modified': meta['modified'], 'size': meta['size'], 'permissions': 'rw'}
+                for name, meta in self.files.items() if name.startswith(prefix) and '/' not in name[len(prefix):]]}
+        if method == 'server.files.metadata':
+            meta = self.files.get(params.get('filename', ''))
+            if meta is None:
+                raise RpcError(404, f"Metadata not available for <{params.get('filename')}>")
+            return meta
+        if method == 'server.webcams.list':
+            return {'webcams': self.webcams}
+        if method == 'server.webcams.get_item':
+            for cam in self.webcams:
+                if cam['uid'] == params.get('uid') or cam['name'] == params.get('name'):
+                    return {'webcam': cam}
+            raise RpcError(404, 'Webcam not found')
+        if method.startswith('server.database.'):
+            return self._handle_database(method, params)
+        raise RpcError(-32601, 'Method not found')
+
+    def _handle_database(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == 'server.database.list':
+            return {'namespaces': list(self.database)}
+        namespace: str = params.get('namespace', '')
+        key: Optional[str] = params.get('key')
+        path = key.split('.') if key else []
+
+        if method == 'server.database.post_item':
+            node = self.database.setdefault(namespace, {})
+            for part in path[:-1]:
+                child = node.get(part)
+                if not isinstance(child, dict):
+                    child = node[part] = {}
+                node = child
+            node[path[-1]] = params.get('value')
+            return {'namespace': namespace, 'key': key, 'value': params.get('value')}
+
+        if namespace not in self.database:
+            raise RpcError(404, f"Namespace '{namespace}' not found")
+        parent: Any = None
+        node = self.database[namespace]
+        for part in path:
+            if not isinstance(node, dict) or part not in node:
+                raise RpcError(404, f"Key '{key}' in namespace '{namespace}' not found")
+            parent, node = node, node[part]
+        if method == 'server.database.get_item':
+            return {'namespace': namespace, 'key': key, 'value': node}
+        if method == 'server.database.delete_item' and parent is not None:
+            del parent[path[-1]]
+            return {'namespace': namespace, 'key': key, 'value': node}
+        raise RpcError(-32601, 'Method not found')
+
+
+class MoonrakerSimulator:
+    '''
+    Runs the virtual printers, their endpoints and the shared simulation clock.
+    '''
+
+    def __init__(self, host: str, port: int, printers: List[VirtualPrinter], tick: float, speed: float,
+                 klippy_restart_every: float, snapshot: bytes, stream_port: int, stream_fps: float = 5.0) -> None:
+        self.host: str = host
+        self.port: int = port
+        self.stream_port: int = stream_port
+        self.stream_fps: float = stream_fps
+        self.printers: Dict[str, VirtualPrinter] = {p.name: p for p in printers}
+        self.tick: float = tick
+        self.speed: float = speed
+        self.klippy_restart_every: float = klippy_restart_every
+        self._snapshot: bytes = snapshot
+        self._rnd: random.Random = random.Random(0)
+        self.requests: int = 0
+
+    def eventtime(self) -> float:
+        return time.monotonic()
+
+    async def serve(self) -> None:
+        # The websocket server can only answer plain HTTP requests with a complete body, the endless MJPEG streams
+        # are served by a minimal HTTP server on their own port
+        stream_server = await asyncio.start_server(self._serve_stream, self.host, self.stream_port)
+        async with stream_server, websockets.serve(self._handler, self.host, self.port,  # type: ignore
+                                                   process_request=self._process_request, max_size=None):
+            _logger.info("Simulating %i printers on ws://%s:%i/<printer>/websocket, streams on http://%s:%i/<printer>/stream",
+                         len(self.printers), self.host, self.port, self.host, self.stream_port)
+            await self._run_clock()
+
+    async def _serve_stream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()).strip():
+                pass  # Skip the headers
+            parts = request_line.decode('latin-1').split(' ')
+            path = parts[1].split('?')[0].strip('/').split('/') if len(parts) > 1 else []
+            if len(path) != 2 or path[1] != 'stream' or path[0] not in self.printers:
+                writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 16\r\nConnection: close\r\n\r\nUnknown printer\n')
+                await writer.drain()
+                return
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary=frame\r\n'
+                         b'Cache-Control: no-cache\r\nConnection: close\r\n\r\n')
+            part = (b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %i\r\n\r\n' % len(self._snapshot)
+                    + self._snapshot + b'\r\n')
+            while True:
+                writer.write(part)
+                await writer.drain()
+                await asyncio.sleep(1 / self.stream_fps)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _process_request(self, path: str, headers: Any) -> Optional[Tuple[http.HTTPStatus, List[Tuple[str, str]], bytes]]:
+        parts = path.split('?')[0].strip('/').split('/')
+        if len(parts) == 2 and parts[1] == 'snapshot' and parts[0] in self.printers:
+            return http.HTTPStatus.OK, [('Content-Type', 'image/jpeg')], self._snapshot
+        if len(parts) != 2 or parts[1] != 'websocket' or parts[0] not in self.printers:
+            return http.HTTPStatus.NOT_FOUND, [], b'Unknown printer\n'
+        return None
+
+    async def _handler(self, websocket: Any, path: str) -> None:
+        printer = self.printers[path.strip('/').split('/')[0]]
+        conn = SimConnection(websocket)
+        printer.connections.add(conn)
+        try:
+            async for raw in websocket:
+                self.requests += 1
+                request = json.loads(raw)
+                response: Dict[str, Any] = {'jsonrpc': '2.0', 'id': request.get('id')}
+                try:
+                    response['result'] = printer.handle(conn, request['method'], request.get('params') or {}, self.eventtime())
+                except RpcError as err:
+                    response['error'] = {'code': err.code, 'message': err.message}
+                await websocket.send(json.dumps(response))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            printer.connections.discard(conn)
+
+    async def _run_clock(self) -> None:
+        dt = self.tick * self.speed
+        restart_chance = dt / self.klippy_restart_every if self.klippy_restart_every > 0 else 0
+        next_report = time.monotonic() + 60
+        while True:
+            started = time.monotonic()
+            eventtime = self.eventtime()
+            for printer in self.printers.values():
+                if restart_chance and self._rnd.random() < restart_chance:
+                    printer.restart_klippy(down_for=10 * self.speed)
+                printer.tick(dt, eventtime)
+            if started >= next_report:
+                next_report = started + 60
+                printing = sum(1 for p in self.printers.values() if p.status['print_stats']['state'] == 'printing')
+                connected = sum(1 for p in self.printers.values() if p.connections)
+                _logger.info("%i printers connected, %i printing, %i requests served", connected, printing, self.requests)
+            await asyncio.sleep(max(0.0, self.tick - (time.monotonic() - started)))
+
+
+def synthetic_snapshot(width: int = 1280, height: int = 720) -> bytes:
+    img = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    ImageDraw.Draw(img).rectangle((width // 3, height // 3, width // 2, height // 2), fill=(200, 40, 40))
+    buffer = BytesIO()
+    img.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def write_companion_config(path: str, host: str, port: int, printers: List[VirtualPrinter]) -> None:
+    '''
+    Writes a Mobileraker.conf that points the companion at all virtual printers.
+    '''
+    config = configparser.ConfigParser()
+    config['general'] = {'language': 'en', 'include_snapshot': 'True'}
+    for printer in printers:
+        config[f'printer {printer.name}'] = {
+            'moonraker_uri': f'ws://{host}:{port}/{printer.name}/websocket',
+            'snapshot_uri': f'http://{host}:{port}/{printer.name}/snapshot',
+        }
+    with open(path, 'w') as f:
+        config.write(f)
+
+
+def main(args: List[str]) -> None:
+    parser = argparse.ArgumentParser(description="Simulate a fleet of Moonraker instances")
+    parser.add_argument("--printers", type=int, default=10, help="Number of virtual printers")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=7125)
+    parser.add_argument("--stream-port", type=int, help="Port of the MJPEG webcam streams, defaults to port + 1")
+    parser.add_argument("--stream-fps", type=float, default=5.0, help="Frames per second of the MJPEG webcam streams")
+    parser.add_argument("--tick", type=float, default=0.25, help="Interval of status updates in seconds")
+    parser.add_argument("--speed", type=float, default=1.0, help="Simulated seconds per real second")
+    parser.add_argument("--print-time", type=float, default=3600, help="Mean duration of a print job in simulated seconds")
+    parser.add_argument("--idle-time", type=float, default=300, help="Pause between print jobs in simulated seconds")
+    parser.add_argument("--devices", type=int, default=2, help="App devices registered for notifications per printer")
+    parser.add_argument("--runout-chance", type=float, default=0.1, help="Chance that a job is paused by a filament runout")
+    parser.add_argument("--notify-chance", type=float, default=0.05, help="MR_NOTIFY gcode responses per simulated minute")
+    parser.add_argument("--klippy-restart-every", type=float, default=0,
+                        help="Mean simulated seconds between Klippy restarts of a printer, 0 disables restarts")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--write-config", metavar='<file>', help="Write a companion config for the simulated printers")
+    parsed = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    rnd = random.Random(parsed.seed)
+    base_url = f'http://{parsed.host}:{parsed.port}'
+    stream_port = parsed.stream_port if parsed.stream_port is not None else parsed.port + 1
+    printers = [
+        VirtualPrinter(f'sim{i:04d}', base_url, random.Random(rnd.random()), parsed.print_time, parsed.idle_time,
+                       parsed.devices, parsed.runout_chance, parsed.notify_chance,
+                       stream_base_url=f'http://{parsed.host}:{stream_port}')
+        for i in range(parsed.printers)
+    ]
+    if parsed.write_config:
+        write_companion_config(parsed.write_config, parsed.host, parsed.port, printers)
+        _logger.info("Wrote companion config to %s", parsed.write_config)
+
+    simulator = MoonrakerSimulator(parsed.host, parsed.port, printers, parsed.tick, parsed.speed,
+                                   parsed.klippy_restart_every, synthetic_snapshot(), stream_port, parsed.stream_fps)
+    try:
+        asyncio.run(simulator.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
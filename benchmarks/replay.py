@@ -0,0 +1,355 @@
+'''
+Replays recorded Moonraker sessions through the whole companion pipeline.
+
+The recordings are created by running the companion with `--record <dir>`. Every recording is fed through
+MoonrakerClient -> DataSyncService -> MobilerakerCompanion. Moonraker is replaced by a fake websocket that
+answers requests with the recorded responses and emits the recorded notifications at N times the recorded speed.
+The FCM backend and the webcams are stubbed, so nothing leaves the process. The webcam stub still runs the
+real decode/transform/encode pipeline on a synthetic frame.
+
+Reported per printer: replayed frames per second, evaluation latency percentiles (snapshot handed to the
+scheduler -> evaluation finished, only for snapshots that passed the evaluation threshold), CPU time and the
+peak RSS of the process after the replay.
+
+Usage:
+    python -m benchmarks.replay <recording.jsonl.gz> [<recording.jsonl.gz> ...] [--speed 10] [--concurrent] [--config <file>]
+'''
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from asyncio import AbstractEventLoop
+from collections import deque
+from io import BytesIO
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from PIL import Image
+from websockets import connection
+
+from mobileraker.client.moonraker_client import MoonrakerClient
+from mobileraker.client.session_recorder import RecordedFrame, load_recording
+from mobileraker.client.webcam_snapshot_client import WebcamSnapshotClient
+from mobileraker.data.dtos.mobileraker.companion_request_dto import FcmRequestDto
+from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
+from mobileraker.mobileraker_companion import MobilerakerCompanion
+from mobileraker.service.data_sync_service import DataSyncService
+from mobileraker.util.configs import CompanionLocalConfig
+from mobileraker.util.metrics import get_metrics
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None  # type: ignore
+
+
+_SENTINEL = object()
+
+
+class ReplayWebsocket:
+    '''
+    Stands in for the websocket connection to Moonraker.
+
+    Requests are answered with the recorded response of the same method and params, falling back to the next
+    recorded response of the same method. Unknown requests are answered with a JSON-RPC error.
+    Notifications recorded before the companion subscribed are delivered right away, the remaining ones are paced
+    relative to the subscription at `speed` times the recorded speed (0 replays as fast as possible).
+    '''
+
+    state = connection.State.OPEN
+
+    def __init__(self, frames: List[RecordedFrame], loop: AbstractEventLoop, speed: float) -> None:
+        self._loop: AbstractEventLoop = loop
+        self._speed: float = speed
+        self._inbox: asyncio.Queue = asyncio.Queue()
+        self._exact: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = {}
+        self._by_method: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._initial: List[str] = []
+        self._paced: List[Tuple[float, str]] = []
+        self._feeder: Optional[asyncio.Task] = None
+        self._closed: asyncio.Event = asyncio.Event()
+        self.notifications: int = 0
+        self.responses: int = 0
+        self._index(frames)
+
+    def _index(self, frames: List[RecordedFrame]) -> None:
+        requests: Dict[Any, Tuple[str, str]] = {}
+        subscribed_at: Optional[float] = None
+        for offset, direction, raw in frames:
+            msg = json.loads(raw)
+            if direction == 'out':
+                key = (msg["method"], json.dumps(msg.get("params"), sort_keys=True))
+                requests[msg["id"]] = key
+                if subscribed_at is None and msg["method"] == "printer.objects.subscribe":
+                    subscribed_at = offset
+            elif "id" in msg:
+                key = requests.get(msg["id"])
+                if key is not None:
+                    self._exact.setdefault(key, deque()).append(msg)
+                    self._by_method.setdefault(key[0], deque()).append(msg)
+            elif subscribed_at is None:
+                self._initial.append(raw)
+            else:
+                self._paced.append((offset - subscribed_at, raw))
+
+    @property
+    def done(self) -> bool:
+        return self._feeder is not None and self._feeder.done()
+
+    async def send(self, message: str) -> None:
+        request = json.loads(message)
+        method = request["method"]
+        key = (method, json.dumps(request.get("params"), sort_keys=True))
+        recorded = self._take(self._exact.get(key)) or self._take(self._by_method.get(method))
+        if recorded is None:
+            response: Dict[str, Any] = {"jsonrpc": "2.0", "error": {"code": 404, "message": f"{method} was not recorded"}}
+        else:
+            response = dict(recorded)
+        response["id"] = request["id"]
+        self.responses += 1
+        self._inbox.put_nowait(json.dumps(response))
+
+        if method == "printer.objects.subscribe" and self._feeder is None:
+            self._feeder = self._loop.create_task(self._feed())
+
+    def _take(self, responses: Optional[Deque[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        if not responses:
+            return None
+        # Keep the last response, so repeated requests (e.g. on every evaluation) are always answered
+        return responses.popleft() if len(responses) > 1 else responses[0]
+
+    def start(self) -> None:
+        for raw in self._initial:
+            self.notifications += 1
+            self._inbox.put_nowait(raw)
+
+    async def _feed(self) -> None:
+        start = self._loop.time()
+        for offset, raw in self._paced:
+            if self._speed > 0:
+                delay = start + offset / self._speed - self._loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                # Yield to the receiver, otherwise the whole recording is queued at once
+                await asyncio.sleep(0)
+            self.notifications += 1
+            self._inbox.put_nowait(raw)
+
+    async def close(self) -> None:
+        if self._feeder is not None:
+            self._feeder.cancel()
+        self._inbox.put_nowait(_SENTINEL)
+        self._closed.set()
+
+    async def wait_closed(self) -> None:
+        await self._closed.wait()
+
+    def __aiter__(self) -> 'ReplayWebsocket':
+        return self
+
+    async def __anext__(self) -> str:
+        item = await self._inbox.get()
+        if item is _SENTINEL:
+            raise StopAsyncIteration
+        return item
+
+
+class StubFcmClient:
+    '''
+    Replaces the MobilerakerFcmClient, pushes are counted instead of sent.
+    '''
+
+    def __init__(self, latency: float = 0.05) -> None:
+        self.latency: float = latency
+        self.pushes: int = 0
+        self.device_requests: int = 0
+
+    async def push(self, request: FcmRequestDto, timeout: Optional[float] = None) -> None:
+        self.pushes += 1
+        self.device_requests += len(request.device_requests)
+        await asyncio.sleep(self.latency)
+
+    def close(self) -> None:
+        pass
+
+
+class StubSnapshotClient(WebcamSnapshotClient):
+    '''
+    Webcam client that processes a synthetic frame instead of fetching one over HTTP.
+    '''
+
+    def __init__(self, frame: bytes) -> None:
+        super().__init__('http://replay.invalid/snapshot')
+        self._frame: bytes = frame
+        self.captures: int = 0
+
+    def _fetch(self, timeout: float) -> Optional[bytes]:
+        self.captures += 1
+        return self._frame
+
+
+def synthetic_frame(width: int = 1920, height: int = 1080) -> bytes:
+    img = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    buffer = BytesIO()
+    img.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+class ReplayCompanion(MobilerakerCompanion):
+    '''
+    Companion that uses the stubbed webcam for every device and records the evaluation latencies.
+    '''
+
+    def __init__(self, snapshot_client: StubSnapshotClient, **kwargs: Any) -> None:
+        super().__init__(webcam_snapshot_client=snapshot_client, **kwargs)
+        self._submitted: Dict[int, Tuple[PrinterSnapshot, float]] = {}
+        self.latencies: List[float] = []
+        self._data_sync_service.register_snapshot_listener(self._on_snapshot)
+
+    def _on_snapshot(self, snapshot: PrinterSnapshot) -> None:
+        # Keep a reference to the snapshot, so its id can not be reused while it is tracked
+        self._submitted[id(snapshot)] = (snapshot, time.perf_counter())
+
+    async def _evaluate(self, snapshot: PrinterSnapshot) -> None:
+        await super()._evaluate(snapshot)
+        done = time.perf_counter()
+        tracked = self._submitted.pop(id(snapshot), None)
+        # Snapshots that did not pass the threshold return right away and would hide the notification latency
+        if tracked is not None and self._last_snapshot is snapshot:
+            self.latencies.append(done - tracked[1])
+        # Snapshots submitted before this one were merged by the scheduler and are never evaluated
+        for key in list(self._submitted):
+            if self._submitted[key][1] > done:
+                break
+            del self._submitted[key]
+
+    async def _get_snapshot_client_for_device(self, webcam: str) -> Optional[WebcamSnapshotClient]:
+        return self._default_snapshot_client
+
+
+class PrinterReport(NamedTuple):
+    printer: str
+    frames: int
+    wall: float
+    cpu: Optional[float]
+    latencies: List[float]
+    evaluations: int
+    pushes: int
+    captures: int
+    peak_rss_kib: Optional[int]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def peak_rss_kib() -> Optional[int]:
+    if resource is None:
+        return None
+    # ru_maxrss is reported in KiB on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+async def replay(path: str, speed: float, config: CompanionLocalConfig, frame: bytes, measure_cpu: bool) -> PrinterReport:
+    loop = asyncio.get_running_loop()
+    header, frames = load_recording(path)
+    printer_name = f"{header.get('printer', 'printer')}@{path}"
+
+    websocket = ReplayWebsocket(frames, loop, speed)
+    jrpc = MoonrakerClient('ws://replay.invalid/websocket', None, printer_name, loop)
+    data_sync_service = DataSyncService(jrpc=jrpc, printer_name=printer_name, loop=loop)
+    fcm_client = StubFcmClient()
+    snapshot_client = StubSnapshotClient(frame)
+    companion = ReplayCompanion(
+        snapshot_client,
+        jrpc=jrpc,
+        data_sync_service=data_sync_service,
+        fcm_client=fcm_client,  # type: ignore
+        printer_name=printer_name,
+        loop=loop,
+        companion_config=config,
+    )
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    # Mirrors MoonrakerClient.connect, without a real connection
+    jrpc._websocket = websocket  # type: ignore
+    jrpc._rec_task = loop.create_task(jrpc._start_receiving())
+    websocket.start()
+    jrpc._notify_connection_listeners(True)
+
+    while not websocket.done:
+        await asyncio.sleep(0.05)
+    scheduler = companion._evaluation_scheduler
+    while scheduler.is_running or len(jrpc._pending):
+        await asyncio.sleep(0.05)
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start if measure_cpu else None
+
+    await websocket.close()
+    await jrpc._rec_task
+    scheduler.close()
+
+    return PrinterReport(
+        printer=header.get('printer', path),
+        frames=websocket.notifications + websocket.responses,
+        wall=wall,
+        cpu=cpu,
+        latencies=companion.latencies,
+        evaluations=get_metrics(printer_name).get('eval.completed'),
+        pushes=fcm_client.pushes,
+        captures=snapshot_client.captures,
+        peak_rss_kib=peak_rss_kib(),
+    )
+
+
+def print_reports(reports: List[PrinterReport]) -> None:
+    print(f"{'printer':<16} {'frames':>7} {'frames/s':>9} {'evals':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'pushes':>7} {'cams':>5} {'cpu s':>7} {'rss MiB':>8}")
+    for r in reports:
+        lat = [v * 1000 for v in r.latencies]
+        cpu = f"{r.cpu:.2f}" if r.cpu is not None else '-'
+        rss = f"{r.peak_rss_kib / 1024:.1f}" if r.peak_rss_kib is not None else '-'
+        print(f"{r.printer[:16]:<16} {r.frames:>7} {r.frames / r.wall:>9.0f} {r.evaluations:>6} "
+              f"{percentile(lat, 50):>8.1f} {percentile(lat, 95):>8.1f} {percentile(lat, 99):>8.1f} "
+              f"{max(lat, default=float('nan')):>8.1f} {r.pushes:>7} {r.captures:>5} {cpu:>7} {rss:>8}")
+
+
+async def run(paths: List[str], speed: float, concurrent: bool, config_file: str) -> None:
+    config = CompanionLocalConfig(config_file)
+    frame = synthetic_frame()
+    cpu_start = time.process_time()
+    if concurrent:
+        # CPU time can not be attributed to a single printer if they run interleaved
+        reports = await asyncio.gather(*(replay(p, speed, config, frame, False) for p in paths))
+    else:
+        reports = [await replay(p, speed, config, frame, True) for p in paths]
+    print_reports(list(reports))
+    print(f"total cpu {time.process_time() - cpu_start:.2f}s, peak rss {(peak_rss_kib() or 0) / 1024:.1f} MiB "
+          f"(process wide, the rss column is the process peak after each replay)")
+
+
+def main(args: List[str]) -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded Moonraker sessions through the companion pipeline")
+    parser.add_argument("recordings", nargs='+', metavar='<recording>', help="Recordings created with --record")
+    parser.add_argument("--speed", type=float, default=10, help="Replay speed factor, 0 replays as fast as possible")
+    parser.add_argument("--concurrent", action='store_true', help="Replay all recordings at the same time")
+    parser.add_argument("--config", default='/nonexistent/Mobileraker.conf', metavar='<file>',
+                        help="Companion config, only the [general] section is used. Defaults are used if omitted")
+    parser.add_argument("--verbose", action='store_true', help="Show the companion logs")
+    parsed = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO if parsed.verbose else logging.ERROR)
+    asyncio.run(run(parsed.recordings, parsed.speed, parsed.concurrent, parsed.config))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,76 @@
+'''
+Microbenchmark for the derived values of the PrinterSnapshot.
+
+Evaluates the notifications of N devices against a printing snapshot, the way the companion does per evaluation,
+once with the snapshot's cache of derived values and once with the cache disabled.
+
+Usage:
+    python -m benchmarks.snapshot_benchmark [--devices 1 10 100] [--rounds 20]
+'''
+import argparse
+import time
+from typing import Any, List
+
+from benchmarks.fixtures import devices, notification_evaluator
+from mobileraker.data.dtos.mobileraker.notification_config_dto import DeviceNotificationEntry
+from mobileraker.data.dtos.moonraker.printer_objects import GCodeFile, PrintStats, VirtualSDCard
+from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
+from mobileraker.service.notification_evaluator import NotificationEvaluator
+
+
+class _NoCache(dict):
+    '''
+    A cache that never stores anything, every derived value is computed on each access.
+    '''
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        pass
+
+
+def printing_snapshot(progress: float, cached: bool) -> PrinterSnapshot:
+    snapshot = PrinterSnapshot(klippy_ready=True, print_state='printing')
+    snapshot.print_stats = PrintStats(filename='benchy.gcode', print_duration=1800, filament_used=2400,
+                                      total_layer=120, current_layer=54, state='printing')
+    snapshot.virtual_sdcard = VirtualSDCard(file_position=int(1000 + 10000 * progress), progress=progress)
+    snapshot.current_file = GCodeFile(filename='benchy.gcode', gcode_start_byte=1000, gcode_end_byte=11000,
+                                      estimated_time=4000, filament_total=5200, layer_count=120)
+    if not cached:
+        snapshot._cache = _NoCache()
+    return snapshot.freeze()
+
+
+def evaluate(evaluator: NotificationEvaluator, cfgs: List[DeviceNotificationEntry], cached: bool) -> None:
+    last = printing_snapshot(0.40, cached)
+    snapshot = printing_snapshot(0.52, cached)
+    for cfg in cfgs:
+        evaluator.evaluate_all_notifications_for_device(cfg, snapshot, last, [])
+
+
+def run(device_counts: List[int], rounds: int) -> None:
+    evaluator = notification_evaluator()
+    print(f"best of {rounds} rounds, one evaluation of all devices")
+    print(f"{'devices':>8} {'uncached ms':>12} {'cached ms':>10} {'speedup':>8}")
+    for count in device_counts:
+        cfgs = devices(count)
+        timings = {}
+        for cached in (False, True):
+            best = float('inf')
+            for _ in range(rounds):
+                start = time.perf_counter()
+                evaluate(evaluator, cfgs, cached)
+                best = min(best, time.perf_counter() - start)
+            timings[cached] = best
+        print(f"{count:>8} {timings[False] * 1000:>12.2f} {timings[True] * 1000:>10.2f} "
+              f"{timings[False] / timings[True]:>7.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--devices', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+    run(args.devices, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import json
+import random
+from typing import Iterator, List
+
+from mobileraker.client.session_recorder import load_recording
+
+
+def synthetic_status_frames(count: int = 5000, seed: int = 42) -> List[str]:
+    '''
+    Generates websocket frames that resemble the traffic of a Moonraker instance during a print.
+
+    Most frames are notify_status_update messages with print_stats, virtual_sdcard, display_status
+    and gcode_move changes, mixed with the occasional JSON-RPC response and proc_stat notification.
+
+    Args:
+        count (int): The number of frames to generate.
+        seed (int): Seed for the random generator, so runs are comparable.
+
+    Returns:
+        List[str]: The raw frames.
+    '''
+    rnd = random.Random(seed)
+    frames: List[str] = []
+    eventtime = 1000.0
+    file_position = 1024
+    print_duration = 0.0
+    for i in range(count):
+        eventtime += 0.25
+        kind = rnd.random()
+        if kind < 0.8:
+            print_duration += 0.25
+            file_position += rnd.randint(50, 400)
+            status = {
+                "print_stats": {"print_duration": print_duration, "total_duration": print_duration + 12.3, "filament_used": print_duration * 2.1},
+                "virtual_sdcard": {"file_position": file_position, "progress": min(1.0, file_position / 8_000_000)},
+                "gcode_move": {"gcode_position": [rnd.uniform(0, 250), rnd.uniform(0, 250), 0.2 + (i // 400) * 0.2, rnd.uniform(0, 5000)]},
+            }
+            if rnd.random() < 0.05:
+                status["display_status"] = {"message": f"Layer {i // 400}", "progress": status["virtual_sdcard"]["progress"]}
+            frames.append(json.dumps({"jsonrpc": "2.0", "method": "notify_status_update", "params": [status, eventtime]}))
+        elif kind < 0.95:
+            frames.append(json.dumps({"jsonrpc": "2.0", "method": "notify_proc_stat_update", "params": [{
+                "moonraker_stats": {"time": eventtime, "cpu_usage": rnd.uniform(0, 10), "memory": 45000, "mem_units": "kB"},
+                "cpu_temp": rnd.uniform(40, 60), "network": {"lo": {"rx_bytes": i * 100, "tx_bytes": i * 100, "bandwidth": 10.0}},
+                "system_cpu_usage": {"cpu": rnd.uniform(0, 100), "cpu0": rnd.uniform(0, 100)}, "websocket_connections": 3}]}))
+        else:
+            frames.append(json.dumps({"jsonrpc": "2.0", "id": i, "result": {
+                "eventtime": eventtime, "status": {"print_stats": {"state": "printing", "filename": "benchy.gcode"}}}}))
+    return frames
+
+
+def read_frames(path: str) -> Iterator[str]:
+    '''
+    Reads raw frames from a text file that contains one frame per line.
+    '''
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def recorded_frames(path: str) -> List[str]:
+    '''
+    Reads the frames received from Moonraker from a recording created with --record.
+    '''
+    _, frames = load_recording(path)
+    return [raw for _, direction, raw in frames if direction == 'in']
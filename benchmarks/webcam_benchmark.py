@@ -0,0 +1,104 @@
+'''
+Benchmark for the snapshot processing of the WebcamSnapshotClient.
+
+Compares the CPU time per snapshot of the current processing (draft decode, transposes, pass-through) with the
+previous full decode, resize and resampling rotate, for common webcam resolutions and transformations.
+Also compares rendering all snapshot variants in one pass with processing the frame once per variant.
+
+Usage:
+    python -m benchmarks.webcam_benchmark [--rounds 20] [--max-width 1024] [--snapshot <file.jpg>]
+'''
+import argparse
+import logging
+import time
+from io import BytesIO
+from typing import Callable, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from benchmarks.moonraker_simulator import synthetic_snapshot
+from mobileraker.client.webcam_snapshot_client import WebcamSnapshotClient
+from mobileraker.service.snapshot_variants import SNAPSHOT_VARIANTS
+
+RESOLUTIONS: List[Tuple[int, int]] = [(640, 480), (1280, 720), (1920, 1080), (2592, 1944)]
+# (label, rotation, flip_horizontal)
+TRANSFORMS: List[Tuple[str, int, bool]] = [('none', 0, False), ('rot90', 90, False), ('rot180+flip', 180, True)]
+
+
+def legacy_process(content: bytes, max_width: int, quality: int, rotation: int, flip_horizontal: bool) -> bytes:
+    '''
+    The processing before the fast paths were added, kept as baseline.
+    '''
+    image = Image.open(BytesIO(content)).convert("RGB")
+    if image.width > max_width:
+        image = image.resize((max_width, int(image.height * (max_width / image.width))))
+    if flip_horizontal:
+        image = ImageOps.mirror(image)
+    if rotation:
+        image = image.rotate(-rotation)
+    buffered = BytesIO()
+    image.save(buffered, format="JPEG", optimize=True, quality=quality)
+    return buffered.getvalue()
+
+
+def cpu_time(fn: Callable[[], Optional[bytes]], rounds: int) -> Tuple[float, int]:
+    '''
+    Returns the best CPU time of the rounds in seconds and the size of the result.
+    '''
+    best = float('inf')
+    size = 0
+    for _ in range(rounds):
+        start = time.thread_time()
+        result = fn()
+        best = min(best, time.thread_time() - start)
+        size = len(result or b'')
+    return best, size
+
+
+def run(rounds: int, max_width: int, snapshot: Optional[bytes]) -> None:
+    logging.getLogger('mobileraker.webcam').setLevel(logging.WARNING)
+    frames = [(Image.open(BytesIO(snapshot)).size, snapshot)] if snapshot else \
+        [((w, h), synthetic_snapshot(w, h)) for w, h in RESOLUTIONS]
+
+    print(f"max_width {max_width}, quality 85, best CPU time of {rounds} rounds")
+    print(f"{'source':<11} {'transform':<12} {'legacy ms':>10} {'fast ms':>8} {'speedup':>8} {'legacy KiB':>11} {'fast KiB':>9}")
+    for (width, height), content in frames:
+        for label, rotation, flip in TRANSFORMS:
+            client = WebcamSnapshotClient('http://localhost/snapshot', rotation=rotation)
+            client.flip_horizontal = flip
+            legacy, legacy_size = cpu_time(
+                lambda: legacy_process(content, max_width, 85, rotation, flip), rounds)
+            fast, fast_size = cpu_time(lambda: client._process(content, max_width, 85), rounds)
+            print(f"{f'{width}x{height}':<11} {label:<12} {legacy * 1000:>10.1f} {fast * 1000:>8.1f} "
+                  f"{legacy / fast if fast else float('inf'):>7.1f}x {legacy_size / 1024:>11.0f} {fast_size / 1024:>9.0f}")
+
+    variants = list(SNAPSHOT_VARIANTS.values())
+    print()
+    print(f"all {len(variants)} variants ({', '.join(v.name for v in variants)}), rotation 90")
+    print(f"{'source':<11} {'separate ms':>12} {'one pass ms':>12} {'speedup':>8} {'KiB per variant':>24}")
+    for (width, height), content in frames:
+        client = WebcamSnapshotClient('http://localhost/snapshot', rotation=90)
+        separate, _ = cpu_time(lambda: b''.join(
+            client._process(content, v.max_width, v.quality) or b'' for v in variants), rounds)
+        one_pass, _ = cpu_time(lambda: b''.join(client._process_variants(content, variants).values()), rounds)
+        sizes = client._process_variants(content, variants)
+        print(f"{f'{width}x{height}':<11} {separate * 1000:>12.1f} {one_pass * 1000:>12.1f} {separate / one_pass:>7.1f}x "
+              f"{' / '.join(f'{len(sizes[v.name]) / 1024:.0f}' for v in variants):>24}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--max-width', type=int, default=1024)
+    parser.add_argument('--snapshot', help='A JPEG to use instead of the synthetic frames')
+    args = parser.parse_args()
+
+    snapshot = None
+    if args.snapshot:
+        with open(args.snapshot, 'rb') as f:
+            snapshot = f.read()
+    run(args.rounds, args.max_width, snapshot)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,12 +4,15 @@ import logging
 import os
 import sys
 from asyncio import AbstractEventLoop
+from typing import Optional
 
 from mobileraker.client.mobileraker_fcm_client import MobilerakerFcmClient
 from mobileraker.client.moonraker_client import MoonrakerClient
+from mobileraker.client.session_recorder import SessionRecorder
 from mobileraker.client.webcam_snapshot_client import WebcamSnapshotClient
 from mobileraker.mobileraker_companion import MobilerakerCompanion
 from mobileraker.service.data_sync_service import DataSyncService
+from mobileraker.service.gcode_meta_cache import GCodeMetaCache
 from mobileraker.util.configs import CompanionLocalConfig, printer_data_logs_dir
 from mobileraker.util.functions import get_software_version
 from mobileraker.util.logging import setup_logging
@@ -29,6 +32,11 @@ async def main(args):
         "-c", "--configfile", default="~/Mobileraker.conf", metavar='<configfile>',
         help="Location of the configuration file for Mobileraker Companion"
     )
+    parser.add_argument(
+        "-r", "--record", default=None, metavar='<recordingdir>',
+        help="Record the Moonraker websocket traffic of each printer to <recordingdir>/<printer>.jsonl.gz (for benchmarks/replay.py). "
+             "Device tokens are redacted, the recording still contains the printer's data and the device configs"
+    )
     
     parsed_args = parser.parse_args(args)
 
@@ -46,17 +54,34 @@ async def main(args):
     
     # Get the event loop
     loop = asyncio.get_event_loop()
+
+    # The FCM client is shared by all printers, so they also share its connection pool
+    fcm_client = MobilerakerFcmClient(
+        # 'http://127.0.0.1:8080',
+        'https://mobileraker.eliteschw31n.de',
+        loop)
     
+    recorders = []
+    if parsed_args.record:
+        record_dir = os.path.normpath(os.path.expanduser(parsed_args.record))
+        os.makedirs(record_dir, exist_ok=True)
+
     try:
         # Create a task for each printer
         tasks = []
         for printer_name, printer_cfg in config.printers.items():
+            recorder = None
+            if parsed_args.record:
+                recorder = SessionRecorder(os.path.join(record_dir, f"{printer_name}.jsonl.gz"), printer_name)
+                recorders.append(recorder)
             task = loop.create_task(
                 setup_printer_companion(
                     printer_name,
                     printer_cfg,
                     config,
-                    loop
+                    fcm_client,
+                    loop,
+                    recorder
                 )
             )
             tasks.append(task)
@@ -69,6 +94,10 @@ async def main(args):
     except Exception as e:
         logging.exception(f"Unhandled exception: {e}")
     finally:
+        for recorder in recorders:
+            recorder.close()
+        fcm_client.close()
+        WebcamSnapshotClient.close_shared()
         # Close the event loop
         loop.close()
 
@@ -77,7 +106,9 @@ async def setup_printer_companion(
     printer_name: str,
     printer_cfg: dict,
     companion_config: CompanionLocalConfig,
-    loop: AbstractEventLoop
+    fcm_client: MobilerakerFcmClient,
+    loop: AbstractEventLoop,
+    recorder: Optional[SessionRecorder] = None
 ):
     """
     Set up the MobilerakerCompanion for a specific printer.
@@ -86,7 +117,9 @@ async def setup_printer_companion(
         printer_name (str): The name of the printer.
         printer_cfg (dict): The printer configuration.
         companion_config (CompanionLocalConfig): The companion configuration.
+        fcm_client (MobilerakerFcmClient): The FCM client shared by all printers.
         loop (AbstractEventLoop): The event loop.
+        recorder (Optional[SessionRecorder]): Records the websocket traffic of the printer, if set.
     """
     moonraker_uri = printer_cfg["moonraker_uri"]
     moonraker_api_key = printer_cfg["moonraker_api_key"]
@@ -99,22 +132,28 @@ async def setup_printer_companion(
         moonraker_uri=moonraker_uri,
         moonraker_api=moonraker_api_key,
         printer_name=printer_name,
-        loop=loop
+        loop=loop,
+        recorder=recorder
     )
     
+    # Create the gcode metadata cache, it is only persisted if a cache dir is configured
+    meta_cache_path = None
+    if companion_config.cache_dir:
+        os.makedirs(companion_config.cache_dir, exist_ok=True)
+        meta_cache_path = os.path.join(companion_config.cache_dir, f"gcode_meta_{printer_name}.json")
+    meta_cache = GCodeMetaCache(
+        printer_name=printer_name,
+        persist_path=meta_cache_path
+    )
+
     # Create the data sync service
     data_sync_service = DataSyncService(
         jrpc=jrpc,
         printer_name=printer_name,
-        loop=loop
+        loop=loop,
+        meta_cache=meta_cache
     )
     
-    # Create the FCM client
-    fcm_client  = MobilerakerFcmClient(
-        # 'http://127.0.0.1:8080',
-        'https://mobileraker.eliteschw31n.de',
-        loop)
-    
     # Create the default snapshot client (will be used as fallback)
     snapshot_client = WebcamSnapshotClient(
         uri_or_data=snapshot_uri,
@@ -134,11 +173,16 @@ async def setup_printer_companion(
     )
     
     logging.info("Starting MobilerakerCompanion for printer: %s", printer_name)
-    await companion.start()
-    
-    # Keep the task running
-    while True:
-        await asyncio.sleep(3600)  # Sleep for an hour and check again
+    try:
+        await companion.start()
+
+        # Keep the task running
+        while True:
+            await asyncio.sleep(3600)  # Sleep for an hour and check again
+    finally:
+        # The task is cancelled on shutdown
+        companion.close()
+        meta_cache.flush()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,146 @@
+import logging
+import threading
+import time
+from typing import Iterable, Optional
+
+import requests
+
+SOI = b'\xff\xd8'
+EOI = b'\xff\xd9'
+
+
+class MjpegStreamReader:
+    """
+    Keeps an MJPEG stream open and holds on to its latest JPEG frame.
+
+    The stream is read on a daemon thread that is started lazily by `start` and runs until `stop` is called.
+    Frames are cut from the multipart stream by their start (SOI) and end (EOI) markers, only the latest complete
+    frame is kept. If the connection drops, the reader reconnects with an exponential backoff.
+
+    Parameters:
+        uri (str): The URI of the MJPEG stream.
+        name (str): The name of the webcam, used for logging.
+        connect_timeout (float): Timeout in seconds to establish the connection.
+        read_timeout (float): Timeout in seconds between two chunks of the stream.
+        max_frame_bytes (int): Frames larger than this are dropped, protects against streams without EOI markers.
+    """
+
+    def __init__(self, uri: str, name: str, connect_timeout: float = 5.0, read_timeout: float = 10.0,
+                 max_frame_bytes: int = 8 * 1024 * 1024) -> None:
+        self.uri: str = uri
+        self.name: str = name
+        self.connect_timeout: float = connect_timeout
+        self.read_timeout: float = read_timeout
+        self.max_frame_bytes: int = max_frame_bytes
+        self.logger = logging.getLogger('mobileraker.webcam.stream')
+        self._session: requests.Session = requests.Session()
+        self._lock: threading.Lock = threading.Lock()
+        self._frame_ready: threading.Condition = threading.Condition(self._lock)
+        self._frame: Optional[bytes] = None
+        self._frame_time: float = 0
+        self._stop_event: threading.Event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._response: Optional[requests.Response] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop_event.is_set()
+
+    def start(self) -> None:
+        """
+        Starts reading the stream, if it is not already read.
+        """
+        if self.is_running:
+            return
+        # Each reader thread gets its own stop event, a thread that is still winding down after stop keeps its set event
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop_event,),
+                                        name=f'mobileraker-mjpeg-{self.name}', daemon=True)
+        self._thread.start()
+        self.logger.info("Started reading the MJPEG stream of %s at %s", self.name, self.uri)
+
+    def stop(self) -> None:
+        """
+        Stops reading the stream and drops the buffered frame.
+        """
+        if not self.is_running:
+            return
+        self._stop_event.set()
+        response = self._response
+        if response is not None:
+            # Unblocks the reader thread if it waits for the next chunk
+            response.close()
+        with self._lock:
+            self._frame = None
+        self.logger.info("Stopped reading the MJPEG stream of %s", self.name)
+
+    def latest_frame(self, max_age: float = 2.0) -> Optional[bytes]:
+        """
+        Returns the latest frame if it is not older than max_age seconds.
+        """
+        with self._lock:
+            if self._frame is not None and time.monotonic() - self._frame_time <= max_age:
+                return self._frame
+            return None
+
+    def wait_for_frame(self, timeout: float, max_age: float = 2.0) -> Optional[bytes]:
+        """
+        Returns the latest frame, waiting up to timeout seconds for one if there is no fresh frame yet.
+        Blocks the calling thread.
+        """
+        deadline = time.monotonic() + timeout
+        with self._frame_ready:
+            while self._frame is None or time.monotonic() - self._frame_time > max_age:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.is_running:
+                    return None
+                self._frame_ready.wait(remaining)
+            return self._frame
+
+    def _run(self, stop_event: threading.Event) -> None:
+        backoff = 1.0
+        while not stop_event.is_set():
+            try:
+                with self._session.get(self.uri, stream=True, timeout=(self.connect_timeout, self.read_timeout)) as res:
+                    res.raise_for_status()
+                    self._response = res
+                    backoff = 1.0
+                    self._read(res.iter_content(chunk_size=16 * 1024), stop_event)
+            except requests.exceptions.RequestException as e:
+                if not stop_event.is_set():
+                    self.logger.warning("MJPEG stream of %s failed, retrying in %.0f seconds: %s", self.name, backoff, e)
+            except Exception as e:  # A closed response can surface as various low level errors
+                if not stop_event.is_set():
+                    self.logger.warning("Error reading the MJPEG stream of %s: %s", self.name, e)
+            finally:
+                if stop_event is self._stop_event:
+                    self._response = None
+            stop_event.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def _read(self, chunks: Iterable[bytes], stop_event: threading.Event) -> None:
+        buffer = bytearray()
+        for chunk in chunks:
+            if stop_event.is_set():
+                return
+            buffer += chunk
+            while True:
+                start = buffer.find(SOI)
+                if start < 0:
+                    # Keep the last byte, it might be the first half of a marker
+                    del buffer[:-1]
+                    break
+                end = buffer.find(EOI, start + 2)
+                if end < 0:
+                    del buffer[:start]
+                    if len(buffer) > self.max_frame_bytes:
+                        buffer.clear()
+                    break
+                self._set_frame(bytes(buffer[start:end + 2]))
+                del buffer[:end + 2]
+
+    def _set_frame(self, frame: bytes) -> None:
+        with self._frame_ready:
+            self._frame = frame
+            self._frame_time = time.monotonic()
+            self._frame_ready.notify_all()
@@ -1,8 +1,11 @@
+import asyncio
 import logging
 from asyncio import AbstractEventLoop
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from mobileraker.data.dtos.mobileraker.companion_request_dto import FcmRequestDto
 
@@ -11,15 +14,23 @@ class MobilerakerFcmClient:
     """
     A client class to communicate with the mobileraker server using Firebase Cloud Messaging (FCM) to push notifications.
 
+    The client is meant to be shared by all printers of a companion process. Requests are sent through a single
+    keep-alive connection pool and executed on a small, bounded worker pool, so a slow backend never blocks the event loop.
+
     Attributes:
         fcm_uri (str): The URI for the mobileraker FCM server.
         loop (AbstractEventLoop): The asyncio event loop.
+        max_concurrent_requests (int): Maximum number of push requests that are in flight at the same time.
+        request_timeout (float): Deadline in seconds for a single push, including the time it waits for a free worker.
     """
 
     def __init__(
         self,
         fcm_uri: str,
         loop: AbstractEventLoop,
+        max_concurrent_requests: int = 4,
+        request_timeout: float = 30.0,
+        connect_timeout: float = 5.0,
     ) -> None:
         """
         Initialize the MobilerakerFcmClient.
@@ -27,32 +38,62 @@ class MobilerakerFcmClient:
         Args:
             fcm_uri (str): The URI for the mobileraker FCM server.
             loop (AbstractEventLoop): The asyncio event loop.
+            max_concurrent_requests (int): Maximum number of push requests that are in flight at the same time.
+            request_timeout (float): Deadline in seconds for a single push.
+            connect_timeout (float): Timeout in seconds to establish a new connection to the server.
         """
         self.fcm_uri: str = fcm_uri
         self.loop: AbstractEventLoop = loop
+        self.max_concurrent_requests: int = max_concurrent_requests
+        self.request_timeout: float = request_timeout
+        self.connect_timeout: float = connect_timeout
         self.logger = logging.getLogger('mobileraker.fcm')
 
-    def push(self, request: FcmRequestDto,) -> Optional[requests.Response]:
+        # One pooled session for the whole process, the pool is sized to match the worker count so every worker can keep its connection alive
+        self._session: requests.Session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrent_requests)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=max_concurrent_requests, thread_name_prefix='mobileraker-fcm')
+
+    async def push(self, request: FcmRequestDto, timeout: Optional[float] = None) -> Optional[requests.Response]:
         """
-        Push notifications to the mobileraker server.
+        Push notifications to the mobileraker server without blocking the event loop.
 
         Args:
             request (FcmRequestDto): The request containing the notifications to be pushed.
+            timeout (Optional[float]): Deadline in seconds for this push. Defaults to request_timeout.
 
         Returns:
             Optional[requests.Response]: The response from the mobileraker server, or None if an error occurred.
 
         Raises:
             requests.exceptions.RequestException: If there was an error while communicating with the mobileraker server.
+            asyncio.TimeoutError: If the push did not complete within its deadline.
         """
+        deadline = self.request_timeout if timeout is None else timeout
         jsons = request.toJSON()
         self.logger.info("Submitting %i device-requets to mobileraker server", len(
             request.device_requests))
         self.logger.debug("Sending to firebase fcm (%s): %s",
                           self.fcm_uri, jsons)
+
+        future = self.loop.run_in_executor(self._executor, self._post, jsons, deadline)
+        try:
+            return await asyncio.wait_for(future, timeout=deadline)
+        except asyncio.TimeoutError:
+            self.logger.error(
+                "Push to the mobileraker server did not complete within %.1f seconds", deadline)
+            raise
+
+    def _post(self, jsons: Dict[str, Any], timeout: float) -> requests.Response:
+        """
+        Blocking part of the push, executed on the worker pool.
+        """
         try:
-            res = requests.post(
-                f'{self.fcm_uri}/companion/v2/update', json=jsons, timeout=30
+            res = self._session.post(
+                f'{self.fcm_uri}/companion/v2/update', json=jsons, timeout=(self.connect_timeout, timeout)
             )
             # Handle error responses, log warnings, etc.
             if res.status_code != 200:
@@ -70,3 +111,10 @@ class MobilerakerFcmClient:
                 "Error while communicating with the mobileraker server: %s", err)
             # Propagate the exception to the caller
             raise
+
+    def close(self) -> None:
+        """
+        Release the worker pool and all pooled connections.
+        """
+        self._executor.shutdown(wait=False)
+        self._session.close()
@@ -1,13 +1,16 @@
 import asyncio
-import json
 import logging
-import random
 from asyncio import AbstractEventLoop, Future, Task
 from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, cast
 
 
 from websockets import client, exceptions, typing, connection
 
+from mobileraker.client.pending_requests import PendingRequests
+from mobileraker.client.session_recorder import SessionRecorder
+from mobileraker.util.json_codec import JsonCodec, get_codec
+from mobileraker.util.metrics import Metrics, get_metrics
+
 
 class MoonrakerClient:
     def __init__(
@@ -16,6 +19,8 @@ class MoonrakerClient:
             moonraker_api: Optional[str],
             printer_name: str,
             loop: AbstractEventLoop,
+            codec: Optional[JsonCodec] = None,
+            recorder: Optional[SessionRecorder] = None,
     ) -> None:
         super().__init__()
         self.moonraker_uri: str = moonraker_uri
@@ -23,12 +28,14 @@ class MoonrakerClient:
         self._loop: AbstractEventLoop = loop
         self._websocket: Optional[client.WebSocketClientProtocol] = None
         self._method_callbacks: Dict[str, List[Callable]] = {}
-        self._req_cb: Dict[int, Callable[[
-            Dict[str, Any], Optional[str]], Any]] = {}
-        self._req_blocking: Dict[int, Future] = {}
         self._rec_task: Optional[Task] = None
         self._logger: logging.Logger = logging.getLogger(f'mobileraker.{printer_name}.jrpc')
+        self.metrics: Metrics = get_metrics(printer_name)
+        self._pending: PendingRequests = PendingRequests(loop, self.metrics, self._logger)
         self._connection_listeners: List[Callable[[bool], None]] = []
+        self._codec: JsonCodec = codec if codec is not None else get_codec()
+        self._logger.info("Using %s to encode/decode JSON-RPC messages", self._codec.name)
+        self._recorder: Optional[SessionRecorder] = recorder
 
     async def connect(self) -> None:
         '''
@@ -64,6 +71,8 @@ class MoonrakerClient:
             except Exception as err:
                 self._logger.info("Unexpected exception occured %s", err)
             finally:
+                # Responses of the closed connection will never arrive
+                self._pending.fail_all(ConnectionError('Websocket connection closed'))
                 self._notify_connection_listeners(False)
 
     async def send_method(self, method: str, callback: Optional[Callable[[Dict[str, Any], Optional[str]], Any]] = None, params: Optional[dict] = None, timeout: float = 10.0) -> int:
@@ -80,6 +89,8 @@ class MoonrakerClient:
             callback (Optional[Callable]): A function that will be called with the response
                                         when received from the server (optional).
             params (Optional[dict]): Parameters to be included in the JSON-RPC request (optional).
+            timeout (float): Timeout for sending the request. If a callback is provided, it is dropped if no
+                             response was received within this time.
 
         Returns:
             int: The request ID associated with the sent JSON-RPC request.
@@ -92,12 +103,18 @@ class MoonrakerClient:
             self._logger.error('Websocket is not yet connected?')
             raise ConnectionError('Websocket is NONE')
         req_dict = self._construct_json_rpc(method, params)
-        message_json: str = json.dumps(req_dict)
+        message_json: str = self._codec.dumps(req_dict)
         if callback:
-            self._req_cb[req_dict["id"]] = callback
+            self._pending.add_callback(req_dict["id"], callback, timeout)
 
         self._logger.debug("Sending message %s", message_json)
-        await asyncio.wait_for(self._websocket.send(message_json), timeout=timeout)
+        if self._recorder is not None:
+            self._recorder.record('out', message_json)
+        try:
+            await asyncio.wait_for(self._websocket.send(message_json), timeout=timeout)
+        except BaseException:
+            self._pending.discard(req_dict["id"])
+            raise
         return req_dict["id"]
 
     async def send_and_receive_method(self, method: str, params: Optional[dict] = None, timeout: float = 10.0) -> Tuple[
@@ -127,16 +144,22 @@ class MoonrakerClient:
             self._logger.error('Websocket is not yet connected?')
             raise ConnectionError('Websocket is NONE')
         req_dict = self._construct_json_rpc(method, params)
-        message_json = json.dumps(req_dict)
+        message_json = self._codec.dumps(req_dict)
         m_id = req_dict["id"]
-        response_future = self._loop.create_future()
-
-        self._req_cb[m_id] = self._receive_blocking_cb
-        self._req_blocking[m_id] = response_future
+        response_future = self._pending.add_future(m_id, timeout)
 
         self._logger.debug("Sending message (Blocking) %s", message_json)
-        await asyncio.wait_for(self._websocket.send(message_json), timeout=timeout)
-        return await asyncio.wait_for(response_future, timeout=timeout)
+        if self._recorder is not None:
+            self._recorder.record('out', message_json)
+        try:
+            await asyncio.wait_for(self._websocket.send(message_json), timeout=timeout)
+            return await asyncio.wait_for(response_future, timeout=timeout)
+        finally:
+            # Never leave the request behind, no matter if it was answered, timed out or failed
+            self._pending.discard(m_id)
+            # The future is failed if the connection closes while the request is still being sent
+            if response_future.done() and not response_future.cancelled():
+                response_future.exception()
 
     def register_method_listener(self, method: str, callback: Callable) -> None:
         '''
@@ -183,40 +206,35 @@ class MoonrakerClient:
     async def _start_receiving(self) -> None:
         if self._websocket:
             async for message in self._websocket:
+                if self._recorder is not None:
+                    self._recorder.record('in', message)
                 await self._process_message(message)
         else:
             self._logger.error('The websocket connection is none?')
 
     async def _process_message(self, message: typing.Data) -> None:
-        response: Dict[str, Any] = json.loads(message)
+        try:
+            response: Dict[str, Any] = self._codec.loads(message)
+        except ValueError as err:
+            # A single malformed frame must not end the receive loop (and with it the connection)
+            self._logger.warning("Dropping a message that is not valid JSON: %s", err)
+            return
         mid = response.get("id")
         if "error" in response and "message" in response["error"]:
             self._logger.warning(
                 "Error message received from WebSocket-Server %s", response["error"]["message"])
-            if mid and mid in self._req_cb:
-                callback = self._req_cb.pop(mid)
-
-                if asyncio.iscoroutinefunction(callback):
-                    self._loop.create_task(
-                        callback(response, response["error"]["message"]))
-                else:
-                    callback(response, response["error"]["message"])
+            if mid is not None:
+                self._resolve_request(mid, response, response["error"]["message"])
         else:
             mmethod: str = cast(str, response.get("method"))
 
-            if mid and self._req_cb:
-                if mid in self._req_cb:
+            if mid is not None:
+                self._logger.debug(
+                    "Received a response to request: %s", mid)
+                if not self._resolve_request(mid, response, None):
+                    # Requests sent without a callback and expired requests have no pending entry
                     self._logger.debug(
-                        "Received a response to request: %s", mid)
-                    callback = self._req_cb.pop(mid)
-
-                    if asyncio.iscoroutinefunction(callback):
-                        self._loop.create_task(callback(response, None))
-                    else:
-                        callback(response, None)
-                else:
-                    self._logger.error(
-                        "Received a response to unknown request: %s", mid)
+                        "Received a response to a request that is not awaited: %s", mid)
             else:
                 self._logger.debug(
                     "Received a method notification for method: %s", mmethod)
@@ -225,23 +243,25 @@ class MoonrakerClient:
                     for listener in to_call:
                         listener(response)  # provide the raw entire message!
 
-    async def _receive_blocking_cb(self, message: Dict[str, Any], err=None):
-        mid: int = cast(int, message.get("id"))
-        if mid in self._req_blocking:
-            response_future = self._req_blocking.pop(mid)
-            response_future.set_result((message, err))
+    def _resolve_request(self, mid: Any, message: Dict[str, Any], err: Optional[str]) -> bool:
+        entry = self._pending.pop(mid)
+        if entry is None:
+            return False
+
+        if isinstance(entry, Future):
+            if not entry.done():
+                entry.set_result((message, err))
+        elif asyncio.iscoroutinefunction(entry):
+            self._loop.create_task(entry(message, err))
         else:
-            self._logger.error('MessageID: %s had no callback?', mid)
+            entry(message, err)
+        return True
 
     def _construct_json_rpc(self, method: str, params: Optional[dict] = None) -> dict:
-        while True:
-            id = random.randrange(10000)
-            if id not in self._req_cb.keys():
-                break
         req = {
             "jsonrpc": "2.0",
             "method": method,
-            "id": id
+            "id": self._pending.next_id()
         }
         if params:
             req["params"] = params
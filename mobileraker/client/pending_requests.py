@@ -0,0 +1,143 @@
+import asyncio
+import itertools
+import logging
+import math
+from asyncio import AbstractEventLoop, Future, Task
+from typing import Any, Callable, Dict, Iterator, Optional, Set, Union
+
+from mobileraker.util.metrics import Metrics
+
+ResponseCallback = Callable[[Dict[str, Any], Optional[str]], Any]
+
+
+class PendingRequests:
+    '''
+    Registry of the JSON-RPC requests that are waiting for a response.
+
+    Request IDs are taken from a monotonic counter, so allocating one is O(1) and never collides with an in-flight request.
+    Every entry has a deadline. Deadlines are tracked in a timing wheel with slots of `tick` seconds: a sweeper task wakes
+    up once per tick while requests are pending and expires the due slots, failing waiting futures with an asyncio.TimeoutError.
+    The sweeper only runs while the registry is not empty.
+
+    Metrics (prefixed with "jrpc."):
+        in_flight: The number of pending requests.
+        timeouts: Requests that expired without a response.
+        failed: Requests that were failed because the connection was closed.
+
+    Attributes:
+        loop (AbstractEventLoop): The event loop used for the futures and the sweeper task.
+        metrics (Metrics): The metrics collection the registry reports to.
+        tick (float): The resolution of the timing wheel in seconds.
+    '''
+
+    def __init__(self, loop: AbstractEventLoop, metrics: Metrics, logger: logging.Logger, tick: float = 1.0) -> None:
+        self._loop: AbstractEventLoop = loop
+        self._metrics: Metrics = metrics
+        self._logger: logging.Logger = logger
+        self._tick: float = tick
+        self._ids: Iterator[int] = itertools.count(1)
+        self._entries: Dict[int, Union[Future, ResponseCallback]] = {}
+        self._slot_of: Dict[int, int] = {}
+        self._wheel: Dict[int, Set[int]] = {}
+        self._sweeper: Optional[Task] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, mid: object) -> bool:
+        return mid in self._entries
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add_future(self, mid: int, timeout: float) -> Future:
+        '''
+        Register a request whose response is awaited through the returned future.
+        The future resolves to a tuple of (response, error).
+        '''
+        future = self._loop.create_future()
+        self._add(mid, future, timeout)
+        return future
+
+    def add_callback(self, mid: int, callback: ResponseCallback, timeout: float) -> None:
+        '''
+        Register a request whose response is handed to the callback.
+        If the deadline passes first, the callback is dropped without being called.
+        '''
+        self._add(mid, callback, timeout)
+
+    def pop(self, mid: Any) -> Optional[Union[Future, ResponseCallback]]:
+        '''
+        Remove and return the entry of the given request, or None if the request is unknown (e.g. already expired).
+        '''
+        entry = self._entries.pop(mid, None)
+        if entry is None:
+            return None
+        slot = self._slot_of.pop(mid)
+        bucket = self._wheel.get(slot)
+        if bucket is not None:
+            bucket.discard(mid)
+            if not bucket:
+                del self._wheel[slot]
+        self._metrics.set('jrpc.in_flight', len(self._entries))
+        return entry
+
+    def discard(self, mid: int) -> None:
+        self.pop(mid)
+
+    def fail_all(self, exc: BaseException) -> None:
+        '''
+        Fail all pending requests, e.g. because the connection was closed.
+        Futures receive the exception, callbacks are dropped.
+        '''
+        if not self._entries:
+            return
+        self._logger.info("Failing %i pending requests: %s", len(self._entries), exc)
+        self._metrics.inc('jrpc.failed', len(self._entries))
+        entries = list(self._entries.values())
+        self._entries.clear()
+        self._slot_of.clear()
+        self._wheel.clear()
+        self._metrics.set('jrpc.in_flight', 0)
+        for entry in entries:
+            if isinstance(entry, Future) and not entry.done():
+                entry.set_exception(exc)
+
+    def expire(self, now: float) -> int:
+        '''
+        Expire all requests whose slot is due at the given loop time.
+
+        Returns:
+            int: The number of expired requests.
+        '''
+        due = [slot for slot in self._wheel if slot * self._tick <= now]
+        expired = 0
+        for slot in due:
+            for mid in list(self._wheel.get(slot, ())):
+                entry = self.pop(mid)
+                if entry is None:
+                    continue
+                expired += 1
+                if isinstance(entry, Future):
+                    if not entry.done():
+                        entry.set_exception(asyncio.TimeoutError(f'No response for request {mid}'))
+                else:
+                    self._logger.warning("Request %i timed out, its callback is dropped", mid)
+        if expired:
+            self._metrics.inc('jrpc.timeouts', expired)
+        return expired
+
+    def _add(self, mid: int, entry: Union[Future, ResponseCallback], timeout: float) -> None:
+        # Round up, so an entry never expires before its deadline
+        slot = math.ceil((self._loop.time() + timeout) / self._tick)
+        self._entries[mid] = entry
+        self._slot_of[mid] = slot
+        self._wheel.setdefault(slot, set()).add(mid)
+        self._metrics.set('jrpc.in_flight', len(self._entries))
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = self._loop.create_task(self._sweep())
+
+    async def _sweep(self) -> None:
+        while self._entries:
+            await asyncio.sleep(self._tick)
+            self.expire(self._loop.time())
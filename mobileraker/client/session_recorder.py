@@ -0,0 +1,162 @@
+import gzip
+import json
+import logging
+import queue
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import IO, Any, Dict, List, Optional, Tuple, Union
+
+# A recorded frame: (seconds since the recording started, direction "in"/"out", raw frame)
+RecordedFrame = Tuple[float, str, str]
+
+RECORDING_FORMAT = 'mobileraker-recording'
+RECORDING_VERSION = 1
+
+# Keys of the device configs (mobileraker.fcm namespace) that hold credentials, their values are never recorded
+REDACTED_KEYS = ('fcmToken', 'liveActivity')
+REDACTED = 'REDACTED'
+
+
+def redact(frame: str) -> str:
+    '''
+    Replace the values of the REDACTED_KEYS in a JSON frame. Frames that do not contain any of the keys are returned
+    as they are, without parsing them.
+    '''
+    if not any(f'"{key}"' in frame for key in REDACTED_KEYS):
+        return frame
+    try:
+        return json.dumps(_redact(json.loads(frame)), separators=(',', ':'))
+    except ValueError:
+        return frame
+
+
+def _redact(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {key: REDACTED if key in REDACTED_KEYS and isinstance(value, str) and value else _redact(value)
+                for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_redact(value) for value in obj]
+    return obj
+
+
+class SessionRecorder:
+    '''
+    Records the websocket traffic between the companion and Moonraker.
+
+    The recording is a gzip compressed JSON-lines file. The first line is a header object, every following
+    line is a frame in the form [offset, direction, raw], where offset are the seconds since the recording started
+    and direction is either "in" (received from Moonraker) or "out" (sent to Moonraker).
+
+    Frames are queued and written by a writer thread, so compressing and writing never blocks the event loop.
+    The device tokens (see REDACTED_KEYS) are replaced before a frame is written. Everything else is recorded as
+    is, e.g. the printer's file names, webcam URLs and the device configs.
+
+    Attributes:
+        path (str): The file the recording is written to.
+        printer_name (str): The name of the recorded printer.
+    '''
+
+    def __init__(self, path: str, printer_name: str, flush_interval: float = 5.0) -> None:
+        self.path: str = path
+        self.printer_name: str = printer_name
+        self._flush_interval: float = flush_interval
+        self._logger: logging.Logger = logging.getLogger(f'mobileraker.{printer_name}.recorder')
+        self._file: Optional[IO[str]] = gzip.open(path, 'wt', encoding='utf-8')
+        self._start: float = time.monotonic()
+        self._frames: int = 0
+        self._queue: 'queue.SimpleQueue[Optional[RecordedFrame]]' = queue.SimpleQueue()
+        self._closed: bool = False
+        self._write({
+            "format": RECORDING_FORMAT,
+            "version": RECORDING_VERSION,
+            "printer": printer_name,
+            "started": datetime.now().isoformat(),
+        })
+        self._thread: threading.Thread = threading.Thread(
+            target=self._run, name=f'recorder-{printer_name}', daemon=True)
+        self._thread.start()
+        self._logger.warning("Recording websocket traffic to %s. The recording contains the printer's data and the "
+                             "device configs (device tokens are redacted), only share it with people you trust.", path)
+
+    def record(self, direction: str, raw: Union[str, bytes]) -> None:
+        '''
+        Record a single frame.
+
+        Args:
+            direction (str): "in" for frames received from Moonraker, "out" for frames sent to Moonraker.
+            raw (Union[str, bytes]): The raw frame.
+        '''
+        if self._closed:
+            return
+        self._queue.put((round(time.monotonic() - self._start, 4), direction,
+                         raw.decode('utf-8') if isinstance(raw, bytes) else raw))
+
+    def close(self) -> None:
+        '''
+        Write the queued frames and close the recording.
+        '''
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()  # type: ignore
+        self._file = None
+        self._logger.info("Recorded %i frames to %s", self._frames, self.path)
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        while True:
+            try:
+                frame = self._queue.get(timeout=self._flush_interval)
+                if frame is None:
+                    return
+                offset, direction, raw = frame
+                self._write([offset, direction, redact(raw)])
+                self._frames += 1
+            except queue.Empty:
+                pass
+            # Keep the recording usable if the companion is killed
+            now = time.monotonic()
+            if now - last_flush >= self._flush_interval:
+                self._file.flush()  # type: ignore
+                last_flush = now
+
+    def _write(self, obj: Any) -> None:
+        self._file.write(json.dumps(obj, separators=(',', ':')))  # type: ignore
+        self._file.write('\n')  # type: ignore
+
+
+def load_recording(path: str) -> Tuple[Dict[str, Any], List[RecordedFrame]]:
+    '''
+    Load a recording written by the SessionRecorder.
+    A truncated recording (e.g. the companion was killed) is loaded up to the last complete frame.
+
+    Args:
+        path (str): The recording file.
+
+    Returns:
+        Tuple[Dict[str, Any], List[RecordedFrame]]: The header and the recorded frames.
+
+    Raises:
+        ValueError: If the file is not a recording.
+    '''
+    header: Optional[Dict[str, Any]] = None
+    frames: List[RecordedFrame] = []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if header is None:
+                    header = json.loads(line)
+                    if not isinstance(header, dict) or header.get('format') != RECORDING_FORMAT:
+                        raise ValueError(f'{path} is not a mobileraker recording')
+                    continue
+                offset, direction, raw = json.loads(line)
+                frames.append((offset, direction, raw))
+        except (EOFError, zlib.error, json.JSONDecodeError):
+            pass
+    if header is None:
+        raise ValueError(f'{path} is empty')
+    return header, frames
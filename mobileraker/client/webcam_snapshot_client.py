@@ -1,13 +1,30 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 import logging
-from typing import Optional, Union
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 
-from PIL import Image, ImageOps
+from PIL import Image
 import requests
 
+from mobileraker.client.mjpeg_stream_reader import MjpegStreamReader
 from mobileraker.data.dtos.moonraker.webcam_data import WebcamData
 
 
+class SnapshotVariant(NamedTuple):
+    """
+    A size a snapshot is rendered in.
+    """
+    name: str
+    max_width: int
+    quality: int
+
+
+# Pillow's ROTATE_* transposes turn counter clockwise, the configured rotation is clockwise
+_CLOCKWISE_TRANSPOSES = {90: Image.ROTATE_270, 180: Image.ROTATE_180, 270: Image.ROTATE_90}
+
 
 class WebcamSnapshotClient:
     """
@@ -17,6 +34,8 @@ class WebcamSnapshotClient:
         uri_or_data (Union[str, WebcamData]): Either a URI string or WebcamData object.
         base_url (str, optional): Base URL of the server to prepend for relative paths. Default is "http://localhost".
         rotation (int, optional): Fallback rotation angle if URI is provided directly. Default is 0.
+        stream_uri (str, optional): URI of an MJPEG stream of the webcam. If set, captures are taken from the stream
+            and the snapshot URI is only used as fallback. Default is None.
 
     Attributes:
         uri (str): The URI to fetch the snapshot from.
@@ -25,9 +44,27 @@ class WebcamSnapshotClient:
         flip_horizontal (bool): Whether to flip the image horizontally.
         flip_vertical (bool): Whether to flip the image vertically.
         logger (logging.Logger): The logger instance for logging messages.
+
+    If a stream URI is set, the MJPEG stream is opened by the first capture and kept open, so later captures use the
+    latest frame of the stream instead of requesting a new snapshot. Call `stop_stream` once no captures are expected
+    for a while, the stream is opened again by the next capture.
+
+    All clients (of all printers) share one keep-alive HTTP session and two bounded worker pools. The blocking HTTP
+    fetches run on the fetch pool, so snapshots of several webcams are downloaded at the same time. The CPU heavy
+    decode/transform/encode steps run on the smaller processing pool. Capturing never blocks the event loop.
+    The session and the pools are created by the first capture, `close_shared` releases them on shutdown.
     """
 
-    def __init__(self, uri_or_data: Union[str, WebcamData], base_url: str = "http://localhost", rotation: int = 0) -> None:
+    _shared_lock: threading.Lock = threading.Lock()
+    _shared_fetch_executor: Optional[ThreadPoolExecutor] = None
+    _shared_executor: Optional[ThreadPoolExecutor] = None
+    _shared_session: Optional[requests.Session] = None
+
+    # Seconds a capture waits for the first frame of a freshly opened stream before falling back to a snapshot
+    STREAM_WAIT: float = 2.0
+
+    def __init__(self, uri_or_data: Union[str, WebcamData], base_url: str = "http://localhost", rotation: int = 0,
+                 stream_uri: Optional[str] = None) -> None:
         self.base_url = base_url.rstrip('/')
         
         if isinstance(uri_or_data, WebcamData):
@@ -44,7 +81,58 @@ class WebcamSnapshotClient:
             self.name = "Unknown"
             
         self.logger = logging.getLogger('mobileraker.webcam')
-        
+        self.stream_uri = self._normalize_uri(stream_uri) if stream_uri else None
+        self._stream: Optional[MjpegStreamReader] = MjpegStreamReader(
+            self.stream_uri, self.name) if self.stream_uri else None
+
+    @staticmethod
+    def _fetch_pool() -> ThreadPoolExecutor:
+        with WebcamSnapshotClient._shared_lock:
+            if WebcamSnapshotClient._shared_fetch_executor is None:
+                # Fetching mostly waits on the network, so several webcams can be fetched in parallel
+                WebcamSnapshotClient._shared_fetch_executor = ThreadPoolExecutor(
+                    max_workers=8, thread_name_prefix='mobileraker-webcam-fetch')
+            return WebcamSnapshotClient._shared_fetch_executor
+
+    @staticmethod
+    def _process_pool() -> ThreadPoolExecutor:
+        with WebcamSnapshotClient._shared_lock:
+            if WebcamSnapshotClient._shared_executor is None:
+                # Decoding and encoding a frame is CPU bound, two workers are plenty on Pi-class hosts
+                WebcamSnapshotClient._shared_executor = ThreadPoolExecutor(
+                    max_workers=2, thread_name_prefix='mobileraker-webcam')
+            return WebcamSnapshotClient._shared_executor
+
+    @staticmethod
+    def _http_session() -> requests.Session:
+        with WebcamSnapshotClient._shared_lock:
+            if WebcamSnapshotClient._shared_session is None:
+                WebcamSnapshotClient._shared_session = requests.Session()
+            return WebcamSnapshotClient._shared_session
+
+    @staticmethod
+    def close_shared() -> None:
+        """
+        Release the worker pools and the pooled connections shared by all clients.
+        A later capture creates them again.
+        """
+        with WebcamSnapshotClient._shared_lock:
+            for executor in (WebcamSnapshotClient._shared_fetch_executor, WebcamSnapshotClient._shared_executor):
+                if executor is not None:
+                    executor.shutdown(wait=False)
+            if WebcamSnapshotClient._shared_session is not None:
+                WebcamSnapshotClient._shared_session.close()
+            WebcamSnapshotClient._shared_fetch_executor = None
+            WebcamSnapshotClient._shared_executor = None
+            WebcamSnapshotClient._shared_session = None
+
+    def stop_stream(self) -> None:
+        """
+        Closes the MJPEG stream, if it is open.
+        """
+        if self._stream is not None:
+            self._stream.stop()
+
     def _normalize_uri(self, uri: str) -> str:
         """
         Normalize the URI by adding base_url if it's a relative path.
@@ -68,53 +156,164 @@ class WebcamSnapshotClient:
         else:
             return f"{self.base_url}/{uri}"
 
-    def capture_snapshot(self, max_width: int = 1024, quality: int = 85) -> Optional[bytes]:
+    async def capture_snapshot(self, max_width: int = 1024, quality: int = 85, timeout: float = 5.0) -> Optional[bytes]:
         """
-        Captures and processes a snapshot from the webcam.
+        Captures and processes a snapshot from the webcam without blocking the event loop.
 
         Args:
             max_width (int): Maximum width for the image, will scale proportionally. Default is 1024.
             quality (int): JPEG compression quality (1-100). Default is 85.
+            timeout (float): Latency budget in seconds for the whole capture (fetch and processing). Default is 5.
 
         Returns:
             Optional[bytes]: The processed snapshot image as bytes if successful, or None on failure.
         """
+        images = await self.capture_variants([SnapshotVariant('snapshot', max_width, quality)], timeout)
+        return images.get('snapshot')
+
+    async def capture_variants(self, variants: Sequence[SnapshotVariant], timeout: float = 5.0) -> Dict[str, bytes]:
+        """
+        Captures a snapshot from the webcam and renders it in several sizes, from a single fetch and decode.
+
+        Args:
+            variants (Sequence[SnapshotVariant]): The sizes to render.
+            timeout (float): Latency budget in seconds for the whole capture (fetch and processing). Default is 5.
+
+        Returns:
+            Dict[str, bytes]: The rendered images by variant name, empty on failure.
+        """
         self.logger.info("Capturing snapshot from webcam: %s at %s", self.name, self.uri)
+        start = time.monotonic()
         try:
-            res = requests.get(self.uri, timeout=5)
-            res.raise_for_status()
+            images = await asyncio.wait_for(self._capture(variants, timeout), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.logger.error("Capturing snapshot from %s exceeded its budget of %.1f seconds", self.name, timeout)
+            return {}
 
-            image = Image.open(BytesIO(res.content)).convert("RGB")
-            
-            # Resize the image if width exceeds max_width
-            if image.width > max_width:
-                image = image.resize((max_width, int(image.height * (max_width / image.width))))
-            
-            # Apply transformations
-            if self.flip_horizontal:
-                image = ImageOps.mirror(image)
-            if self.flip_vertical:
-                image = ImageOps.flip(image)
-            if self.rotation:
-                image = image.rotate(-self.rotation)
-                
-            # Convert to JPEG
-            buffered = BytesIO()
-            image.save(buffered, format="JPEG", optimize=True, quality=quality)
-            
-            self.logger.info(
-                "Snapshot captured successfully! Applied transformations: rotation=%i°, flip_h=%s, flip_v=%s", 
-                self.rotation, self.flip_horizontal, self.flip_vertical
-            )
-            return buffered.getvalue()
-            
+        if images:
+            self.logger.info("Snapshot of %s took %.0f ms", self.name, (time.monotonic() - start) * 1000)
+        return images
+
+    async def _capture(self, variants: Sequence[SnapshotVariant], timeout: float) -> Dict[str, bytes]:
+        loop = asyncio.get_running_loop()
+        content = None
+        if self._stream is not None:
+            self._stream.start()
+            content = self._stream.latest_frame()
+            if content is None:
+                content = await loop.run_in_executor(
+                    self._fetch_pool(), self._stream.wait_for_frame, min(self.STREAM_WAIT, timeout / 2))
+            if content is None:
+                self.logger.warning("No frame received from the stream of %s, requesting a snapshot", self.name)
+        if content is None:
+            content = await loop.run_in_executor(self._fetch_pool(), self._fetch, timeout)
+        if content is None:
+            return {}
+        return await loop.run_in_executor(self._process_pool(), self._process_variants, content, variants)
+
+    def _fetch(self, timeout: float) -> Optional[bytes]:
+        """
+        Fetches the raw snapshot from the webcam. Executed on the fetch pool.
+        """
+        try:
+            res = self._http_session().get(self.uri, timeout=timeout)
+            res.raise_for_status()
+            return res.content
         except requests.exceptions.ConnectionError:
             self.logger.error("Could not connect to webcam: %s", self.name)
         except requests.exceptions.Timeout:
             self.logger.error("Connection to webcam timed out: %s", self.name)
         except requests.exceptions.RequestException as e:
             self.logger.error("HTTP error while connecting to webcam: %s - %s", self.name, str(e))
+        return None
+
+    def _process(self, content: bytes, max_width: int, quality: int) -> Optional[bytes]:
+        """
+        Decodes, transforms and re-encodes the raw snapshot in a single size.
+        """
+        return self._process_variants(content, [SnapshotVariant('snapshot', max_width, quality)]).get('snapshot')
+
+    def _process_variants(self, content: bytes, variants: Sequence[SnapshotVariant]) -> Dict[str, bytes]:
+        """
+        Decodes, transforms and re-encodes the raw snapshot in every variant. Executed on the processing pool.
+
+        The frame is decoded once, at the size of the largest variant, and every variant is scaled down from it.
+        JPEGs are scaled down by the decoder (draft mode) and right-angle rotations and flips are lossless transposes.
+        Variants of a JPEG that needs no transformation and already fits their max_width get the frame as is,
+        without re-encoding.
+        As before, max_width limits the width of the frame before it is rotated, rotated snapshots keep the pixel count.
+        """
+        images: Dict[str, bytes] = {}
+        try:
+            image = Image.open(BytesIO(content))
+            rotation = self.rotation % 360
+            transposes = self._transposes(rotation)
+            # Any other angle can not be transposed and is rotated with resampling
+            free_rotation = rotation if rotation not in (0, 90, 180, 270) else 0
+            source_size = image.size
+            source_width = image.width
+
+            remaining = []
+            for variant in sorted(variants, key=lambda v: v.max_width, reverse=True):
+                if image.format == "JPEG" and source_width <= variant.max_width and not transposes and not free_rotation:
+                    images[variant.name] = content
+                else:
+                    remaining.append(variant)
+            if not remaining:
+                self.logger.info("Snapshot captured successfully! Passed through without re-encoding")
+                return images
+
+            if image.format == "JPEG" and remaining[0].max_width < source_width:
+                # The decoder skips the DCT work for 1/2, 1/4 and 1/8 of the size, the result is at least the
+                # size of the largest variant
+                image.draft("RGB", self._scaled(source_size, remaining[0].max_width / source_width))
+            frame = image.convert("RGB")
+
+            for variant in remaining:
+                size = self._scaled(source_size, min(1.0, variant.max_width / source_width))
+                # The decoded frame is reduced by an integer factor (cheap box filter) and then resized by
+                # less than a factor of 2 to the exact size, which is much cheaper than a single large resize
+                scaled = frame
+                factor = min(scaled.width // size[0], scaled.height // size[1])
+                if factor >= 2:
+                    scaled = scaled.reduce(factor)
+                if scaled.size != size:
+                    scaled = scaled.resize(size, Image.BILINEAR)
+
+                # Apply transformations
+                for method in transposes:
+                    scaled = scaled.transpose(method)
+                if free_rotation:
+                    scaled = scaled.rotate(-free_rotation, expand=True)
+
+                # Convert to JPEG
+                buffered = BytesIO()
+                scaled.save(buffered, format="JPEG", optimize=True, quality=variant.quality)
+                images[variant.name] = buffered.getvalue()
+            
+            self.logger.info(
+                "Snapshot captured successfully! Applied transformations: rotation=%i°, flip_h=%s, flip_v=%s", 
+                self.rotation, self.flip_horizontal, self.flip_vertical
+            )
+            return images
         except Exception as e:
             self.logger.error("Error processing snapshot from %s: %s", self.name, str(e))
             
-        return None
+        return {}
+
+    @staticmethod
+    def _scaled(size: Tuple[int, int], scale: float) -> Tuple[int, int]:
+        return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+    def _transposes(self, rotation: int) -> List[int]:
+        """
+        The lossless transposes for the flips and the clockwise rotation, in the order they are applied.
+        """
+        methods = []
+        if self.flip_horizontal:
+            methods.append(Image.FLIP_LEFT_RIGHT)
+        if self.flip_vertical:
+            methods.append(Image.FLIP_TOP_BOTTOM)
+        if rotation in _CLOCKWISE_TRANSPOSES:
+            methods.append(_CLOCKWISE_TRANSPOSES[rotation])
+        return methods
@@ -236,8 +236,21 @@ class NotificationSnap:
             **kwargs: Keyword arguments to update the attributes.
 
         Returns:
-            NotificationSnap: A new instance with the updated attributes.
+            NotificationSnap: A new instance with the updated attributes, or this instance if none of them changed.
         """
+        if (
+            (progress is None or progress == self.progress) and
+            (progress_live_activity is None or progress_live_activity == self.progress_live_activity) and
+            (progress_progressbar is None or progress_progressbar == self.progress_progressbar) and
+            (state is None or state == self.state) and
+            (m117 is None or m117 == self.m117) and
+            (gcode_response is None or gcode_response == self.gcode_response) and
+            (filament_sensors is None or filament_sensors == self.filament_sensors) and
+            (last_progress is None or last_progress == self.last_progress) and
+            (last_progress_live_activity is None or last_progress_live_activity == self.last_progress_live_activity) and
+            (last_progress_progressbar is None or last_progress_progressbar == self.last_progress_progressbar)
+        ):
+            return self
 
         copied_snap = NotificationSnap(
             progress=self.progress if progress is None else progress,
@@ -261,6 +274,8 @@ class NotificationSnap:
         )
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, NotificationSnap):
             return False
 
@@ -1,8 +1,33 @@
-from copy import deepcopy
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple, TypeVar
+
+_T = TypeVar('_T')
+
+# The printer objects use __slots__, they are created for every status update and referenced by every snapshot.
+# They are never modified after they were created, updateWith returns a modified copy. Consecutive snapshots share
+# the objects that did not change.
+
+
+def _apply_updates(obj: _T, updates: Dict[str, Any]) -> _T:
+    '''
+    Returns a copy of obj with the given attribute updates applied.
+    If none of the updates changes a value, obj itself is returned, so callers can detect no-op updates by identity.
+    '''
+    if all(getattr(obj, key) == value for key, value in updates.items()):
+        return obj
+    cls = type(obj)
+    n = cls.__new__(cls)
+    for key in cls.__slots__:  # type: ignore
+        setattr(n, key, updates[key] if key in updates else getattr(obj, key))
+    return n
+
+
+def _slot_items(obj: Any) -> List[Tuple[str, Any]]:
+    return [(key, getattr(obj, key)) for key in type(obj).__slots__]
 
 
 class ServerInfo:
+    __slots__ = ('klippy_state', 'message')
+
     def __init__(
             self,
             klippy_state: str = "error",
@@ -13,21 +38,26 @@ class ServerInfo:
         self.message: Optional[str] = message
 
     def updateWith(self, json: Dict[str, Any]) -> 'ServerInfo':
-        n = deepcopy(self)
+        updates: Dict[str, Any] = {}
         if "klippy_state" in json:
-            n.klippy_state = json["klippy_state"]
+            updates["klippy_state"] = json["klippy_state"]
         if "result" in json:
-            n.message = json["result"]
-        return n
+            updates["message"] = json["result"]
+        return _apply_updates(self, updates)
     
     def __str__(self):
         return '%s(%s)' % (
             type(self).__name__,
-            ', '.join('%s=%s' % item for item in vars(self).items())
+            ', '.join('%s=%s' % item for item in _slot_items(self))
         )
 
 
 class PrintStats:
+    # Fields of the Klipper object that are subscribed to, only these are read by the companion
+    SUBSCRIPTION_FIELDS: List[str] = ['filename', 'total_duration', 'print_duration', 'filament_used', 'state', 'message', 'info']
+    __slots__ = ('filename', 'total_duration', 'total_layer', 'current_layer', 'print_duration', 'filament_used',
+                 'state', 'message')
+
     def __init__(
             self,
             filename: Optional[str] = None,
@@ -54,29 +84,24 @@ class PrintStats:
             self.filename, self.total_duration, self.print_duration, self.state, self.message)
 
     def updateWith(self, json: Dict[str, Any]) -> 'PrintStats':
-        n = deepcopy(self)
-
         info = json["info"] if "info" in json else {}
-        n.total_layer = info["total_layer"] if "total_layer" in info else None
-        n.current_layer = info["current_layer"] if "current_layer" in info else None
-
-        if "filename" in json:
-            n.filename = json["filename"]
-        if "total_duration" in json:
-            n.total_duration = json["total_duration"]
-        if "print_duration" in json:
-            n.print_duration = json["print_duration"]
-        if "state" in json:
-            n.state = json["state"]
-        if "message" in json:
-            n.message = json["message"]
-        if "filament_used" in json:
-            n.filament_used = json["filament_used"]
-        return n
+        updates: Dict[str, Any] = {
+            "total_layer": info["total_layer"] if "total_layer" in info else None,
+            "current_layer": info["current_layer"] if "current_layer" in info else None,
+        }
+
+        for key in ("filename", "total_duration", "print_duration", "state", "message", "filament_used"):
+            if key in json:
+                updates[key] = json[key]
+        return _apply_updates(self, updates)
 
 
 class DisplayStatus:
 
+    # Fields of the Klipper object that are subscribed to, only these are read by the companion
+    SUBSCRIPTION_FIELDS: List[str] = ['message', 'progress']
+    __slots__ = ('message', 'progress')
+
     def __init__(
             self,
             message: Optional[str] = None,
@@ -90,19 +115,23 @@ class DisplayStatus:
         return "DisplayStatus (progress: %f, message: %s)" % (self.progress, self.message)
 
     def updateWith(self, json: Dict[str, Any]) -> 'DisplayStatus':
-        n = deepcopy(self)
+        updates: Dict[str, Any] = {}
         # Message is M117
         if "message" in json:
-            n.message = json["message"].strip() if isinstance(
+            updates["message"] = json["message"].strip() if isinstance(
                 json["message"], str) else None
         if "progress" in json:
-            n.progress = json["progress"]
+            updates["progress"] = json["progress"]
 
-        return n
+        return _apply_updates(self, updates)
 
 
 class VirtualSDCard:
 
+    # Fields of the Klipper object that are subscribed to, only these are read by the companion
+    SUBSCRIPTION_FIELDS: List[str] = ['file_position', 'progress']
+    __slots__ = ('file_position', 'progress')
+
     def __init__(
             self,
             file_position: int = 0,
@@ -116,16 +145,22 @@ class VirtualSDCard:
         return "VirtualSDCard (progress: %f, file_position: %d)" % (self.progress, self.file_position)
 
     def updateWith(self, json: Dict[str, Any]) -> 'VirtualSDCard':
-        n = deepcopy(self)
+        updates: Dict[str, Any] = {}
         if "file_position" in json:
-            n.file_position = json["file_position"]
+            updates["file_position"] = json["file_position"]
         if "progress" in json:
-            n.progress = json["progress"]
+            updates["progress"] = json["progress"]
 
-        return n
+        return _apply_updates(self, updates)
 
 
 class GCodeFile:
+    __slots__ = ('filename', 'modified', 'size', 'print_start_time', 'job_id', 'slicer', 'slicer_version',
+                 'gcode_start_byte', 'gcode_end_byte', 'layer_count', 'object_height', 'estimated_time',
+                 'nozzle_diameter', 'layer_height', 'first_layer_height', 'first_layer_bed_temp',
+                 'first_layer_extr_temp', 'chamber_temp', 'filament_name', 'filament_type', 'filament_total',
+                 'filament_weight_total')
+
     def __init__(
         self,
         filename: str,
@@ -178,13 +213,13 @@ class GCodeFile:
 
     def __eq__(self, other):
         if isinstance(other, GCodeFile):
-            return vars(self) == vars(other)
+            return self is other or _slot_items(self) == _slot_items(other)
         return False
 
     def __str__(self):
         return '%s(%s)' % (
             type(self).__name__,
-            ', '.join('%s=%s' % item for item in vars(self).items())
+            ', '.join('%s=%s' % item for item in _slot_items(self))
         )
 
     @classmethod
@@ -214,8 +249,14 @@ class GCodeFile:
             filament_weight_total=data_dict.get("filament_weight_total"),
         )
 
+    def to_json(self) -> Dict[str, Any]:
+        return dict(_slot_items(self))
+
 
 class Toolhead:
+    __slots__ = ('position', 'active_extruder', 'print_time', 'estimated_print_time', 'max_velocity', 'max_accel',
+                 'max_accel_to_decel', 'square_corner_velocity')
+
     def __init__(
         self,
         position: List[float] = [0, 0, 0],
@@ -237,27 +278,22 @@ class Toolhead:
         self.square_corner_velocity: float = square_corner_velocity
 
     def updateWith(self, json_data: dict) -> 'Toolhead':
-        n = deepcopy(self)
-        n.print_time = json_data['print_time'] if 'print_time' in json_data else None
-        n.estimated_print_time = json_data['estimated_print_time'] if 'estimated_print_time' in json_data else None
-
-        if 'position' in json_data:
-            n.position = json_data['position']
-        if 'active_extruder' in json_data:
-            n.active_extruder = json_data['active_extruder']
+        updates: Dict[str, Any] = {
+            'print_time': json_data['print_time'] if 'print_time' in json_data else None,
+            'estimated_print_time': json_data['estimated_print_time'] if 'estimated_print_time' in json_data else None,
+        }
 
-        if 'max_velocity' in json_data:
-            n.max_velocity = json_data['max_velocity']
-        if 'max_accel' in json_data:
-            n.max_accel = json_data['max_accel']
-        if 'max_accel_to_decel' in json_data:
-            n.max_accel_to_decel = json_data['max_accel_to_decel']
-        if 'square_corner_velocity' in json_data:
-            n.square_corner_velocity = json_data['square_corner_velocity']
-        return n
+        for key in ('position', 'active_extruder', 'max_velocity', 'max_accel', 'max_accel_to_decel', 'square_corner_velocity'):
+            if key in json_data:
+                updates[key] = json_data[key]
+        return _apply_updates(self, updates)
 
 
 class GCodeMove:
+    # Fields of the Klipper object that are subscribed to, only these are read by the companion
+    SUBSCRIPTION_FIELDS: List[str] = ['gcode_position']
+    __slots__ = ('position', 'gcode_position')
+
     def __init__(
         self,
         position: List[float] = [0, 0, 0,0],
@@ -267,15 +303,19 @@ class GCodeMove:
         self.gcode_position: List[float] = gcode_position
 
     def updateWith(self, json_data: dict) -> 'GCodeMove':
-        n = deepcopy(self)
+        updates: Dict[str, Any] = {}
 
         if 'position' in json_data:
-            n.position = json_data['position']
+            updates['position'] = json_data['position']
         if 'gcode_position' in json_data:
-            n.gcode_position = json_data['gcode_position']
-        return n
+            updates['gcode_position'] = json_data['gcode_position']
+        return _apply_updates(self, updates)
     
 class FilamentSensor:
+    # Fields of the Klipper object that are subscribed to, only these are read by the companion
+    SUBSCRIPTION_FIELDS: List[str] = ['enabled', 'filament_detected']
+    __slots__ = ('name', 'kind', 'enabled', 'filament_detected')
+
     def __init__(self,
                  name: str,
                  kind: str,
@@ -288,15 +328,15 @@ class FilamentSensor:
         self.filament_detected: bool = filament_detected
 
     def updateWith(self, json_data: dict) -> 'FilamentSensor':
-        n = deepcopy(self)
+        updates: Dict[str, Any] = {}
         if 'enabled' in json_data:
-            n.enabled = json_data['enabled']
+            updates['enabled'] = json_data['enabled']
         if 'filament_detected' in json_data:
-            n.filament_detected = json_data['filament_detected']
-        return n
+            updates['filament_detected'] = json_data['filament_detected']
+        return _apply_updates(self, updates)
     
     def __str__(self):
         return '%s(%s)' % (
             type(self).__name__,
-            ', '.join('%s=%s' % item for item in vars(self).items())
+            ', '.join('%s=%s' % item for item in _slot_items(self))
         )
\ No newline at end of file
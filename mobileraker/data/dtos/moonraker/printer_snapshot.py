@@ -1,18 +1,52 @@
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
 import math
 from dateutil import tz
 
 from mobileraker.data.dtos.moonraker.printer_objects import FilamentSensor, GCodeFile, GCodeMove, PrintStats, Toolhead, VirtualSDCard
 
 
+T = TypeVar('T')
+
+
+def _memoized(fn: Callable[..., T]) -> Callable[..., T]:
+    '''
+    Caches the result of a derived value in the snapshot's cache, keyed by the name and the (hashable) arguments.
+    '''
+    name = fn.__name__
+
+    @wraps(fn)
+    def wrapper(self: 'PrinterSnapshot', *args: Any) -> T:
+        key = (name, *args) if args else name
+        try:
+            return self._cache[key]
+        except KeyError:
+            value = self._cache[key] = fn(self, *args)
+            return value
+    return wrapper
+
+
 class PrinterSnapshot:
+    '''
+    The state of the printer at a point in time.
+
+    Derived values (progress, layers, remaining times, ...) are computed at most once and cached on the snapshot.
+    Setting an attribute drops the cache. Snapshots taken by the DataSyncService are frozen, setting an attribute of a
+    frozen snapshot raises an AttributeError.
+    '''
+    __slots__ = ('_cache', '_frozen', 'timestamp', 'klippy_ready', 'print_state', 'm117', 'm117_hash', 'virtual_sdcard',
+                 'print_stats', 'current_file', 'toolhead', 'gcode_move', 'gcode_response', 'gcode_response_hash',
+                 'timelapse_pause', 'filament_sensors')
+
     def __init__(
         self,
         klippy_ready: bool,
         print_state: str,
     ) -> None:
         super().__init__()
+        self._cache: Dict[Any, Any] = {}
+        self._frozen: bool = False
         self.timestamp: datetime = datetime.now()
         self.klippy_ready: bool = klippy_ready
         self.print_state: str = print_state
@@ -32,10 +66,33 @@ class PrinterSnapshot:
         filament_sensors_str = ', '.join(str(v) for v in self.filament_sensors.values())
         return f"PrinterSnapshot(timestamp={self.timestamp.isoformat()},klippy_ready={self.klippy_ready}, print_state={self.print_state}, m117={self.m117}, m117_hash={self.m117_hash}, virtual_sdcard={self.virtual_sdcard}, print_stats={self.print_stats}, current_file={self.current_file}, toolhead={self.toolhead}, gcode_move={self.gcode_move}, gcode_response={self.gcode_response}, gcode_response_hash={self.gcode_response_hash}, timelapse_pause={self.timelapse_pause}, filament_sensors={filament_sensors_str})"
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        if not name.startswith('_'):
+            if getattr(self, '_frozen', False):
+                raise AttributeError(f'Can not set {name}, the PrinterSnapshot is frozen')
+            cache = getattr(self, '_cache', None)
+            if cache:
+                cache.clear()
+        super().__setattr__(name, value)
+
+    def freeze(self) -> 'PrinterSnapshot':
+        '''
+        Makes the snapshot immutable.
+        '''
+        self._frozen = True
+        return self
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, PrinterSnapshot):
             return False
 
+        # The printer objects are shared between snapshots as long as they did not change, most compare by identity
         return (
             self.timestamp == other.timestamp
             and self.klippy_ready == other.klippy_ready
@@ -59,6 +116,11 @@ class PrinterSnapshot:
         Returns:
             Optional[int]: Average remaining time in seconds, or None if calculation is not possible.
         """
+        # The sources are usually a list, which can not be used as cache key
+        return self._remaining_time_avg(tuple(sources))
+
+    @_memoized
+    def _remaining_time_avg(self, sources: Tuple[str, ...]) -> Optional[int]:
         remaining = 0
         cnt = 0
 
@@ -99,10 +161,12 @@ class PrinterSnapshot:
         return int(eta.astimezone(tz.UTC).timestamp()) if eta else None
 
     @property
+    @_memoized
     def eta_available(self) -> bool:
         return self.remaining_time_avg(['file', 'filament', 'slicer']) is not None
 
     @property
+    @_memoized
     def remaining_time_by_file(self) -> Optional[int]:
         """
         Calculate the remaining time based on the file progress.
@@ -117,6 +181,7 @@ class PrinterSnapshot:
         return int((print_duration / print_progress - print_duration))
 
     @property
+    @_memoized
     def remaining_time_by_filament(self) -> Optional[int]:
         """
         Calculate the remaining time based on filament usage and progress.
@@ -138,6 +203,7 @@ class PrinterSnapshot:
         return int((print_duration / (filament_used / filament_total) - print_duration))
 
     @property
+    @_memoized
     def remaining_time_by_slicer(self) -> Optional[int]:
         """
         Calculate the remaining time based on slicer estimate and progress.
@@ -152,6 +218,7 @@ class PrinterSnapshot:
         return int((slicer_estimate - print_duration))
 
     @property
+    @_memoized
     def print_progress_by_fileposition_relative(self) -> Optional[float]:
         """
         Calculate the printing progress based on file position.
@@ -189,6 +256,7 @@ class PrinterSnapshot:
         return self.current_file.filename if self.current_file else None
 
     @property
+    @_memoized
     def max_layer(self) -> int:
         total_layer = self.print_stats.total_layer if self.print_stats else None
         object_height = self.current_file.object_height if self.current_file else None
@@ -206,6 +274,7 @@ class PrinterSnapshot:
         return max(0, math.ceil((object_height - first_layer_height) / layer_height + 1))
 
     @property
+    @_memoized
     def current_layer(self) -> int:
         current_layer = self.print_stats.current_layer if self.print_stats else None
         print_duration = self.print_stats.print_duration if self.print_stats else 0
@@ -222,6 +291,7 @@ class PrinterSnapshot:
             0, min(self.max_layer, math.ceil((gcode_z_position - first_layer_height) / layer_height + 1)))
 
     @property
+    @_memoized
     def progress(self) -> Optional[int]:
         return int(self.print_progress_by_fileposition_relative * 100) if self.print_progress_by_fileposition_relative else None
     
@@ -231,6 +301,7 @@ class PrinterSnapshot:
     
     
     @property
+    @_memoized
     def eta_window(self) -> Optional[int]:
         """
         Calculate the ETA window based on the estimated time of the current file.
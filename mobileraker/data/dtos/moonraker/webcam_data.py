@@ -1,5 +1,8 @@
 from typing import Any, Dict
 
+# Moonraker webcam services that serve a multipart MJPEG stream at their stream_url
+MJPEG_SERVICES = ('mjpegstreamer', 'mjpegstreamer-adaptive', 'uv4l-mjpeg')
+
 
 class WebcamData:
     """
@@ -9,10 +12,19 @@ class WebcamData:
         data = data or {}
         self.name: str = data.get('name', '')
         self.snapshot_url: str = data.get('snapshot_url', '')
+        self.stream_url: str = data.get('stream_url', '')
+        self.service: str = data.get('service', '')
         self.rotation: int = data.get('rotation', 0)
         self.flip_horizontal: bool = data.get('flip_horizontal', False)
         self.flip_vertical: bool = data.get('flip_vertical', False)
         self.uid: str = data.get('uid', '')
     
+    @property
+    def mjpeg_stream_url(self) -> str:
+        """
+        The stream url if the webcam serves an MJPEG stream, otherwise an empty string.
+        """
+        return self.stream_url if self.service in MJPEG_SERVICES else ''
+
     def __str__(self):
         return f"WebcamData(name={self.name}, rotation={self.rotation}, uid={self.uid})"
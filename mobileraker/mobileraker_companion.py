@@ -1,9 +1,9 @@
-from asyncio import AbstractEventLoop, Lock
+from asyncio import AbstractEventLoop
 import asyncio
 import base64
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 import time
 
 
@@ -15,13 +15,19 @@ from mobileraker.data.dtos.mobileraker.companion_meta_dto import CompanionMetaDa
 from mobileraker.data.dtos.mobileraker.companion_request_dto import ContentDto, DeviceRequestDto, FcmRequestDto, LiveActivityContentDto, NotificationContentDto, ProgressNotificationContentDto
 from mobileraker.data.dtos.mobileraker.notification_config_dto import DeviceNotificationEntry
 from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
+from mobileraker.service.app_config_store import AppConfigStore
 from mobileraker.service.data_sync_service import DataSyncService
-from mobileraker.service.notification_evaluator import NotificationEvaluator
+from mobileraker.service.database_write_buffer import DatabaseWriteBuffer
+from mobileraker.service.evaluation_scheduler import EvaluationScheduler
+from mobileraker.service.notification_evaluator import NotificationEvaluationResult, NotificationEvaluator
+from mobileraker.service.snapshot_variants import SnapshotVariantPolicy
 from mobileraker.service.webcam_manager import WebcamManager
+from mobileraker.service.webcam_prefetch import NotificationPredictor, WebcamFrameCache
 from mobileraker.util.configs import CompanionLocalConfig, CompanionRemoteConfig
 
-from mobileraker.util.functions import compare_version, generate_notifcation_id_from_uuid, get_software_version, is_valid_uuid, normalized_progress_interval_reached
+from mobileraker.util.functions import compare_version, generate_notifcation_id_from_uuid, get_software_version, normalized_progress_interval_reached
 from mobileraker.util.i18n import translate_implicit, translate_replace_placeholders
+from mobileraker.util.metrics import get_metrics
 from mobileraker.util.notification_placeholders import replace_placeholders
 
 
@@ -49,7 +55,7 @@ class MobilerakerCompanion:
         self._data_sync_service: DataSyncService = data_sync_service
         self._fcm_client: MobilerakerFcmClient = fcm_client
         self._default_snapshot_client: WebcamSnapshotClient = webcam_snapshot_client
-        self._webcam_manager = WebcamManager(jrpc)
+        self._webcam_manager = WebcamManager(jrpc, use_stream=companion_config.webcam_stream)
         self.printer_name: str = printer_name
         self.loop: AbstractEventLoop = loop
         self.companion_config: CompanionLocalConfig = companion_config
@@ -61,8 +67,16 @@ class MobilerakerCompanion:
             f'mobileraker.{printer_name.replace(".","_")}')
         self._last_snapshot: Optional[PrinterSnapshot] = None
         self._last_apns_message: Optional[int] = None
-        self._evaulate_noti_lock: Lock = Lock()
+        self._evaluation_scheduler = EvaluationScheduler(self._evaluate, printer_name, loop)
         self._notification_evaluator = NotificationEvaluator(companion_config, self.remote_config)
+        self._app_config_store = AppConfigStore(jrpc, printer_name)
+        self._db_writes = DatabaseWriteBuffer(jrpc, printer_name)
+        self._predictor = NotificationPredictor(self.remote_config.increments, self.remote_config.interval)
+        self._snapshot_policy = SnapshotVariantPolicy(
+            companion_config.snapshot_size_android, companion_config.snapshot_size_ios,
+            companion_config.snapshot_payload_budget * 1024)
+        self._frame_cache: Optional[WebcamFrameCache] = WebcamFrameCache(
+            get_metrics(printer_name)) if companion_config.webcam_prefetch else None
 
         self._logger.info('MobilerakerCompanion client created for %s, it will ignore the following sensors: %s',
                           printer_name, exclude_sensors)
@@ -70,119 +84,151 @@ class MobilerakerCompanion:
         self._jrpc.register_connection_listener(
             lambda d: self.loop.create_task(self._update_meta_data()) if d else None)
         self._data_sync_service.register_snapshot_listener(
-            self._create_eval_task)
+            self._evaluation_scheduler.submit)
 
     async def start(self) -> None:
         await self._jrpc.connect()
 
-    def _create_eval_task(self, snapshot: PrinterSnapshot) -> None:
-        self.loop.create_task(self._evaluate_with_timeout(snapshot))
-
-    async def _evaluate_with_timeout(self, snapshot: PrinterSnapshot) -> None:
-        """
-        This method starts the evaluation process with a timeout.
-        It tries to acquire a lock before starting the evaluation.
-        If the lock cannot be acquired within 60 seconds, or if the evaluation takes longer than 60 seconds,
-        it logs a warning and releases the lock.
-        """
-        lock_acquired = False
-        try:
-            lock_acquired = await asyncio.wait_for(self._evaulate_noti_lock.acquire(), timeout=60)
-            if lock_acquired:
-                await asyncio.wait_for(self._evaluate(snapshot), timeout=60)
-        except asyncio.TimeoutError:
-            if lock_acquired:
-                self._logger.warning('Evaluation task execution timed out after 60 seconds!')
-            else:
-                self._logger.warning('Evaluation task was unable to acquire lock after 60 seconds!')
-        finally:
-            if lock_acquired:
-                self._evaulate_noti_lock.release()
-
+    def close(self) -> None:
+        '''
+        Cancels the running evaluation, discards the pending snapshot and closes the webcam streams.
+        '''
+        self._evaluation_scheduler.close()
+        self._default_snapshot_client.stop_stream()
+        self._webcam_manager.stop_streams()
 
     async def _evaluate(self, snapshot: PrinterSnapshot) -> None:
         # Limit evaluation to state changes and 5% increments(Later m117 can also trigger notifications, but might use other stuff)
+        if self._frame_cache is not None:
+            self._predictor.observe(snapshot, time.monotonic())
         if not self._fulfills_evaluation_threshold(snapshot):
+            if self._frame_cache is not None:
+                self._prefetch_webcams(snapshot)
+            self._stop_idle_webcam_streams(snapshot)
             return
         self._logger.info(
             'Snapshot passed threshold. LastSnap: %s, NewSnap: %s', self._last_snapshot, snapshot)
         self._last_snapshot = snapshot
 
-        app_cfgs = await self._fetch_app_cfgs()
-
-        device_requests: List[DeviceRequestDto] = []
+        started = time.perf_counter()
+        app_cfgs = await self._app_config_store.get_configs()
+        fetched = time.perf_counter()
 
-        # Cache for webcam images to avoid multiple requests for the same image
-        webcam_snapshots: Dict[str, str] = {}
+        # Stage 1: Evaluate all devices, this is pure CPU work. The database writes are only queued.
+        notified: List[Tuple[DeviceNotificationEntry, NotificationEvaluationResult]] = []
+        device_cfgs = [cfg for cfg in app_cfgs if cfg.fcm_token]
+        for cfg, result in zip(device_cfgs, self._evaluate_devices(device_cfgs, snapshot)):
+            if result.notifications:
+                notified.append((cfg, result))
+            self._update_app_snapshot(cfg, snapshot, result.has_progress_notification, result.has_progressbar_notification, result.has_live_activity)
+            self._clean_up_apns(cfg, snapshot)
+        evaluated = time.perf_counter()
+
+        # Stage 2: Run the I/O concurrently. The database writes do not depend on the webcam images and the push.
+        timings: Dict[str, float] = {}
+
+        async def deliver() -> None:
+            # Capture every webcam needed by the notified devices once, all at the same time
+            device_webcams = [self._webcam_key_for_device(cfg) for cfg, _ in notified]
+            webcam_keys = list(dict.fromkeys(key for key in device_webcams if key is not None))
+            captured = await asyncio.gather(*(self._take_webcam_image(key) for key in webcam_keys))
+            webcam_snapshots: Dict[str, Optional[Dict[str, str]]] = dict(zip(webcam_keys, captured))
+            timings['webcam'] = time.perf_counter() - evaluated
+
+            # Every device gets the snapshot size of its platform, shrunk if the push exceeds the payload budget
+            device_images = self._snapshot_policy.assign(
+                [webcam_snapshots.get(key) if key is not None else None for key in device_webcams],
+                [self._snapshot_policy.preferred(cfg) for cfg, _ in notified])
+            device_requests = [
+                self._create_device_request(cfg, result, ascii_img)
+                for (cfg, result), ascii_img in zip(notified, device_images)
+            ]
+            if device_requests:
+                await self._push_and_clear_faulty(device_requests)
+            timings['push'] = time.perf_counter() - evaluated - timings['webcam']
+
+        async def write() -> None:
+            await self._db_writes.flush()
+            timings['db'] = time.perf_counter() - evaluated
+
+        await asyncio.gather(deliver(), write())
 
-        for cfg in app_cfgs:
-            if not cfg.fcm_token:
-                continue
-            self._logger.info(
-                'Evaluate for machineID %s, cfg.version: %s , cfg.snap: %s, cfg.settings: %s', cfg.machine_id, cfg.version, cfg.snap, cfg.settings)
+        self._logger.info(
+            'Evaluated %i devices (%i notified) in %.0fms: fetch %.0fms, evaluate %.0fms, webcam %.0fms, push %.0fms, db %.0fms',
+            len(app_cfgs), len(notified), (time.perf_counter() - started) * 1000, (fetched - started) * 1000,
+            (evaluated - fetched) * 1000, timings['webcam'] * 1000, timings['push'] * 1000, timings['db'] * 1000)
+        self._stop_idle_webcam_streams(snapshot)
+        self._logger.info('---- Completed Evaluations Task! ----')
 
-            # Use device-specific exclude_filament_sensors if available
-            exclude_sensors = cfg.settings.exclude_filament_sensors if hasattr(cfg.settings, 'exclude_filament_sensors') else self.exclude_sensors
-            
-            # Evaluate all notifications for this device
-            result = self._notification_evaluator.evaluate_all_notifications_for_device(
-                cfg, snapshot, self._last_snapshot, exclude_sensors
-            )
+    def _stop_idle_webcam_streams(self, snapshot: PrinterSnapshot) -> None:
+        '''
+        Closes the webcam streams once the printer is idle, the next capture opens them again.
+        '''
+        if snapshot.print_state not in ['printing', 'paused']:
+            self._default_snapshot_client.stop_stream()
+            self._webcam_manager.stop_streams()
+
+    def _evaluate_devices(self, cfgs: List[DeviceNotificationEntry], snapshot: PrinterSnapshot) -> List[NotificationEvaluationResult]:
+        '''
+        Evaluates all devices at once, devices with equivalent settings and snaps are only evaluated once.
+        '''
+        # Use device-specific exclude_filament_sensors if available
+        exclude_sensors = [cfg.settings.exclude_filament_sensors if hasattr(cfg.settings, 'exclude_filament_sensors') else self.exclude_sensors
+                           for cfg in cfgs]
+
+        results = self._notification_evaluator.evaluate_all_notifications_for_devices(
+            cfgs, snapshot, self._last_snapshot, exclude_sensors
+        )
+        for cfg, result in zip(cfgs, results):
+            self._log_device_result(cfg, result)
+        return results
+
+    def _log_device_result(self, cfg: DeviceNotificationEntry, result: NotificationEvaluationResult) -> None:
+        self._logger.info(
+            'Evaluated for machineID %s, cfg.version: %s , cfg.snap: %s, cfg.settings: %s', cfg.machine_id, cfg.version, cfg.snap, cfg.settings)
 
-            # Handle live activity side effect
-            if result.has_live_activity:
-                self._last_apns_message = time.monotonic_ns()
+        # Handle live activity side effect
+        if result.has_live_activity:
+            self._last_apns_message = time.monotonic_ns()
 
-            # Log notifications using isinstance() for clean type checking
-            self._logger.info('%i notifications generated for machineID: %s', len(result.notifications), cfg.machine_id)
-            
-            # Debug logging with proper type checking
-            if result.notifications:
-                notification_types = []
-                for notification in result.notifications:
-                    if isinstance(notification, LiveActivityContentDto):
-                        notification_types.append('liveActivity')
-                        self._logger.info('LiveActivity notification: progress=%s, eta=%s', 
-                                         notification.progress, notification.eta)
-                    elif isinstance(notification, ProgressNotificationContentDto):
-                        notification_types.append('progressBar')
-                        self._logger.info('ProgressBar notification: %s - %s (progress: %s%%)', 
-                                         notification.title, notification.body, notification.progress)
-                    elif isinstance(notification, NotificationContentDto):
-                        # Determine type from channel for logging
-                        noti_type = notification.channel.split('-')[-1] if '-' in notification.channel else 'unknown'
-                        notification_types.append(noti_type)
-                        self._logger.info('%s notification: %s - %s', noti_type, 
-                                         notification.title, notification.body)
-                
-                self._logger.info('Notification types: %s', ', '.join(notification_types))
-            
-            if result.notifications:
-                # Take a webcam image specific to this device's preferences
-                ascii_img = await self._take_webcam_image_for_device(webcam_snapshots, cfg)
-                if ascii_img:
-                    # Set the webcam image to all notification DTOs
-                    for notification in result.notifications:
-                        if isinstance(notification, NotificationContentDto):
-                            notification.image = ascii_img
-                
-                # Create device request
-                dto = DeviceRequestDto(
-                    # Version 2 is used to indicate that we want to use flattened structure of awesome notifications. This is only available in 2.6.10 and later
-                    version= 2 if cfg.version is not None and compare_version(cfg.version, "2.6.10") >= 0 else 1,
-                    printer_id=cfg.machine_id,
-                    token=cfg.fcm_token,
-                    notifcations=result.notifications
-                )
-                device_requests.append(dto)
+        # Log notifications using isinstance() for clean type checking
+        self._logger.info('%i notifications generated for machineID: %s', len(result.notifications), cfg.machine_id)
+        
+        # Debug logging with proper type checking
+        if result.notifications:
+            notification_types = []
+            for notification in result.notifications:
+                if isinstance(notification, LiveActivityContentDto):
+                    notification_types.append('liveActivity')
+                    self._logger.info('LiveActivity notification: progress=%s, eta=%s', 
+                                     notification.progress, notification.eta)
+                elif isinstance(notification, ProgressNotificationContentDto):
+                    notification_types.append('progressBar')
+                    self._logger.info('ProgressBar notification: %s - %s (progress: %s%%)', 
+                                     notification.title, notification.body, notification.progress)
+                elif isinstance(notification, NotificationContentDto):
+                    # Determine type from channel for logging
+                    noti_type = notification.channel.split('-')[-1] if '-' in notification.channel else 'unknown'
+                    notification_types.append(noti_type)
+                    self._logger.info('%s notification: %s - %s', noti_type, 
+                                     notification.title, notification.body)
             
-            await self._update_app_snapshot(cfg, snapshot, result.has_progress_notification, result.has_progressbar_notification, result.has_live_activity)
-            await self._clean_up_apns(cfg, snapshot)
-
-        if device_requests:
-            await self._push_and_clear_faulty(device_requests)
+            self._logger.info('Notification types: %s', ', '.join(notification_types))
+
+    def _create_device_request(self, cfg: DeviceNotificationEntry, result: NotificationEvaluationResult, ascii_img: Optional[str]) -> DeviceRequestDto:
+        if ascii_img:
+            # Set the webcam image to all notification DTOs, the encoded image is shared by all of them
+            for notification in result.notifications:
+                if isinstance(notification, NotificationContentDto):
+                    notification.image = ascii_img
         
-        self._logger.info('---- Completed Evaluations Task! ----')
+        return DeviceRequestDto(
+            # Version 2 is used to indicate that we want to use flattened structure of awesome notifications. This is only available in 2.6.10 and later
+            version= 2 if cfg.version is not None and compare_version(cfg.version, "2.6.10") >= 0 else 1,
+            printer_id=cfg.machine_id,
+            token=cfg.fcm_token,
+            notifcations=result.notifications
+        )
 
     async def _update_meta_data(self) -> None:
         client_info = CompanionMetaDataDto(version=get_software_version())
@@ -217,7 +263,12 @@ class MobilerakerCompanion:
             return True
 
 
-        if not self._last_snapshot.eta_available and snapshot.eta_available:
+        # ETA and progress are derived from these objects, the snapshots share them as long as they did not change
+        print_progressed = (self._last_snapshot.print_stats is not snapshot.print_stats
+                            or self._last_snapshot.virtual_sdcard is not snapshot.virtual_sdcard
+                            or self._last_snapshot.current_file is not snapshot.current_file)
+
+        if print_progressed and not self._last_snapshot.eta_available and snapshot.eta_available:
             self._logger.info('ETA is available. Evaluating!')
             return True
 
@@ -233,7 +284,7 @@ class MobilerakerCompanion:
         # Progress evaluation
         last_progress = self._last_snapshot.progress
         cur_progress = snapshot.progress
-        if last_progress != cur_progress:
+        if print_progressed and last_progress != cur_progress:
             if last_progress is None or cur_progress is None:
                 self._logger.info('Progress is None. Evaluating!')
                 return True
@@ -247,23 +298,27 @@ class MobilerakerCompanion:
         last_sensors = self._last_snapshot.filament_sensors
         cur_sensors = snapshot.filament_sensors
 
-        # check if any of the new sensors is enabled and 
-        for key, sensor in cur_sensors.items():
-            # Skip sensors the user wants to ignore
-            if key in self.exclude_sensors:
-                continue
+        # Snapshots share the sensors until one of them changes
+        if cur_sensors is not last_sensors:
+            # check if any of the new sensors is enabled and 
+            for key, sensor in cur_sensors.items():
+                # Skip sensors the user wants to ignore
+                if key in self.exclude_sensors:
+                    continue
 
-            # do not skip disabled sensors, as they might have been enabled in the meantime
-            last_sensor = last_sensors.get(key)
-            if last_sensor is None:
-                self._logger.info('Initial filament sensor "%s" detected. Evaluating!', key)
-                return True
-            if last_sensor.filament_detected != sensor.filament_detected:
-                self._logger.info('Filament sensor "%s" triggered. Evaluating!', key)
-                return True
-            if last_sensor.enabled != sensor.enabled:
-                self._logger.info('Filament sensor "%s" enabled/disabled. Evaluating!', key)
-                return True
+                # do not skip disabled sensors, as they might have been enabled in the meantime
+                last_sensor = last_sensors.get(key)
+                if last_sensor is sensor:
+                    continue
+                if last_sensor is None:
+                    self._logger.info('Initial filament sensor "%s" detected. Evaluating!', key)
+                    return True
+                if last_sensor.filament_detected != sensor.filament_detected:
+                    self._logger.info('Filament sensor "%s" triggered. Evaluating!', key)
+                    return True
+                if last_sensor.enabled != sensor.enabled:
+                    self._logger.info('Filament sensor "%s" enabled/disabled. Evaluating!', key)
+                    return True
 
         # Time evaluation
         if (datetime.now() - self._last_snapshot.timestamp).seconds >= (self.remote_config.interval+5): # add 5 seconds to ensure other values are also updated
@@ -274,149 +329,110 @@ class MobilerakerCompanion:
         # Yes I know I can return on the last if, but I want to log the reason why it triggered an evaluation
         return False
 
-    async def _fetch_app_cfgs(self) -> List[DeviceNotificationEntry]:
-        try:
-            response, k_error = await self._jrpc.send_and_receive_method("server.database.get_item",
-                                                                         {"namespace": "mobileraker", "key": "fcm"})
-            if k_error:
-                self._logger.warning(
-                    "Could not fetch app cfgs from moonraker, moonraker returned error %s", k_error)
-                return []
-            cfgs = []
-            raw_cfgs = response["result"]["value"]
-            for entry_id in raw_cfgs:
-                if not is_valid_uuid(entry_id):
-                    continue
-
-                device_json = raw_cfgs[entry_id]
-                if ('fcmToken' not in device_json):
-                    await self._remove_old_fcm_cfg(entry_id)
-                    continue
-                cfg = DeviceNotificationEntry.fromJSON(
-                    entry_id, device_json)
-                cfgs.append(cfg)
-
-            self._logger.info('Fetched %i app Cfgs!', len(cfgs))
-            return cfgs
-        except (ConnectionError, asyncio.TimeoutError) as err:
-            self._logger.warning(
-                "Could not fetch app cfgs from moonraker, %s: %s", type(err), err)
-            return []
-
-    async def _remove_old_fcm_cfg(self, machine_id: str) -> None:
-        try:
-            await self._jrpc.send_method(
-                method="server.database.delete_item",
-                params={"namespace": "mobileraker",
-                        "key": f"fcm.{machine_id}"},
-            )
-        except (ConnectionError, asyncio.TimeoutError)as err:
-            self._logger.warning(
-                "Could not remove old fcm cfg for %s, %s", machine_id, err)
-
-
     async def _push_and_clear_faulty(self, dtos: List[DeviceRequestDto]):
         try:
             if dtos:
                 request = FcmRequestDto(dtos)
-                response = self._fcm_client.push(request)
+                response = await self._fcm_client.push(request)
             # todo: remove faulty token lol
-        except requests.exceptions.RequestException as err:
+        except (requests.exceptions.RequestException, asyncio.TimeoutError) as err:
             self._logger.error(
                 "Could not push notifications to mobileraker backend, %s: %s", type(err), err)
 
-    async def _update_app_snapshot(self, cfg: DeviceNotificationEntry, printer_snap: PrinterSnapshot, had_progress: bool, had_progressbar: bool, had_progress_liveactivity: bool) -> None:
-        try:
-            last = cfg.snap
-
-            progress_update = None
-            if printer_snap.print_state not in ['printing', 'paused']:
-                progress_update = 0
-            elif had_progress:
-                progress_update = printer_snap.progress
-
-            progress_live_activity_update = None
-            if printer_snap.print_state not in ['printing', 'paused']:
-                progress_live_activity_update = 0
-            elif had_progress_liveactivity:
-                progress_live_activity_update = printer_snap.progress
-
-            progressbar_update = None
-            if printer_snap.print_state not in ['printing', 'paused']:
-                progressbar_update = 0
-            elif had_progressbar:
-                progressbar_update = printer_snap.progress
-
-            # get list of all filament that have no filament detected (Enabled and Disabled, if we only use enabled once, this might trigger a notification if the user enables a sensor and it detects no filament)
-            filament_sensors = [key for key, sensor in printer_snap.filament_sensors.items() if not sensor.filament_detected and not key in self.exclude_sensors]
-            now = datetime.now()
-            
-            updated = last.copy_with(
-                state=printer_snap.print_state if last.state != printer_snap.print_state and not printer_snap.is_timelapse_pause else None,
-                progress=progress_update,
-                progress_live_activity=progress_live_activity_update,
-                progress_progressbar=progressbar_update,
-                m117=printer_snap.m117_hash if last.m117 != printer_snap.m117_hash else None,
-                gcode_response=printer_snap.gcode_response_hash if last.gcode_response != printer_snap.gcode_response_hash else None,
-                filament_sensors=filament_sensors if last.filament_sensors != filament_sensors else None,
-                last_progress=now if had_progress else last.last_progress,
-                last_progress_live_activity=now if had_progress_liveactivity else last.last_progress_live_activity,
-                last_progress_progressbar=now if had_progressbar else last.last_progress_progressbar
-            )
-
-            if updated == last:
-                self._logger.info(
-                    "No snap update necessary for %s", cfg.machine_id)
-                return
+    def _update_app_snapshot(self, cfg: DeviceNotificationEntry, printer_snap: PrinterSnapshot, had_progress: bool, had_progressbar: bool, had_progress_liveactivity: bool) -> None:
+        '''
+        Queues the update of the device's snap in the database write buffer, it is sent with the next flush.
+        '''
+        last = cfg.snap
+
+        progress_update = None
+        if printer_snap.print_state not in ['printing', 'paused']:
+            progress_update = 0
+        elif had_progress:
+            progress_update = printer_snap.progress
+
+        progress_live_activity_update = None
+        if printer_snap.print_state not in ['printing', 'paused']:
+            progress_live_activity_update = 0
+        elif had_progress_liveactivity:
+            progress_live_activity_update = printer_snap.progress
+
+        progressbar_update = None
+        if printer_snap.print_state not in ['printing', 'paused']:
+            progressbar_update = 0
+        elif had_progressbar:
+            progressbar_update = printer_snap.progress
+
+        # get list of all filament that have no filament detected (Enabled and Disabled, if we only use enabled once, this might trigger a notification if the user enables a sensor and it detects no filament)
+        filament_sensors = [key for key, sensor in printer_snap.filament_sensors.items() if not sensor.filament_detected and not key in self.exclude_sensors]
+        now = datetime.now()
+        
+        updated = last.copy_with(
+            state=printer_snap.print_state if last.state != printer_snap.print_state and not printer_snap.is_timelapse_pause else None,
+            progress=progress_update,
+            progress_live_activity=progress_live_activity_update,
+            progress_progressbar=progressbar_update,
+            m117=printer_snap.m117_hash if last.m117 != printer_snap.m117_hash else None,
+            gcode_response=printer_snap.gcode_response_hash if last.gcode_response != printer_snap.gcode_response_hash else None,
+            filament_sensors=filament_sensors if last.filament_sensors != filament_sensors else None,
+            last_progress=now if had_progress else last.last_progress,
+            last_progress_live_activity=now if had_progress_liveactivity else last.last_progress_live_activity,
+            last_progress_progressbar=now if had_progressbar else last.last_progress_progressbar
+        )
+
+        if updated == last:
+            self._logger.info(
+                "No snap update necessary for %s", cfg.machine_id)
+            return
+
+        machine_id = cfg.machine_id
 
-            self._logger.info('Updating snap in FCM Cfg for %s: %s',
-                              cfg.machine_id, updated)
-            response, k_err = await self._jrpc.send_and_receive_method("server.database.post_item",
-                                                                       {"namespace": "mobileraker", "key": f"fcm.{cfg.machine_id}.snap", "value": updated.toJSON()})
+        def on_written(k_err: Optional[str]) -> None:
             if k_err:
                 self._logger.warning(
-                    "Could not update snap in FCM Cfg for %s, moonraker returned error %s", cfg.machine_id, k_err)
+                    "Could not update snap in FCM Cfg for %s, %s", machine_id, k_err)
+                self._app_config_store.write_failed(machine_id)
             else:
+                self._app_config_store.update_snap(machine_id, updated)
                 self._logger.info(
-                    'Updated snap in FCM Cfg for %s: %s', cfg.machine_id, response)
+                    'Updated snap in FCM Cfg for %s: %s', machine_id, updated)
 
-        except (ConnectionError, asyncio.TimeoutError) as err:
-            self._logger.warning(
-                "Could not update snap in FCM Cfg for %s, %s: %s", cfg.machine_id, type(err), err)
+        self._logger.info('Queued snap update in FCM Cfg for %s: %s',
+                          machine_id, updated)
+        self._db_writes.post_item("mobileraker", f"fcm.{machine_id}.snap", updated.toJSON(), on_written)
 
-    async def _clean_up_apns(self, cfg: DeviceNotificationEntry, printer_snap: PrinterSnapshot) -> None:
+    def _clean_up_apns(self, cfg: DeviceNotificationEntry, printer_snap: PrinterSnapshot) -> None:
+        '''
+        Queues the removal of the device's APNs entry in the database write buffer, if the printer is no longer printing.
+        '''
         if (cfg.apns is None):
             return
         if (printer_snap.print_state in ['printing', 'paused']):
             return
         machine_id = cfg.machine_id
 
-        try:
-            self._logger.info('Deleting APNS for %s', machine_id)
-            _, k_err = await self._jrpc.send_and_receive_method(
-                method="server.database.delete_item",
-                params={"namespace": "mobileraker",
-                        "key": f"fcm.{machine_id}.apns"},
-            )
+        def on_deleted(k_err: Optional[str]) -> None:
             if k_err:
                 self._logger.warning(
-                    "Could not remove apns for %s, moonraker returned error %s", machine_id, k_err)
+                    "Could not remove apns for %s, %s", machine_id, k_err)
+                self._app_config_store.write_failed(machine_id)
             else:
+                self._app_config_store.remove_apns(machine_id)
                 self._logger.info(
                     "Removed apns for %s", machine_id)
-        except (ConnectionError, asyncio.TimeoutError)as err:
-            self._logger.warning(
-                "Could not remove apns for %s, %s", machine_id, err)
+
+        self._logger.info('Deleting APNS for %s', machine_id)
+        self._db_writes.delete_item("mobileraker", f"fcm.{machine_id}.apns", on_deleted)
     
-    async def _take_webcam_image_for_device(self, cache: Dict[str, str], cfg: DeviceNotificationEntry) -> Optional[str]:
+    def _webcam_key_for_device(self, cfg: DeviceNotificationEntry) -> Optional[str]:
         """
-        Takes a webcam snapshot for a specific device based on its webcam preferences.
+        Returns the webcam a device wants its snapshots from, based on its webcam preferences.
         
         Args:
             cfg (DeviceNotificationEntry): The device configuration
             
         Returns:
-            Optional[bytes]: The snapshot image as bytes if successful, or None on failure
+            Optional[str]: The webcam key, or None if the device does not want webcam snapshots
         """
         
         # Legacy support for snapshot_webcam in conf file
@@ -429,25 +445,55 @@ class MobilerakerCompanion:
             self._logger.info('Device specific snapshot_webcam is set to false. Skipping webcam snapshot.')
             return None
         
-        webcam_key = cfg.settings.snapshot_webcam if hasattr(cfg.settings, 'snapshot_webcam') else self.DEFAULT_WEBCAM_KEY
+        return cfg.settings.snapshot_webcam if hasattr(cfg.settings, 'snapshot_webcam') else self.DEFAULT_WEBCAM_KEY # type: ignore
+
+    def _prefetch_webcams(self, snapshot: PrinterSnapshot) -> None:
+        """
+        Starts capturing the webcams of all devices if a notification is expected shortly.
+        The captures are kept in the frame cache and picked up by the evaluation that sends the notification.
+        """
+        if self._frame_cache is None or not self._predictor.notification_expected(self._last_snapshot, snapshot):
+            return
+        for cfg in self._app_config_store.cached_configs:
+            if not cfg.fcm_token:
+                continue
+            webcam_key = self._webcam_key_for_device(cfg)
+            if webcam_key is None or webcam_key in self._frame_cache:
+                continue
+            self._logger.info('Notification expected shortly, prefetching webcam %s', webcam_key)
+            self._frame_cache.put(webcam_key, self.loop.create_task(self._capture_webcam_image(webcam_key)))
+
+    async def _take_webcam_image(self, webcam_key: str) -> Optional[Dict[str, str]]:
+        """
+        Returns the prefetched snapshot of the webcam if there is a fresh one, else captures a new one.
+        """
+        prefetched = self._frame_cache.take(webcam_key) if self._frame_cache is not None else None
+        if prefetched is not None:
+            return await prefetched
+        return await self._capture_webcam_image(webcam_key)
+
+    async def _capture_webcam_image(self, webcam_key: str) -> Optional[Dict[str, str]]:
+        """
+        Takes a snapshot of the given webcam, in all sizes required by the snapshot policy.
         
-        if webcam_key in cache :
-            return cache[webcam_key]
-                
+        Args:
+            webcam_key (str): The webcam key
+            
+        Returns:
+            Optional[Dict[str, str]]: The base64 encoded snapshots by variant name if successful, or None on failure
+        """
         try:
             # Get the appropriate snapshot client for this device
-            snapshot_client = await self._get_snapshot_client_for_device(webcam_key) # type: ignore
+            snapshot_client = await self._get_snapshot_client_for_device(webcam_key)
             
             if snapshot_client is None:
                 self._logger.warning("No snapshot client found for webcam: %s", webcam_key)
                 return None
             # Take a snapshot
-            img_bytes = snapshot_client.capture_snapshot()
+            images = await snapshot_client.capture_variants(self._snapshot_policy.variants)
             
-            if img_bytes:
-                img = base64.b64encode(img_bytes).decode("ascii")
-                cache[webcam_key] = img # type: ignore -> we are sure that the key is a str ant not a none
-                return img
+            if images:
+                return {name: base64.b64encode(img).decode("ascii") for name, img in images.items()}
             return None
         except Exception as e:
             self._logger.error("Error taking webcam image: %s", str(e))
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from mobileraker.client.moonraker_client import MoonrakerClient
+from mobileraker.data.dtos.mobileraker.notification_config_dto import DeviceNotificationEntry, NotificationSnap
+from mobileraker.util.functions import is_valid_uuid
+from mobileraker.util.metrics import Metrics, get_metrics
+
+
+class AppConfigStore:
+    '''
+    In-memory cache of the app (device) configs stored in the `mobileraker.fcm` namespace of Moonraker's database.
+
+    Moonraker does not notify clients about database changes, so the cache is refreshed once it is older than
+    max_age and whenever the websocket (re)connects. A refresh only re-parses the devices whose raw config changed.
+    Writes issued by the companion itself (snap updates, APNs removals) are merged into the cache directly once they
+    are confirmed. A failed or timed out write might still have been applied by Moonraker, therefore it marks the
+    cache as stale, see write_failed.
+
+    Metrics (prefixed with "app_cfg."):
+        hits: Configs served from the cache.
+        refreshes: Fetches of the namespace.
+        parsed: Device configs that were (re-)parsed during a refresh.
+        reused: Device configs that were unchanged during a refresh and kept.
+
+    Attributes:
+        jrpc (MoonrakerClient): The client used to read the namespace.
+        printer_name (str): The name of the printer.
+        max_age (float): Seconds until the cached configs are considered stale.
+    '''
+
+    def __init__(self, jrpc: MoonrakerClient, printer_name: str, max_age: float = 60.0) -> None:
+        self._jrpc: MoonrakerClient = jrpc
+        self.max_age: float = max_age
+        self._logger: logging.Logger = logging.getLogger(f'mobileraker.{printer_name}.app_cfg')
+        self._metrics: Metrics = get_metrics(printer_name)
+        self._raw: Dict[str, Dict[str, Any]] = {}
+        self._cfgs: Dict[str, DeviceNotificationEntry] = {}
+        self._fetched_at: Optional[float] = None
+
+        self._jrpc.register_connection_listener(lambda connected: self.invalidate() if connected else None)
+
+    @property
+    def is_stale(self) -> bool:
+        return self._fetched_at is None or time.monotonic() - self._fetched_at >= self.max_age
+
+    @property
+    def cached_configs(self) -> List[DeviceNotificationEntry]:
+        '''
+        The last known configs, without fetching them if the cache is stale.
+        '''
+        return list(self._cfgs.values())
+
+    def invalidate(self) -> None:
+        '''
+        Mark the cache as stale, the next call to get_configs fetches the namespace again.
+        '''
+        self._fetched_at = None
+
+    async def get_configs(self) -> List[DeviceNotificationEntry]:
+        '''
+        Returns the configs of all registered devices, fetching them from Moonraker if the cache is stale.
+        If the fetch fails, the last known configs are returned.
+
+        Returns:
+            List[DeviceNotificationEntry]: The device configs.
+        '''
+        if not self.is_stale:
+            self._metrics.inc('app_cfg.hits')
+            return list(self._cfgs.values())
+
+        try:
+            response, k_error = await self._jrpc.send_and_receive_method("server.database.get_item",
+                                                                         {"namespace": "mobileraker", "key": "fcm"})
+            if k_error:
+                self._logger.warning(
+                    "Could not fetch app cfgs from moonraker, moonraker returned error %s", k_error)
+                return list(self._cfgs.values())
+            await self._apply(response["result"]["value"])
+            return list(self._cfgs.values())
+        except (ConnectionError, asyncio.TimeoutError) as err:
+            self._logger.warning(
+                "Could not fetch app cfgs from moonraker, %s: %s", type(err), err)
+            return list(self._cfgs.values())
+
+    def update_snap(self, machine_id: str, snap: NotificationSnap) -> None:
+        '''
+        Merge a snap that was written to Moonraker into the cache.
+        '''
+        cfg = self._cfgs.get(machine_id)
+        if cfg is None:
+            return
+        cfg.snap = snap
+        self._raw[machine_id]['snap'] = snap.toJSON()
+
+    def write_failed(self, machine_id: str) -> None:
+        '''
+        Mark the cache as stale after a write of the companion failed. The write might have been applied anyway,
+        the next call to get_configs reads the actual config instead of evaluating against the old one.
+        '''
+        self._logger.info("A write of the cfg of %s failed, the cached cfgs are refreshed", machine_id)
+        self.invalidate()
+
+    def remove_apns(self, machine_id: str) -> None:
+        '''
+        Merge the removal of a device's APNs entry into the cache.
+        '''
+        cfg = self._cfgs.get(machine_id)
+        if cfg is None:
+            return
+        cfg.apns = None
+        self._raw[machine_id].pop('apns', None)
+
+    async def _apply(self, raw_cfgs: Dict[str, Any]) -> None:
+        self._metrics.inc('app_cfg.refreshes')
+        raw: Dict[str, Dict[str, Any]] = {}
+        cfgs: Dict[str, DeviceNotificationEntry] = {}
+        for entry_id, device_json in raw_cfgs.items():
+            if not is_valid_uuid(entry_id):
+                continue
+            if 'fcmToken' not in device_json:
+                await self._remove_old_fcm_cfg(entry_id)
+                continue
+
+            cached = self._cfgs.get(entry_id)
+            if cached is not None and self._raw[entry_id] == device_json:
+                self._metrics.inc('app_cfg.reused')
+                cfgs[entry_id] = cached
+            else:
+                self._metrics.inc('app_cfg.parsed')
+                cfgs[entry_id] = DeviceNotificationEntry.fromJSON(entry_id, device_json)
+            raw[entry_id] = device_json
+
+        self._raw = raw
+        self._cfgs = cfgs
+        self._fetched_at = time.monotonic()
+        self._logger.info('Fetched %i app Cfgs!', len(cfgs))
+
+    async def _remove_old_fcm_cfg(self, machine_id: str) -> None:
+        try:
+            await self._jrpc.send_method(
+                method="server.database.delete_item",
+                params={"namespace": "mobileraker",
+                        "key": f"fcm.{machine_id}"},
+            )
+        except (ConnectionError, asyncio.TimeoutError)as err:
+            self._logger.warning(
+                "Could not remove old fcm cfg for %s, %s", machine_id, err)
@@ -1,12 +1,15 @@
-from asyncio import AbstractEventLoop, sleep
+from asyncio import AbstractEventLoop, Task
 import asyncio
-import hashlib
 import logging
-from typing import Any, Callable, Dict, List, Optional
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from mobileraker.client.moonraker_client import MoonrakerClient
 from mobileraker.data.dtos.moonraker.printer_objects import DisplayStatus, FilamentSensor, GCodeFile, GCodeMove, PrintStats, ServerInfo, Toolhead, VirtualSDCard
 from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
-from mobileraker.util.functions import to_klipper_object_identifier
+from mobileraker.service.gcode_meta_cache import GCodeMetaCache
+from mobileraker.util.functions import content_fingerprint, to_klipper_object_identifier
+from mobileraker.util.metrics import Metrics, get_metrics
 
 
 class KlippyNotReadyError(Exception):
@@ -16,17 +19,18 @@ class KlippyNotReadyError(Exception):
     pass
 
 class DataSyncService:
-    # Static list to define the objects to subscribe for updates if they are available.
-    _OBJECTS_TO_SUBSCRIBE = [ 
-        "print_stats",
-        "display_status",
-        "virtual_sdcard",
-        "toolhead",
-        "gcode_move",
-        "gcode_macro TIMELAPSE_TAKE_FRAME",
-        "filament_switch_sensor",
-        "filament_motion_sensor",
-    ]
+    # Static registry of the objects to subscribe for updates if they are available, mapped to the fields to subscribe to.
+    # Keeping the fields narrow avoids streaming (and parsing) data the companion never reads. For the same reason the
+    # toolhead is not subscribed, none of its fields are read.
+    _OBJECTS_TO_SUBSCRIBE: Dict[str, List[str]] = {
+        "print_stats": PrintStats.SUBSCRIPTION_FIELDS,
+        "display_status": DisplayStatus.SUBSCRIPTION_FIELDS,
+        "virtual_sdcard": VirtualSDCard.SUBSCRIPTION_FIELDS,
+        "gcode_move": GCodeMove.SUBSCRIPTION_FIELDS,
+        "gcode_macro TIMELAPSE_TAKE_FRAME": ["is_paused"],
+        "filament_switch_sensor": FilamentSensor.SUBSCRIPTION_FIELDS,
+        "filament_motion_sensor": FilamentSensor.SUBSCRIPTION_FIELDS,
+    }
 
     '''
     This service is responsible for keeping track of the latest printer data and then
@@ -37,6 +41,7 @@ class DataSyncService:
         printer_name (str): The name of the printer.
         loop (AbstractEventLoop): The event loop used for handling asynchronous tasks.
         resync_retries (int): The number of retries to perform when resyncing data.
+        meta_cache (Optional[GCodeMetaCache]): Cache for gcode file metadata, a non-persistent cache is used if not provided.
     '''
 
     def __init__(
@@ -45,13 +50,15 @@ class DataSyncService:
             printer_name: str,
             loop: AbstractEventLoop,
             resync_retries: int = 30,
+            meta_cache: Optional[GCodeMetaCache] = None,
     ) -> None:
         super().__init__()
         self._jrpc: MoonrakerClient = jrpc
         self._loop: AbstractEventLoop = loop
         self._logger: logging.Logger = logging.getLogger(f'mobileraker.{printer_name}.sync')
+        self._metrics: Metrics = get_metrics(printer_name)
         self._queried_for_session: bool = False
-        self._objects: Dict[str, Any] = {}
+        self._objects: Dict[str, Optional[List[str]]] = {}
         self._reset_timelapse_pause: Optional[bool] = None # Helper to reset the timelapse_pause attribute after the printer switched back from paused to printing
         self.klippy_ready: bool = False
         self.server_info: ServerInfo = ServerInfo()
@@ -65,6 +72,12 @@ class DataSyncService:
         self.timelapse_pause: Optional[bool] = None
         self.filament_sensors: Dict[str, FilamentSensor] = {}
         self.resync_retries: int = resync_retries
+        self._meta_cache: GCodeMetaCache = meta_cache if meta_cache is not None else GCodeMetaCache(printer_name)
+        self._resync_task: Optional[Task] = None
+        self._klippy_ready_event: asyncio.Event = asyncio.Event()
+        # (message, fingerprint) of the last snapshot, the fingerprints are only computed if the message changed
+        self._m117_fingerprint: Tuple[Optional[str], str] = (None, '')
+        self._gcode_response_fingerprint: Tuple[Optional[str], str] = (None, '')
         
 
         self._snapshot_listeners: List[Callable[[PrinterSnapshot], None]] = []
@@ -84,41 +97,58 @@ class DataSyncService:
         self._jrpc.register_method_listener(
             'notify_gcode_response', lambda resp: self._on_gcode_response(resp["params"][0]))
 
+        self._jrpc.register_method_listener(
+            'notify_filelist_changed', lambda resp: self._meta_cache.on_filelist_changed(resp["params"][0]))
+
         self._jrpc.register_connection_listener(self._on_jrpc_connection_state)
 
-    def _parse_objects(self, status_objects: Dict[str, Any], err: Optional[str] = None) -> None:
+    def _parse_objects(self, status_objects: Dict[str, Any], err: Optional[str] = None, force_notify: bool = False) -> None:
         '''
         Parse status objects and update the corresponding attributes.
+        Listeners are only notified if a value relevant for the notification evaluation changed.
 
         Parameters:
             status_objects (Dict[str, Any]): The dictionary containing status objects.
+            force_notify (bool): Notify listeners even if no relevant value changed.
 
         Returns:
             None
         '''
         self._logger.debug("Received status update for %s", status_objects)
         fetchMeta = False
+        changed = force_notify
         for rawObjectKey, object_data in status_objects.items():
             object_identifier, object_name = to_klipper_object_identifier(rawObjectKey)
 
 
             if object_identifier == 'print_stats':
+                last_print_stats = self.print_stats
                 self.print_stats = self.print_stats.updateWith(object_data)
             
                 # If the state is printing and _reset_timelapse_pause is True, we reset the timelapse_pause attribute
                 if self.print_stats.state != 'paused' and self._reset_timelapse_pause:
                     self.timelapse_pause = False
                     self._reset_timelapse_pause = False
+                    changed = True
                     self._logger.info("Printer has unpaused after Timelapse plugin took frame. Resetting timelapse_pause attribute.")
 
                 # When the print_stats object is updated, we need to fetch the metadata for the current file
-                fetchMeta = True
+                if self.print_stats is not last_print_stats:
+                    fetchMeta = True
             elif object_identifier == 'display_status':
+                last_display_status = self.display_status
                 self.display_status = self.display_status.updateWith(
                     object_data)
+                changed |= self.display_status is not last_display_status
             elif object_identifier == 'virtual_sdcard':
+                last_virtual_sdcard = self.virtual_sdcard
                 self.virtual_sdcard = self.virtual_sdcard.updateWith(
                     object_data)
+                changed |= self.virtual_sdcard is not last_virtual_sdcard
+            # Toolhead and gcode_move do not affect the evaluation threshold. gcode_move is read by the evaluation, the
+            # z position is the fallback of PrinterSnapshot.current_layer ($cur_layer) if Klipper reports no layer info.
+            # Updates that only touch them are deferred, they do not produce a snapshot and the next relevant update
+            # (while printing virtual_sdcard changes with almost every update) carries their latest state.
             elif object_identifier == 'toolhead':
                 self.toolhead = self.toolhead.updateWith(object_data)
             elif object_identifier == 'gcode_move':
@@ -129,13 +159,18 @@ class DataSyncService:
                     continue
                 
                 #check if the sensor is already in the list, if not create a default one and call updateWith
-                sensor = self.filament_sensors[object_name] if object_name in self.filament_sensors else FilamentSensor(name= object_name, kind = object_identifier)
-                self.filament_sensors[object_name] = sensor.updateWith(object_data)
+                sensor = self.filament_sensors[object_name] if object_name in self.filament_sensors else None
+                updated_sensor = (sensor or FilamentSensor(name= object_name, kind = object_identifier)).updateWith(object_data)
+                if updated_sensor is not sensor:
+                    # Copy on write, the previous dict is shared with the snapshots that were already taken
+                    self.filament_sensors = {**self.filament_sensors, object_name: updated_sensor}
+                    changed = True
 
             elif rawObjectKey == 'gcode_macro TIMELAPSE_TAKE_FRAME':
                 if 'is_paused' in object_data:
                     is_paused = object_data['is_paused']
                     if is_paused is True:
+                        changed |= self.timelapse_pause is not True
                         self.timelapse_pause = True
                         self._reset_timelapse_pause = False
                         self._logger.info("Timelapse plugin has paused the printer. Ignoring the next paused printer state.")
@@ -151,8 +186,10 @@ class DataSyncService:
         # It would be better if the _notify_listeners()/sync current file is called in a different context since this method should only parse!
         if fetchMeta:
             self._loop.create_task(self._sync_current_file())
-        else:
+        elif changed:
             self._notify_listeners()
+        else:
+            self._metrics.inc('sync.suppressed_updates')
 
     def _on_klippy_ready(self) -> None:
         '''
@@ -162,6 +199,8 @@ class DataSyncService:
             None
         '''
         self._logger.info("Klippy has reported a ready state")
+        # Wakes up a resync that is waiting in its backoff, otherwise a new resync is started
+        self._klippy_ready_event.set()
         self._loop.create_task(self.resync())
 
     def _on_klippy_shutdown(self) -> None:
@@ -209,6 +248,9 @@ class DataSyncService:
         if is_connected:
             self._loop.create_task(self.resync())
         else:
+            # A running resync belongs to the closed connection, the next connection starts a fresh one
+            if self._resync_task is not None and not self._resync_task.done():
+                self._resync_task.cancel()
             self._queried_for_session = False
             self.klippy_ready = False
 
@@ -233,10 +275,31 @@ class DataSyncService:
         except (asyncio.TimeoutError, ConnectionError) as err:
             self._logger.error("Could not sync klippy data: %s", err)
 
-    async def _sync_printer_data(self) -> None:
+    async def _fetch_object_list(self) -> Optional[List[str]]:
+        '''
+        Fetch the list of all available printer objects.
+        This is issued together with server.info, so an error is expected while Klippy is not ready.
+
+        Returns:
+            Optional[List[str]]: The available objects, or None if they could not be fetched.
+        '''
+        try:
+            response, k_err = await self._jrpc.send_and_receive_method("printer.objects.list")
+            if k_err:
+                self._logger.info("Could not fetch printer objects list. Moonraker returned error: %s", k_err)
+                return None
+            return response["result"]["objects"]
+        except (asyncio.TimeoutError, ConnectionError) as err:
+            self._logger.error("Could not fetch printer objects list: %s", err)
+            return None
+
+    async def _sync_printer_data(self, object_list: Optional[List[str]] = None) -> None:
         '''
         Synchronize printer data with Moonraker.
 
+        Parameters:
+            object_list (Optional[List[str]]): The available printer objects, they are fetched if not provided.
+
         Returns:
             None
         '''
@@ -244,28 +307,27 @@ class DataSyncService:
             self._logger.info("Syncing printer Objects")
 
             # We need to get all subscribable objects from the printer, as we might not have all of them yet.
-
-            response, k_err = await self._jrpc.send_and_receive_method("printer.objects.list")
-
-            if k_err:
-                self._logger.warning("Could not sync printer data. Moonraker returned error while fetching objects list: %s", k_err)
+            if object_list is None:
+                object_list = await self._fetch_object_list()
+            if object_list is None:
+                self._logger.warning("Could not sync printer data, the objects list is not available")
                 return
 
-            object_list: List[str] = response["result"]["objects"]
-
             self._objects = {}
             for obj in object_list:
                 object_identifier, _ = to_klipper_object_identifier(obj)
-                if object_identifier in self._OBJECTS_TO_SUBSCRIBE or obj in self._OBJECTS_TO_SUBSCRIBE:
-                    self._objects[obj] = None
+                if obj in self._OBJECTS_TO_SUBSCRIBE:
+                    self._objects[obj] = self._OBJECTS_TO_SUBSCRIBE[obj]
+                elif object_identifier in self._OBJECTS_TO_SUBSCRIBE:
+                    self._objects[obj] = self._OBJECTS_TO_SUBSCRIBE[object_identifier]
 
-            self._logger.info("Subscribing to printer Objects: %s", self._objects.keys())
+            self._logger.info("Subscribing to printer Objects: %s", self._objects)
 
             response, k_err = await self._jrpc.send_and_receive_method("printer.objects.query", {"objects": self._objects})
             if k_err:
                 self._logger.warning("Could not sync printer data. Moonraker returned error %s", k_err)
                 return
-            self._parse_objects(response["result"]["status"])
+            self._parse_objects(response["result"]["status"], force_notify=True)
         except (asyncio.TimeoutError, ConnectionError) as err:
             self._logger.error("Could not sync printer data: %s", err)
 
@@ -306,23 +368,55 @@ class DataSyncService:
         for callback in self._snapshot_listeners:
             callback(snap)
 
-    async def _resync(self, no_try: int = 0) -> None:
-        if no_try >= self.resync_retries:
-            raise KlippyNotReadyError(
-                f"Resync process was not completed after {no_try} retries. Klippy was not ready after {self.resync_retries} retries.")
+    async def _resync(self) -> None:
+        for no_try in range(self.resync_retries):
+            self._klippy_ready_event.clear()
+            # server.info and printer.objects.list do not depend on each other, the list is only used if klippy is ready
+            _, object_list = await asyncio.gather(self._sync_klippy_data(), self._fetch_object_list())
 
-        await self._sync_klippy_data()
+            if self.klippy_ready:
+                # File changes are missed while disconnected, cached metadata is verified again before it is used
+                self._meta_cache.mark_unverified()
+                await self._sync_printer_data(object_list)
+                return
 
-        if self.klippy_ready:
-            await self._sync_printer_data()
-        else:
-            wait_for = min(pow(2, no_try + 1), 5 * 60)
+            # Exponential backoff with equal jitter, so printers sharing a host do not retry in lockstep
+            backoff = min(pow(2, no_try + 1), 5 * 60)
+            wait_for = backoff / 2 + random.uniform(0, backoff / 2)
             self._logger.warning(
                 "Klippy was not ready. Trying resync again in %i seconds...", wait_for)
-            await sleep(wait_for)
-            await self._resync(no_try=no_try + 1)
+            try:
+                # A notify_klippy_ready cuts the backoff short
+                await asyncio.wait_for(self._klippy_ready_event.wait(), timeout=wait_for)
+                self._logger.info("Klippy reported ready during backoff, resyncing now")
+            except asyncio.TimeoutError:
+                pass
+
+        raise KlippyNotReadyError(
+            f"Resync process was not completed. Klippy was not ready after {self.resync_retries} retries.")
+
+    async def _verify_cached_meta(self, file_name: str) -> None:
+        # Only lists the directory of the file, listing the whole gcodes root is expensive on large libraries
+        directory, _, base_name = file_name.rpartition('/')
+        try:
+            response, k_err = await self._jrpc.send_and_receive_method(
+                'server.files.get_directory', {'path': f'gcodes/{directory}' if directory else 'gcodes', 'extended': False})
+            if k_err:
+                self._logger.warning("Could not verify the cached metadata of %s. Moonraker returned error %s", file_name, k_err)
+                return
+            file = next((f for f in response['result'].get('files', []) if f.get('filename') == base_name), {})
+            self._meta_cache.verify(file_name, file.get('modified'), file.get('size'))
+        except (asyncio.TimeoutError, ConnectionError) as err:
+            self._logger.error("Could not verify the cached metadata of %s: %s", file_name, err)
 
     async def _fetch_gcode_meta(self, file_name: str) -> Optional[GCodeFile]:
+        if self._meta_cache.unverified(file_name) is not None:
+            await self._verify_cached_meta(file_name)
+        cached = self._meta_cache.get(file_name)
+        if cached is not None:
+            self._logger.info("Using cached metadata for %s", file_name)
+            return cached
+
         try:
             self._logger.info("Fetching metadata for %s", file_name)
             meta,  k_err = await self._jrpc.send_and_receive_method('server.files.metadata', {'filename': file_name})
@@ -336,7 +430,9 @@ class DataSyncService:
                 
                 return None
             self._logger.debug("Metadata for %s: %s", file_name, meta)
-            return GCodeFile.from_json(meta['result'])
+            gcode_file = GCodeFile.from_json(meta['result'])
+            self._meta_cache.put(gcode_file)
+            return gcode_file
         except (asyncio.TimeoutError, ConnectionError) as err:
             self._logger.error(
                 "Could not fetch metadata for %s: %s", file_name, err)
@@ -345,10 +441,24 @@ class DataSyncService:
     async def resync(self) -> None:
         '''
         Perform a (Re)Sync with Moonraker.
+        Concurrent calls (e.g. connection listener and notify_klippy_ready) share the same resync run.
 
         Returns:
             None
         '''
+        if self._resync_task is not None and not self._resync_task.done():
+            self._logger.info("(Re)Sync already in progress, joining it")
+            self._metrics.inc('sync.resyncs_joined')
+        else:
+            self._resync_task = self._loop.create_task(self._run_resync())
+        try:
+            await asyncio.shield(self._resync_task)
+        except asyncio.CancelledError:
+            self._logger.info("Resync task was cancelled")
+
+    async def _run_resync(self) -> None:
+        start = time.monotonic()
+        self._metrics.inc('sync.resyncs')
         try:
             self._logger.info("Doing a (Re)Sync with moonraker")
             self.server_info: ServerInfo = ServerInfo()
@@ -370,7 +480,12 @@ class DataSyncService:
             else:
                 self._logger.warning("Not subscribing to updates because either klippy was not ready or session already subed. klippy_ready: %s, _queried_for_session: %s", self.klippy_ready, self._queried_for_session)   
 
-            self._logger.info("(Re)Sync completed")
+            if self.klippy_ready:
+                time_to_ready = time.monotonic() - start
+                self._metrics.set('sync.time_to_ready', time_to_ready)
+                self._logger.info("(Re)Sync completed, printer was ready after %.2f seconds", time_to_ready)
+            else:
+                self._logger.info("(Re)Sync completed")
         except KlippyNotReadyError:
             self._logger.error("Resync process was not completed. Klippy was not ready after %i retries.", self.resync_retries)
         except asyncio.TimeoutError:
@@ -385,7 +500,7 @@ class DataSyncService:
         Take a snapshot of the current printer data.
 
         Returns:
-            PrinterSnapshot: An instance of PrinterSnapshot representing the current printer data.
+            PrinterSnapshot: An instance of PrinterSnapshot representing the current printer data, it is frozen.
         '''
         # Create a new PrinterSnapshot instance with the current Klippy state or "error" if Klippy is not ready.
         snapshot = PrinterSnapshot(self.klippy_ready,
@@ -398,13 +513,18 @@ class DataSyncService:
         snapshot.gcode_move = self.gcode_move
         snapshot.current_file = self.current_file
         snapshot.m117 = self.display_status.message
-        snapshot.m117_hash = hashlib.sha256(snapshot.m117.encode(
-            "utf-8")).hexdigest() if snapshot.m117 else ''
+        if self._m117_fingerprint[0] != snapshot.m117:
+            self._m117_fingerprint = (snapshot.m117, content_fingerprint(snapshot.m117))
+        snapshot.m117_hash = self._m117_fingerprint[1]
         snapshot.gcode_response = self.gcode_response
-        snapshot.gcode_response_hash = hashlib.sha256(snapshot.gcode_response.encode(
-            "utf-8")).hexdigest() if snapshot.gcode_response else ''
+        if self._gcode_response_fingerprint[0] != snapshot.gcode_response:
+            self._gcode_response_fingerprint = (snapshot.gcode_response, content_fingerprint(snapshot.gcode_response))
+        snapshot.gcode_response_hash = self._gcode_response_fingerprint[1]
         snapshot.timelapse_pause = self.timelapse_pause
-        snapshot.filament_sensors = dict(self.filament_sensors)
+        # Never modified in place, see _parse_objects. Consecutive snapshots share it until a sensor changes.
+        snapshot.filament_sensors = self.filament_sensors
+
+        snapshot.freeze()
 
         self._logger.debug('Took a PrinterSnapshot: %s', snapshot)
         return snapshot
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from mobileraker.client.moonraker_client import MoonrakerClient
+from mobileraker.util.metrics import Metrics, get_metrics
+
+# Called with the error of the write, or None if it succeeded
+WriteCallback = Callable[[Optional[str]], None]
+
+
+class _PendingWrite(NamedTuple):
+    method: str
+    params: Dict[str, Any]
+    callback: Optional[WriteCallback]
+
+
+class DatabaseWriteBuffer:
+    '''
+    Write-behind buffer for Moonraker database writes.
+
+    Writes are collected until flush is called. Writes to the same key are coalesced, only the last post or delete
+    is sent and the callbacks of the replaced writes are dropped. Moonraker has no batch endpoint, so a flush sends
+    the buffered writes in parallel, with at most max_concurrency requests in flight.
+
+    Metrics (prefixed with "db."):
+        writes: Requests sent to Moonraker.
+        coalesced: Writes that were replaced by a later write to the same key.
+        failed: Writes that Moonraker rejected or that could not be sent.
+
+    Attributes:
+        jrpc (MoonrakerClient): The client used to send the writes.
+        printer_name (str): The name of the printer.
+        max_concurrency (int): Maximum number of writes in flight during a flush.
+    '''
+
+    def __init__(self, jrpc: MoonrakerClient, printer_name: str, max_concurrency: int = 4) -> None:
+        self._jrpc: MoonrakerClient = jrpc
+        self.max_concurrency: int = max_concurrency
+        self._logger: logging.Logger = logging.getLogger(f'mobileraker.{printer_name}.db')
+        self._metrics: Metrics = get_metrics(printer_name)
+        self._pending: Dict[Tuple[str, str], _PendingWrite] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def post_item(self, namespace: str, key: str, value: Any, callback: Optional[WriteCallback] = None) -> None:
+        self._add(namespace, key, _PendingWrite(
+            "server.database.post_item", {"namespace": namespace, "key": key, "value": value}, callback))
+
+    def delete_item(self, namespace: str, key: str, callback: Optional[WriteCallback] = None) -> None:
+        self._add(namespace, key, _PendingWrite(
+            "server.database.delete_item", {"namespace": namespace, "key": key}, callback))
+
+    async def flush(self) -> None:
+        '''
+        Send all buffered writes and wait until they are completed.
+        Failures are reported to the write's callback and never raised.
+        '''
+        if not self._pending:
+            return
+        writes = list(self._pending.values())
+        self._pending.clear()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        await asyncio.gather(*(self._send(write, semaphore) for write in writes))
+
+    def _add(self, namespace: str, key: str, write: _PendingWrite) -> None:
+        if (namespace, key) in self._pending:
+            self._metrics.inc('db.coalesced')
+        # Replacing a write keeps the position of the first one, flushes send keys in the order they were first written
+        self._pending[(namespace, key)] = write
+
+    async def _send(self, write: _PendingWrite, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            self._metrics.inc('db.writes')
+            try:
+                _, k_err = await self._jrpc.send_and_receive_method(write.method, write.params)
+            except (ConnectionError, asyncio.TimeoutError) as err:
+                k_err = f'{type(err).__name__}: {err}'
+        if k_err:
+            self._metrics.inc('db.failed')
+            self._logger.warning("%s of %s failed: %s", write.method, write.params["key"], k_err)
+        if write.callback is not None:
+            write.callback(k_err)
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from asyncio import AbstractEventLoop, Task
+from typing import Awaitable, Callable, Optional
+
+from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
+from mobileraker.util.metrics import Metrics, get_metrics
+
+
+class EvaluationScheduler:
+    '''
+    Latest-wins scheduler for the notification evaluation of a single printer.
+
+    At most one evaluation is in flight at any time. Snapshots submitted while an evaluation runs are
+    stored in a single pending slot, a newer snapshot replaces the pending one. As soon as the running
+    evaluation completes, the pending (latest) snapshot is evaluated next.
+
+    Metrics (prefixed with "eval."):
+        submitted: Snapshots handed to the scheduler.
+        merged: Snapshots that replaced a still pending snapshot. The replaced snapshot is never evaluated.
+        dropped: Snapshots discarded without a completed evaluation (timed out or pending on close).
+        completed: Evaluations that finished.
+        pending: 1 if a snapshot waits in the pending slot, else 0.
+
+    Attributes:
+        evaluate (Callable[[PrinterSnapshot], Awaitable[None]]): The coroutine function that evaluates a snapshot.
+        printer_name (str): The name of the printer.
+        loop (AbstractEventLoop): The event loop used to run the evaluations.
+        timeout (float): Maximum duration of a single evaluation in seconds.
+    '''
+
+    def __init__(
+            self,
+            evaluate: Callable[[PrinterSnapshot], Awaitable[None]],
+            printer_name: str,
+            loop: AbstractEventLoop,
+            timeout: float = 60,
+    ) -> None:
+        self._evaluate: Callable[[PrinterSnapshot], Awaitable[None]] = evaluate
+        self._loop: AbstractEventLoop = loop
+        self._timeout: float = timeout
+        self._logger: logging.Logger = logging.getLogger(f'mobileraker.{printer_name}.scheduler')
+        self.metrics: Metrics = get_metrics(printer_name)
+        self._pending: Optional[PrinterSnapshot] = None
+        self._task: Optional[Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def submit(self, snapshot: PrinterSnapshot) -> None:
+        '''
+        Schedule the evaluation of the given snapshot.
+
+        Parameters:
+            snapshot (PrinterSnapshot): The latest snapshot of the printer.
+
+        Returns:
+            None
+        '''
+        self.metrics.inc('eval.submitted')
+        if self._pending is not None:
+            self.metrics.inc('eval.merged')
+        self._pending = snapshot
+        self.metrics.set('eval.pending', 1)
+
+        if not self.is_running:
+            self._task = self._loop.create_task(self._run())
+
+    def close(self) -> None:
+        '''
+        Cancel the running evaluation and discard the pending snapshot.
+
+        Returns:
+            None
+        '''
+        if self._pending is not None:
+            self.metrics.inc('eval.dropped')
+            self._pending = None
+            self.metrics.set('eval.pending', 0)
+        if self.is_running:
+            self._task.cancel()  # type: ignore
+
+    async def _run(self) -> None:
+        while self._pending is not None:
+            snapshot, self._pending = self._pending, None
+            self.metrics.set('eval.pending', 0)
+            try:
+                await asyncio.wait_for(self._evaluate(snapshot), timeout=self._timeout)
+                self.metrics.inc('eval.completed')
+            except asyncio.TimeoutError:
+                self.metrics.inc('eval.dropped')
+                self._logger.warning('Evaluation task execution timed out after %i seconds!', self._timeout)
+            except Exception:
+                self._logger.exception('Evaluation task failed with an unexpected error')
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+from mobileraker.data.dtos.moonraker.printer_objects import GCodeFile
+from mobileraker.util.metrics import Metrics, get_metrics
+
+
+class GCodeMetaCache:
+    '''
+    Bounded LRU cache for the metadata of gcode files.
+
+    Entries are keyed by the filename (relative to the gcodes root) and remember the modified time and size
+    of the file they were read from. Moonraker's notify_filelist_changed events evict entries of files that were
+    modified, moved or deleted. Events are missed while the companion is not connected, therefore all entries are
+    marked as unverified on every (re)sync (see mark_unverified) and an unverified entry is only used again after
+    the modified time and size of its file were confirmed, see verify. If a persist_path is provided, the cache is
+    restored on start (all restored entries are unverified), so a companion restart does not re-fetch the metadata
+    of the file that is currently printing. Changes are written to disk at most once per save_delay, in the default
+    executor of the running event loop, and by flush.
+
+    Metrics (prefixed with "meta_cache."): hits, misses, evictions.
+
+    Attributes:
+        printer_name (str): The name of the printer.
+        max_entries (int): The maximum number of cached files.
+        persist_path (Optional[str]): The file used to persist the cache, None disables persistence.
+        save_delay (float): Seconds changes are collected before the cache is written to disk.
+    '''
+
+    def __init__(
+            self,
+            printer_name: str,
+            max_entries: int = 32,
+            persist_path: Optional[str] = None,
+            save_delay: float = 5.0,
+    ) -> None:
+        self.max_entries: int = max_entries
+        self.persist_path: Optional[str] = persist_path
+        self.save_delay: float = save_delay
+        self._logger: logging.Logger = logging.getLogger(f'mobileraker.{printer_name}.meta_cache')
+        self._metrics: Metrics = get_metrics(printer_name)
+        self._entries: 'OrderedDict[str, GCodeFile]' = OrderedDict()
+        # Entries whose file might have changed while the companion was not connected
+        self._unverified: Set[str] = set()
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        # Serializes the writes of the executor and flush
+        self._write_lock: threading.Lock = threading.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, filename: str) -> Optional[GCodeFile]:
+        '''
+        Returns the cached metadata for the given file or None if it is not cached.
+        '''
+        meta = self._entries.get(filename)
+        if meta is None or filename in self._unverified:
+            self._metrics.inc('meta_cache.misses')
+            return None
+        self._entries.move_to_end(filename)
+        self._metrics.inc('meta_cache.hits')
+        return meta
+
+    def put(self, meta: GCodeFile) -> None:
+        '''
+        Adds the metadata to the cache, evicting the least recently used entry if the cache is full.
+        Metadata without a modified time can not be validated and is therefore not cached.
+        '''
+        if not meta.filename or not meta.modified:
+            return
+        self._unverified.discard(meta.filename)
+        self._entries[meta.filename] = meta
+        self._entries.move_to_end(meta.filename)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._metrics.inc('meta_cache.evictions')
+        self._save()
+
+    def invalidate(self, path: str, modified: Optional[float] = None, size: Optional[int] = None) -> None:
+        '''
+        Evicts the entry of the given file. If modified and size are provided and match the cached entry, it is kept.
+        '''
+        meta = self._entries.get(path)
+        if meta is None:
+            return
+        if modified is not None and size is not None and meta.modified == modified and meta.size == size:
+            return
+        del self._entries[path]
+        self._unverified.discard(path)
+        self._logger.info("Evicted cached metadata of %s", path)
+        self._save()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._unverified.clear()
+        self._save()
+
+    def mark_unverified(self) -> None:
+        '''
+        Marks all entries as unverified, e.g. after a reconnect, because file changes might have been missed.
+        '''
+        self._unverified.update(self._entries)
+
+    def unverified(self, filename: str) -> Optional[GCodeFile]:
+        '''
+        Returns the cached metadata for the given file if it is cached but must be verified before it is used.
+        '''
+        if filename not in self._unverified:
+            return None
+        return self._entries.get(filename)
+
+    def verify(self, filename: str, modified: Optional[float], size: Optional[int]) -> None:
+        '''
+        Confirms the entry of the given file if it matches the modified time and size Moonraker currently reports
+        for the file, otherwise the entry is evicted. A modified of None means the file no longer exists.
+        '''
+        meta = self._entries.get(filename)
+        if meta is None:
+            return
+        if modified is not None and meta.modified == modified and meta.size == size:
+            self._unverified.discard(filename)
+            return
+        self._metrics.inc('meta_cache.evictions')
+        self.invalidate(filename)
+
+    def on_filelist_changed(self, event: Dict[str, Any]) -> None:
+        '''
+        Handles Moonraker's notify_filelist_changed event.
+
+        Parameters:
+            event (Dict[str, Any]): The first param of the notification.
+
+        Returns:
+            None
+        '''
+        action: str = event.get("action", "")
+        item: Dict[str, Any] = event.get("item") or {}
+        if item.get("root", "gcodes") != "gcodes":
+            return
+
+        if action == "root_update":
+            self.clear()
+            return
+
+        paths: List[str] = [item.get("path", "")]
+        source: Dict[str, Any] = event.get("source_item") or {}
+        if source.get("path"):
+            paths.append(source["path"])
+
+        if action in ("delete_dir", "move_dir"):
+            for path in paths:
+                prefix = path.rstrip('/') + '/'
+                for filename in [f for f in self._entries if f.startswith(prefix)]:
+                    self.invalidate(filename)
+        elif action in ("create_file", "modify_file"):
+            self.invalidate(item.get("path", ""), item.get("modified"), item.get("size"))
+        elif action in ("delete_file", "move_file"):
+            for path in paths:
+                self.invalidate(path)
+
+    def _load(self) -> None:
+        if self.persist_path is None or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, 'r') as f:
+                raw: List[Dict[str, Any]] = json.load(f)
+            for entry in raw[-self.max_entries:]:
+                meta = GCodeFile.from_json(entry)
+                self._entries[meta.filename] = meta
+                self._unverified.add(meta.filename)
+            self._logger.info("Restored metadata of %i files from %s", len(self._entries), self.persist_path)
+        except (OSError, ValueError, TypeError, AttributeError) as err:
+            self._logger.warning("Could not restore the metadata cache from %s: %s", self.persist_path, err)
+
+    def flush(self) -> None:
+        '''
+        Writes pending changes to disk immediately, e.g. on shutdown.
+        '''
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if self.persist_path is not None:
+            self._write(self._dump())
+
+    def _save(self) -> None:
+        if self.persist_path is None or self._save_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(self._dump())
+            return
+        self._save_handle = loop.call_later(self.save_delay, self._save_in_executor, loop)
+
+    def _save_in_executor(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._save_handle = None
+        # The entries are only modified on the event loop, serialize them here and write in the executor
+        loop.run_in_executor(None, self._write, self._dump())
+
+    def _dump(self) -> str:
+        return json.dumps([meta.to_json() for meta in self._entries.values()])
+
+    def _write(self, content: str) -> None:
+        tmp_path = f'{self.persist_path}.tmp'
+        with self._write_lock:
+            try:
+                with open(tmp_path, 'w') as f:
+                    f.write(content)
+                os.replace(tmp_path, self.persist_path)
+            except OSError as err:
+                self._logger.warning("Could not persist the metadata cache to %s: %s", self.persist_path, err)
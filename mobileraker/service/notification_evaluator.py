@@ -1,11 +1,11 @@
-from typing import List, Optional, Tuple, NamedTuple
+from typing import Any, Dict, Hashable, List, Optional, Tuple, NamedTuple
 from datetime import datetime
 
 from mobileraker.data.dtos.mobileraker.companion_request_dto import ContentDto, NotificationContentDto, ProgressNotificationContentDto, LiveActivityContentDto
 from mobileraker.data.dtos.mobileraker.notification_config_dto import DeviceNotificationEntry
 from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
 from mobileraker.util.configs import CompanionLocalConfig, CompanionRemoteConfig
-from mobileraker.util.functions import compare_version, generate_notifcation_id_from_uuid, normalized_progress_interval_reached
+from mobileraker.util.functions import compare_version, fingerprint_matches, generate_notifcation_id_from_uuid, normalized_progress_interval_reached
 from mobileraker.util.i18n import translate_implicit, translate_replace_placeholders
 from mobileraker.util.notification_placeholders import replace_placeholders
 
@@ -24,6 +24,25 @@ class NotificationEvaluator:
     This class contains no I/O operations and is designed to be easily testable.
     """
 
+    # Offsets of the notification ids per notification type, see generate_notifcation_id_from_uuid
+    STATE_ID_OFFSET = 0
+    PROGRESS_ID_OFFSET = 1
+    CUSTOM_ID_OFFSET = 2
+    FILAMENT_SENSOR_ID_OFFSET = 3
+    PROGRESSBAR_ID_OFFSET = 4
+    ID_OFFSETS: Tuple[int, ...] = (STATE_ID_OFFSET, PROGRESS_ID_OFFSET, CUSTOM_ID_OFFSET, FILAMENT_SENSOR_ID_OFFSET,
+                                   PROGRESSBAR_ID_OFFSET)
+
+    # The attributes of a device config (and its settings and snap) the evaluation reads, except the machine id and
+    # the live activity token. Devices that agree on all of them are evaluated once, see _evaluation_key.
+    EVALUATED_CFG_FIELDS: Tuple[str, ...] = ('machine_name', 'language', 'version', 'time_format', 'is_android',
+                                             'is_ios')
+    EVALUATED_SETTINGS_FIELDS: Tuple[str, ...] = ('progress_config', 'state_config', 'android_progressbar',
+                                                  'eta_sources')
+    EVALUATED_SNAP_FIELDS: Tuple[str, ...] = ('progress', 'progress_live_activity', 'progress_progressbar', 'state',
+                                              'm117', 'gcode_response', 'filament_sensors', 'last_progress',
+                                              'last_progress_live_activity', 'last_progress_progressbar')
+
     def __init__(self, companion_config: CompanionLocalConfig, remote_config: CompanionRemoteConfig):
         self.companion_config = companion_config
         self.remote_config = remote_config
@@ -90,6 +109,81 @@ class NotificationEvaluator:
             has_progressbar_notification=progressbar_noti is not None
         )
 
+    def evaluate_all_notifications_for_devices(self, cfgs: List[DeviceNotificationEntry], snapshot: PrinterSnapshot,
+                                               last_snapshot: Optional[PrinterSnapshot],
+                                               exclude_sensors: List[List[str]]) -> List[NotificationEvaluationResult]:
+        """
+        Evaluate all notification types for all devices of the printer.
+
+        Devices with equivalent evaluation inputs (see _evaluation_key) are evaluated once. The other devices of such a
+        group get a copy of the notifications with their own notification ids, channels and live activity token.
+        The results are the same as calling evaluate_all_notifications_for_device for every device.
+
+        Args:
+            cfgs: The device notification configurations
+            snapshot: Current printer snapshot
+            last_snapshot: Previous printer snapshot (for ETA calculations)
+            exclude_sensors: The sensor names to exclude from notifications, per device
+
+        Returns:
+            A NotificationEvaluationResult per device, in the order of cfgs
+        """
+        evaluated: Dict[Hashable, Tuple[DeviceNotificationEntry, NotificationEvaluationResult]] = {}
+        results: List[NotificationEvaluationResult] = []
+        for cfg, excluded in zip(cfgs, exclude_sensors):
+            key = self._evaluation_key(cfg, excluded)
+            if key not in evaluated:
+                result = self.evaluate_all_notifications_for_device(cfg, snapshot, last_snapshot, excluded)
+                evaluated[key] = (cfg, result)
+                results.append(result)
+                continue
+
+            source, result = evaluated[key]
+            offsets = {generate_notifcation_id_from_uuid(source.machine_id, offset): offset for offset in self.ID_OFFSETS}
+            results.append(result._replace(
+                notifications=[self._restamp(notification, source, offsets, cfg) for notification in result.notifications]))
+        return results
+
+    @classmethod
+    def _evaluation_key(cls, cfg: DeviceNotificationEntry, exclude_sensors: List[str]) -> Hashable:
+        """
+        Everything the evaluation of a device reads, except the machine id and the live activity token.
+        """
+        return (
+            tuple(cls._hashable(getattr(cfg, field, None)) for field in cls.EVALUATED_CFG_FIELDS),
+            tuple(cls._hashable(getattr(cfg.settings, field)) for field in cls.EVALUATED_SETTINGS_FIELDS),
+            tuple(cls._hashable(getattr(cfg.snap, field)) for field in cls.EVALUATED_SNAP_FIELDS),
+            cfg.apns is not None and bool(cfg.apns.liveActivity),
+            tuple(exclude_sensors),
+        )
+
+    @staticmethod
+    def _hashable(value: Any) -> Hashable:
+        return tuple(value) if isinstance(value, list) else value
+
+    @staticmethod
+    def _restamp(notification: ContentDto, source: DeviceNotificationEntry, offsets: Dict[int, int],
+                 target: DeviceNotificationEntry) -> ContentDto:
+        """
+        Copy a notification evaluated for the source device for the target device.
+        offsets maps the notification ids of the source device to their offset, see ID_OFFSETS.
+        """
+        if isinstance(notification, LiveActivityContentDto):
+            # Devices are only grouped with other devices that have a live activity, see _evaluation_key
+            token = target.apns.liveActivity if target.apns is not None else notification.token
+            return LiveActivityContentDto(notification.live_activity_event, token, notification.progress,
+                                          notification.eta, notification.print_state, notification.file)
+
+        if isinstance(notification, (NotificationContentDto, ProgressNotificationContentDto)):
+            # The ids are derived from the machine id and an offset per notification type, the channels are prefixed with it
+            nid = generate_notifcation_id_from_uuid(target.machine_id, offsets[notification.id])
+            channel = target.machine_id + notification.channel[len(source.machine_id):]
+            if isinstance(notification, ProgressNotificationContentDto):
+                return ProgressNotificationContentDto(notification.progress, nid, channel, notification.title, notification.body)
+            return NotificationContentDto(nid, channel, notification.title, notification.body, notification.image)
+
+        raise TypeError(f'Can not copy {type(notification).__name__} for another device')
+
     def evaluate_state_notification(self, cfg: DeviceNotificationEntry, cur_snap: PrinterSnapshot) -> Optional[NotificationContentDto]:
         """
         Evaluate if a state notification should be issued.
@@ -140,7 +234,7 @@ class NotificationEvaluator:
 
         body = translate_replace_placeholders(
             body, cfg, cur_snap, self.companion_config)
-        return NotificationContentDto(generate_notifcation_id_from_uuid(cfg.machine_id, 0), f'{cfg.machine_id}-statusUpdates', title, body)
+        return NotificationContentDto(generate_notifcation_id_from_uuid(cfg.machine_id, self.STATE_ID_OFFSET), f'{cfg.machine_id}-statusUpdates', title, body)
 
     def evaluate_progress_notification(self, cfg: DeviceNotificationEntry, cur_snap: PrinterSnapshot) -> Optional[NotificationContentDto]:
         """
@@ -168,7 +262,7 @@ class NotificationEvaluator:
                 ):
             return None
 
-        nid = generate_notifcation_id_from_uuid(cfg.machine_id, 1)
+        nid = generate_notifcation_id_from_uuid(cfg.machine_id, self.PROGRESS_ID_OFFSET)
         channel = f'{cfg.machine_id}-progressUpdates'
         title = translate_replace_placeholders(
             'print_progress_title', cfg, cur_snap, self.companion_config)
@@ -214,7 +308,7 @@ class NotificationEvaluator:
                 ):
             return None
 
-        nid = generate_notifcation_id_from_uuid(cfg.machine_id, 4)
+        nid = generate_notifcation_id_from_uuid(cfg.machine_id, self.PROGRESSBAR_ID_OFFSET)
         channel = f'{cfg.machine_id}-progressUpdates' if cfg.version is None or compare_version(cfg.version, "2.7.2") < 0 else f'{cfg.machine_id}-progressBarUpdates'
         title = translate_replace_placeholders(
             'print_progress_title', cfg, cur_snap, self.companion_config)
@@ -295,9 +389,9 @@ class NotificationEvaluator:
             return None
 
         # Check if this is a new notification
-        if is_m117 and cfg.snap.m117 == cur_snap.m117_hash:
+        if is_m117 and fingerprint_matches(cfg.snap.m117, cur_snap.m117, cur_snap.m117_hash):
             return None
-        elif not is_m117 and cfg.snap.gcode_response == cur_snap.gcode_response_hash:
+        elif not is_m117 and fingerprint_matches(cfg.snap.gcode_response, cur_snap.gcode_response, cur_snap.gcode_response_hash):
             return None
 
         return self._construct_custom_notification(cfg, cur_snap, message)
@@ -348,7 +442,7 @@ class NotificationEvaluator:
             
             body = translate_replace_placeholders(
                 'filament_sensor_triggered_body', cfg, cur_snap, self.companion_config, {'$sensor': sensor.name})
-            notifications.append(NotificationContentDto(generate_notifcation_id_from_uuid(cfg.machine_id, 3), f'{cfg.machine_id}-filamentSensor', title, body))
+            notifications.append(NotificationContentDto(generate_notifcation_id_from_uuid(cfg.machine_id, self.FILAMENT_SENSOR_ID_OFFSET), f'{cfg.machine_id}-filamentSensor', title, body))
 
         return notifications
 
@@ -375,4 +469,4 @@ class NotificationEvaluator:
         body = (split[1] if has_title else split[0]).strip()
         body = replace_placeholders(body, cfg, cur_snap, self.companion_config)
 
-        return NotificationContentDto(generate_notifcation_id_from_uuid(cfg.machine_id, 2), f'{cfg.machine_id}-m117', title, body)
\ No newline at end of file
+        return NotificationContentDto(generate_notifcation_id_from_uuid(cfg.machine_id, self.CUSTOM_ID_OFFSET), f'{cfg.machine_id}-m117', title, body)
\ No newline at end of file
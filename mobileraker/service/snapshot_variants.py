@@ -0,0 +1,88 @@
+from typing import Dict, List, Optional
+
+from mobileraker.client.webcam_snapshot_client import SnapshotVariant
+from mobileraker.data.dtos.mobileraker.notification_config_dto import DeviceNotificationEntry
+
+# The sizes a webcam snapshot is rendered in, largest first
+SNAPSHOT_VARIANTS: Dict[str, SnapshotVariant] = {
+    'full': SnapshotVariant('full', 1024, 85),
+    'medium': SnapshotVariant('medium', 640, 75),
+    'thumbnail': SnapshotVariant('thumbnail', 320, 60),
+}
+
+
+class SnapshotVariantPolicy:
+    '''
+    Decides which size of a webcam snapshot is sent to which device.
+
+    Every device gets the variant configured for its platform. If the base64 encoded images of all devices in a push
+    exceed the payload budget, the largest images are replaced by the next smaller variant until the push fits,
+    as last resort a device gets no image at all. This class contains no I/O.
+
+    Attributes:
+        android (str): The variant sent to Android devices and devices that did not report their platform.
+        ios (str): The variant sent to iOS devices.
+        budget (int): Maximum number of image bytes per push, 0 disables the budget.
+    '''
+
+    def __init__(self, android: str = 'full', ios: str = 'full', budget: int = 0) -> None:
+        self.android: str = android
+        self.ios: str = ios
+        self.budget: int = budget
+
+    @property
+    def variants(self) -> List[SnapshotVariant]:
+        '''
+        The variants a snapshot has to be rendered in.
+        '''
+        if self.budget > 0:
+            # Any variant smaller than the preferred ones might be needed to fit the budget
+            largest = min(list(SNAPSHOT_VARIANTS).index(name) for name in (self.android, self.ios))
+            return list(SNAPSHOT_VARIANTS.values())[largest:]
+        return [variant for name, variant in SNAPSHOT_VARIANTS.items() if name in (self.android, self.ios)]
+
+    def preferred(self, cfg: DeviceNotificationEntry) -> str:
+        return self.ios if cfg.is_ios else self.android
+
+    def assign(self, images: List[Optional[Dict[str, str]]], preferred: List[str]) -> List[Optional[str]]:
+        '''
+        Picks the encoded image for every device of a push.
+
+        Args:
+            images (List[Optional[Dict[str, str]]]): Per device, the encoded variants of its webcam's snapshot.
+            preferred (List[str]): Per device, the name of the preferred variant.
+
+        Returns:
+            List[Optional[str]]: Per device, the encoded image to send or None.
+        '''
+        ladder = list(SNAPSHOT_VARIANTS)
+        # Per device, the index into the ladder of the chosen variant, len(ladder) means no image
+        chosen = [self._available(device_images, ladder, ladder.index(name))
+                  for device_images, name in zip(images, preferred)]
+
+        def image(device: int) -> Optional[str]:
+            device_images = images[device]
+            return device_images[ladder[chosen[device]]] if device_images and chosen[device] < len(ladder) else None
+
+        if self.budget > 0:
+            sizes = [len(image(device) or '') for device in range(len(images))]
+            total = sum(sizes)
+            while total > self.budget:
+                device = max(range(len(sizes)), key=sizes.__getitem__)
+                chosen[device] = self._available(images[device], ladder, chosen[device] + 1)
+                total -= sizes[device]
+                sizes[device] = len(image(device) or '')
+                total += sizes[device]
+
+        return [image(device) for device in range(len(images))]
+
+    @staticmethod
+    def _available(device_images: Optional[Dict[str, str]], ladder: List[str], start: int) -> int:
+        '''
+        The index of the first variant from start on that was rendered, or len(ladder) if there is none.
+        '''
+        if device_images:
+            for index in range(start, len(ladder)):
+                if ladder[index] in device_images:
+                    return index
+        return len(ladder)
@@ -1,5 +1,5 @@
 import logging
-from typing import Dict, Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 from urllib.parse import urlsplit
 import time
 
@@ -10,10 +10,13 @@ from mobileraker.data.dtos.moonraker.webcam_data import WebcamData
 class WebcamManager:
     """
     Manages webcam configurations and snapshot clients with caching.
+
+    If use_stream is set, clients of webcams that serve an MJPEG stream capture from that stream.
     """
     
-    def __init__(self, jrpc: MoonrakerClient):
+    def __init__(self, jrpc: MoonrakerClient, use_stream: bool = False):
         self._jrpc = jrpc
+        self.use_stream = use_stream
         self._logger = logging.getLogger('mobileraker.webcam')
         # Cache stores tuple of (WebcamSnapshotClient, timestamp)
         self._client_cache: Dict[str, Tuple[WebcamSnapshotClient, float]] = {}
@@ -35,13 +38,14 @@ class WebcamManager:
             Optional[WebcamSnapshotClient]: The webcam client if found, None otherwise.
         """
         # Check if we have this client in cache and it's not expired
+        expired: Optional[WebcamSnapshotClient] = None
         if webcam_uid in self._client_cache:
             client, ts = self._client_cache[webcam_uid]
             if time.time() - ts < self._CACHE_TTL:
                 return client
             else:
-                # expired
-                del self._client_cache[webcam_uid]
+                # expired, kept until the new config is known so an open stream survives an unchanged config
+                expired, _ = self._client_cache.pop(webcam_uid)
                 self._logger.debug("Cached webcam client for %s expired and was removed", webcam_uid)
 
         try:
@@ -54,10 +58,12 @@ class WebcamManager:
 
             if k_err:
                 self._logger.warning("Failed to fetch webcam data: %s", k_err)
+                self._close(expired)
                 return None
             
             if "result" not in response or "webcam" not in response["result"]:
                 self._logger.warning("Invalid response format from webcam API")
+                self._close(expired)
                 return None
             
             webcam_data = WebcamData(response["result"]["webcam"])
@@ -66,7 +72,12 @@ class WebcamManager:
             base_url = f"http://{split_url.hostname}"
             
             # Create client from the data
-            client = WebcamSnapshotClient(webcam_data, base_url=base_url)
+            stream_uri = webcam_data.mjpeg_stream_url if self.use_stream else None
+            client = WebcamSnapshotClient(webcam_data, base_url=base_url, stream_uri=stream_uri or None)
+            if expired is not None and self._same_config(expired, client):
+                client = expired
+            else:
+                self._close(expired)
             
             # Cache this client with current timestamp
             self._client_cache[webcam_uid] = (client, time.time())
@@ -75,11 +86,33 @@ class WebcamManager:
             
         except Exception as e:
             self._logger.error("Error fetching webcam data: %s", str(e))
+            self._close(expired)
             return None
-    
-    def clear_cache(self):
+
+    def stop_streams(self) -> None:
+        """
+        Closes the MJPEG streams of all cached clients. They are opened again by the next capture.
+        """
+        for client, _ in self._client_cache.values():
+            client.stop_stream()
+
+    def clear_cache(self, message: Optional[Dict[str, Any]] = None):
         """
         Clears the webcam client cache.
+
+        Args:
+            message (Optional[Dict[str, Any]]): The notify_webcams_changed notification, if called as listener.
         """
+        self.stop_streams()
         self._client_cache.clear()
-        self._logger.info("Webcam client cache cleared")
\ No newline at end of file
+        self._logger.info("Webcam client cache cleared")
+
+    @staticmethod
+    def _same_config(a: WebcamSnapshotClient, b: WebcamSnapshotClient) -> bool:
+        return (a.uri, a.stream_uri, a.rotation, a.flip_horizontal, a.flip_vertical, a.name) == \
+            (b.uri, b.stream_uri, b.rotation, b.flip_horizontal, b.flip_vertical, b.name)
+
+    @staticmethod
+    def _close(client: Optional[WebcamSnapshotClient]) -> None:
+        if client is not None:
+            client.stop_stream()
\ No newline at end of file
@@ -0,0 +1,128 @@
+import time
+from asyncio import Task
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Optional, Tuple
+
+from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
+from mobileraker.util.metrics import Metrics
+
+
+class NotificationPredictor:
+    '''
+    Predicts whether the companion is about to send a progress or time based notification.
+
+    The printing speed is derived from the progress samples of the last `window` seconds. A notification is
+    predicted if, within the next `lead` seconds, the progress is expected to reach the next increments boundary
+    (relative to the last evaluated snapshot) or the end of the print, or the time interval elapses.
+    This class contains no I/O.
+
+    Attributes:
+        increments (int): The progress increments in percent that trigger an evaluation.
+        interval (int): Seconds after which an evaluation is triggered regardless of the progress.
+        lead (float): How many seconds ahead notifications are predicted.
+        window (float): The time window in seconds used to estimate the printing speed.
+    '''
+
+    def __init__(self, increments: int, interval: int, lead: float = 10.0, window: float = 60.0) -> None:
+        self.increments: int = increments
+        self.interval: int = interval
+        self.lead: float = lead
+        self.window: float = window
+        self._samples: Deque[Tuple[float, float]] = deque()
+
+    def observe(self, snapshot: PrinterSnapshot, now: float) -> None:
+        '''
+        Record the progress of a snapshot taken at the given monotonic time.
+        '''
+        relative = snapshot.print_progress_by_fileposition_relative
+        if snapshot.print_state != 'printing' or relative is None:
+            self._samples.clear()
+            return
+        progress = relative * 100
+        if self._samples and progress < self._samples[-1][1]:
+            # A new print started
+            self._samples.clear()
+        self._samples.append((now, progress))
+        while now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+    @property
+    def rate(self) -> Optional[float]:
+        '''
+        The printing speed in percent per second, or None if there are not enough samples yet.
+        '''
+        if len(self._samples) < 2:
+            return None
+        (t0, p0), (t1, p1) = self._samples[0], self._samples[-1]
+        if t1 - t0 < 1:
+            return None
+        return (p1 - p0) / (t1 - t0)
+
+    def notification_expected(self, last_evaluated: Optional[PrinterSnapshot], snapshot: PrinterSnapshot) -> bool:
+        '''
+        Returns True if a notification is expected within the next `lead` seconds.
+
+        Args:
+            last_evaluated (Optional[PrinterSnapshot]): The snapshot that passed the last evaluation threshold.
+            snapshot (PrinterSnapshot): The current snapshot.
+        '''
+        if last_evaluated is None or snapshot.print_state != 'printing' or not self._samples:
+            return False
+
+        if (datetime.now() - last_evaluated.timestamp).total_seconds() + self.lead >= self.interval + 5:
+            return True
+
+        rate = self.rate
+        last_progress = last_evaluated.progress
+        if not rate or rate <= 0 or last_progress is None:
+            return False
+        current = self._samples[-1][1]
+        next_boundary = min(100, last_progress - (last_progress % self.increments) + self.increments)
+        return (next_boundary - current) / rate <= self.lead
+
+
+class WebcamFrameCache:
+    '''
+    Short lived cache of (prefetched) webcam captures, keyed by webcam.
+    Entries are capture tasks, so a capture that is still running when the notification is sent is awaited
+    instead of started a second time. A capture is used for a single evaluation only.
+
+    Metrics (prefixed with "prefetch."): started, hits, wasted (expired without being used).
+
+    Attributes:
+        ttl (float): Seconds a capture is considered fresh.
+    '''
+
+    def __init__(self, metrics: Metrics, ttl: float = 15.0) -> None:
+        self.ttl: float = ttl
+        self._metrics: Metrics = metrics
+        # webcam key -> (capture started at, capture task)
+        self._entries: Dict[str, Tuple[float, Task]] = {}
+
+    def __contains__(self, webcam_key: object) -> bool:
+        self._expire()
+        return webcam_key in self._entries
+
+    def put(self, webcam_key: str, capture: Task) -> None:
+        self._metrics.inc('prefetch.started')
+        self._entries[webcam_key] = (time.monotonic(), capture)
+
+    def take(self, webcam_key: str) -> Optional[Task]:
+        '''
+        Removes and returns the fresh capture of the webcam, or None if there is none.
+        '''
+        self._expire()
+        entry = self._entries.pop(webcam_key, None)
+        if entry is None:
+            return None
+        self._metrics.inc('prefetch.hits')
+        return entry[1]
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for key in [k for k, (started, _) in self._entries.items() if now - started > self.ttl]:
+            _, capture = self._entries.pop(key)
+            self._metrics.inc('prefetch.wasted')
+            if not capture.done():
+                capture.cancel()
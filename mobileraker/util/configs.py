@@ -96,9 +96,26 @@ class CompanionLocalConfig:
             'general', 'eta_format', fallback='%d.%m.%Y, %H:%M:%S')
         self.include_snapshot: bool = self.config.getboolean(
             'general', 'include_snapshot', fallback=True)
+        self.webcam_prefetch: bool = self.config.getboolean(
+            'general', 'webcam_prefetch', fallback=False)
+        self.webcam_stream: bool = self.config.getboolean(
+            'general', 'webcam_stream', fallback=False)
+        self.snapshot_size_android: str = self._snapshot_size('snapshot_size_android')
+        self.snapshot_size_ios: str = self._snapshot_size('snapshot_size_ios')
+        self.snapshot_payload_budget: int = max(0, self.config.getint(
+            'general', 'snapshot_payload_budget', fallback=0))
+        cache_dir = self.config.get('general', 'cache_dir', fallback=None)
+        self.cache_dir: Optional[str] = os.path.expanduser(cache_dir) if cache_dir else None
 
         logging.info(
-            f'Main section read, language:"{self.language}", timezone:"{self.timezone_str}", eta_format:"{self.eta_format}", include_snapshot:"{self.include_snapshot}"')
+            f'Main section read, language:"{self.language}", timezone:"{self.timezone_str}", eta_format:"{self.eta_format}", include_snapshot:"{self.include_snapshot}", webcam_prefetch:"{self.webcam_prefetch}", webcam_stream:"{self.webcam_stream}", snapshot_size_android:"{self.snapshot_size_android}", snapshot_size_ios:"{self.snapshot_size_ios}", snapshot_payload_budget:"{self.snapshot_payload_budget}", cache_dir:"{self.cache_dir}"')
+
+    def _snapshot_size(self, option: str) -> str:
+        size = self.config.get('general', option, fallback='full')
+        if size not in ['full', 'medium', 'thumbnail']:
+            logging.warning('Invalid %s "%s", using "full"', option, size)
+            size = 'full'
+        return size
 
     def get_config_file_location(self, passed_config: str) -> Optional[str]:
         foundFile = self.__check_passed_config(passed_config) or self.__check_companion_dir() or self.__check_klipper_config_dir(
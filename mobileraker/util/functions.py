@@ -1,9 +1,11 @@
 
 
+import hashlib
 import logging
 import os
 import subprocess
 import uuid
+import zlib
 from typing import Tuple, Optional
 
 # Based on the implementation of Klipperscreen https://github.com/jordanruthe/KlipperScreen/blob/e9df355b3b8c33b63d5cbb9f7f2c75bd879597c5/ks_includes/functions.py#L83
@@ -108,3 +110,35 @@ def to_klipper_object_identifier(string: str) -> Tuple[str, Optional[str]]:
     """
     parts = string.strip().split(None, 1)
     return parts[0].lower(), parts[1].strip() if len(parts) > 1 else None
+
+
+def content_fingerprint(content: Optional[str]) -> str:
+    """
+    Fingerprint of a M117 message or gcode response, used to detect if it changed.
+
+    Args:
+        content (Optional[str]): The message.
+
+    Returns:
+        str: The CRC32 of the message as 8 hex chars, or an empty string if there is no message.
+    """
+    return format(zlib.crc32(content.encode("utf-8")), '08x') if content else ''
+
+
+def fingerprint_matches(stored: Optional[str], content: Optional[str], fingerprint: str) -> bool:
+    """
+    Check if a fingerprint stored in the device's snap belongs to the given message.
+
+    Args:
+        stored (Optional[str]): The stored fingerprint. Companions before the CRC32 fingerprints stored a SHA-256 hex digest.
+        content (Optional[str]): The message.
+        fingerprint (str): The fingerprint of the message, see content_fingerprint.
+
+    Returns:
+        bool: True if the stored fingerprint belongs to the message.
+    """
+    if stored == fingerprint:
+        return True
+    if stored and content and len(stored) == 64:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest() == stored
+    return False
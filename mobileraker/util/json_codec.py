@@ -0,0 +1,108 @@
+import json
+import logging
+from typing import Any, Dict, Optional, Type, Union
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import ujson  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    ujson = None
+
+
+class JsonCodec:
+    '''
+    Encodes and decodes the JSON-RPC frames exchanged with Moonraker.
+
+    loads accepts str and bytes, so binary frames are parsed directly without decoding them to a str first.
+    dumps always returns a str, as Moonraker expects text frames.
+    The faster codecs are stricter than the json module, e.g. they reject NaN/Infinity, which Moonraker emits if it
+    uses the json module itself, and non-str keys. They fall back to the json module for such documents, so every
+    codec accepts what the json module accepts. orjson encodes NaN/Infinity as null.
+    '''
+    name: str = 'base'
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        raise NotImplementedError("Subclasses must implement loads method")
+
+    def dumps(self, obj: Any) -> str:
+        raise NotImplementedError("Subclasses must implement dumps method")
+
+
+class StdlibJsonCodec(JsonCodec):
+    name = 'json'
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any) -> str:
+        return json.dumps(obj)
+
+
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return json.loads(data)
+
+    def dumps(self, obj: Any) -> str:
+        try:
+            return orjson.dumps(obj).decode('utf-8')
+        except orjson.JSONEncodeError:
+            return json.dumps(obj)
+
+
+class UjsonCodec(JsonCodec):
+    name = 'ujson'
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        try:
+            return ujson.loads(data)
+        except ValueError:
+            return json.loads(data)
+
+    def dumps(self, obj: Any) -> str:
+        try:
+            return ujson.dumps(obj, ensure_ascii=False)
+        except (TypeError, OverflowError):
+            return json.dumps(obj)
+
+
+# Ordered by preference, the first codec whose library is installed is used
+_CODECS: Dict[str, Type[JsonCodec]] = {}
+if orjson is not None:
+    _CODECS[OrjsonCodec.name] = OrjsonCodec
+if ujson is not None:
+    _CODECS[UjsonCodec.name] = UjsonCodec
+_CODECS[StdlibJsonCodec.name] = StdlibJsonCodec
+
+
+def available_codecs() -> Dict[str, Type[JsonCodec]]:
+    '''
+    Returns all codecs whose library is installed, ordered by preference.
+    '''
+    return dict(_CODECS)
+
+
+def get_codec(name: Optional[str] = None) -> JsonCodec:
+    '''
+    Returns the codec with the given name, or the fastest installed codec if no name is provided.
+
+    Args:
+        name (Optional[str]): The name of the codec, one of "orjson", "ujson" or "json".
+
+    Returns:
+        JsonCodec: The codec instance.
+    '''
+    if name is not None and name not in _CODECS:
+        logging.getLogger('mobileraker.json').warning(
+            "JSON codec %s is not available, falling back to %s", name, next(iter(_CODECS)))
+        name = None
+    codec_cls = _CODECS[name] if name is not None else next(iter(_CODECS.values()))
+    return codec_cls()
@@ -0,0 +1,61 @@
+from typing import Dict, Union
+
+Number = Union[int, float]
+
+
+class Metrics:
+    '''
+    Small in-process collection of counters and gauges.
+
+    Components use it to expose runtime statistics (e.g. how many snapshots were merged) without
+    depending on an external metrics system. Use get_metrics() to obtain a shared, named instance.
+
+    Attributes:
+        name (str): The name of the metrics collection, usually the printer name.
+    '''
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self._values: Dict[str, Number] = {}
+
+    def inc(self, key: str, value: Number = 1) -> None:
+        '''
+        Increment the counter with the given key.
+        '''
+        self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, key: str, value: Number) -> None:
+        '''
+        Set the gauge with the given key to the provided value.
+        '''
+        self._values[key] = value
+
+    def get(self, key: str, default: Number = 0) -> Number:
+        return self._values.get(key, default)
+
+    def as_dict(self) -> Dict[str, Number]:
+        return dict(self._values)
+
+    def __str__(self):
+        return '%s(%s)' % (
+            self.name,
+            ', '.join('%s=%s' % item for item in sorted(self._values.items()))
+        )
+
+
+_registry: Dict[str, Metrics] = {}
+
+
+def get_metrics(name: str) -> Metrics:
+    '''
+    Returns the metrics collection with the given name, creating it if necessary.
+
+    Args:
+        name (str): The name of the collection, usually the printer name.
+
+    Returns:
+        Metrics: The shared metrics collection.
+    '''
+    if name not in _registry:
+        _registry[name] = Metrics(name)
+    return _registry[name]
@@ -1,14 +1,50 @@
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
 from mobileraker.data.dtos.mobileraker.notification_config_dto import DeviceNotificationEntry
 from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
 from mobileraker.util.configs import CompanionLocalConfig
 
 
+# The placeholders, in the order the values are substituted. A `$` followed by several names (e.g. `$filename`)
+# is resolved to the first name in this order that matches.
+PLACEHOLDERS: Tuple[str, ...] = (
+    'printer_name',
+    'progress',
+    'file',
+    'eta',
+    'a_eta',
+    'remaining_avg',
+    'remaining_file',
+    'remaining_filament',
+    'remaining_slicer',
+    'cur_layer',
+    'max_layer',
+)
+
+# Placeholder values that only depend on the snapshot
+_SNAPSHOT_VALUES: Dict[str, Callable[[PrinterSnapshot], Any]] = {
+    'progress': lambda snap: f'{snap.print_progress_by_fileposition_relative:.0%}'
+    if snap.print_state == 'printing' and snap.print_progress_by_fileposition_relative is not None else None,
+    'file': lambda snap: snap.filename if snap.filename is not None else 'UNKNOWN',
+    'remaining_file': lambda snap: format_time_duration(snap.remaining_time_by_file) if snap.remaining_time_by_file else '--:--',
+    'remaining_filament': lambda snap: format_time_duration(snap.remaining_time_by_filament) if snap.remaining_time_by_filament else '--:--',
+    'remaining_slicer': lambda snap: format_time_duration(snap.remaining_time_by_slicer) if snap.remaining_time_by_slicer else '--:--',
+    'cur_layer': lambda snap: snap.current_layer,
+    'max_layer': lambda snap: snap.max_layer,
+}
+
+# A compiled template, literal text and indices into the placeholder names
+Template = Tuple[Union[str, int], ...]
+
+
 def replace_placeholders(raw: str, cfg: DeviceNotificationEntry, snap: PrinterSnapshot, companion_config: CompanionLocalConfig, additional_data: Optional[Dict[str, str]]=None) -> str:
     """
     Replaces placeholders in the input string with corresponding values from the provided parameters.
 
+    The string is compiled once into a template, only the placeholders it references are computed. The values of a
+    snapshot are shared by all devices with the same eta sources and time format.
+
     Args:
         input (str): The input string containing placeholders to be replaced.
         cfg (DeviceNotificationEntry): The device notification entry configuration.
@@ -19,41 +55,115 @@ def replace_placeholders(raw: str, cfg: DeviceNotificationEntry, snap: PrinterSn
     Returns:
         str: The input string with placeholders replaced by their corresponding values.
     """
-    if additional_data is None:
-        additional_data = {}
-    eta_source = cfg.settings.eta_sources
-
-    eta = snap.calc_eta(eta_source)
-    if eta is not None:
-        eta = eta.astimezone(companion_config.timezone)
-
-    progress = snap.print_progress_by_fileposition_relative if snap.print_state == 'printing' else None
-    remaining_time_avg = snap.remaining_time_avg(eta_source)
-
-    # Get the time format based on device preferences
-    eta_format = get_eta_format(cfg, companion_config)
-
-    data = {
-        'printer_name': cfg.machine_name,
-        'progress': f'{progress:.0%}' if progress is not None else None,
-        'file': snap.filename if snap.filename is not None else 'UNKNOWN',
-        'eta': eta_formatted(eta, eta_format),
-        'a_eta': adaptive_eta_formatted(eta, eta_format),
-        'remaining_avg': format_time_duration(remaining_time_avg) if remaining_time_avg else '--:--',
-        'remaining_file': format_time_duration(snap.remaining_time_by_file) if snap.remaining_time_by_file else '--:--',
-        'remaining_filament': format_time_duration(snap.remaining_time_by_filament) if snap.remaining_time_by_filament else '--:--',
-        'remaining_slicer': format_time_duration(snap.remaining_time_by_slicer) if snap.remaining_time_by_slicer else '--:--',
-        'cur_layer': snap.current_layer,
-        'max_layer': snap.max_layer,
-    }
-
-    for name, value in data.items():
-        raw = raw.replace(f"${name}", str(value) if value is not None else '')
-
-    for name, value in additional_data.items():
-        raw = raw.replace(f"${name}", str(value) if value is not None else '')
-
-    return raw
+    names = PLACEHOLDERS + tuple(additional_data) if additional_data else PLACEHOLDERS
+    template = compile_template(raw, names)
+    if not any(isinstance(token, int) for token in template):
+        return raw
+
+    values = _snapshot_values(snap, companion_config)
+
+    def resolve(index: int) -> str:
+        name = names[index]
+        value = values.get(name, cfg) if index < len(PLACEHOLDERS) else additional_data[name]  # type: ignore
+        return str(value) if value is not None else ''
+
+    return _render(template, names, resolve)
+
+
+@lru_cache(maxsize=1024)
+def compile_template(raw: str, names: Tuple[str, ...], start: int = 0) -> Template:
+    """
+    Splits the string into literal text and placeholders of names[start:].
+
+    Args:
+        raw (str): The string containing the placeholders.
+        names (Tuple[str, ...]): The placeholder names, without the leading `$`, in the order they are substituted.
+        start (int): Index of the first name to look for.
+
+    Returns:
+        Template: The literal text and the indices of the placeholders into names.
+    """
+    tokens: List[Union[str, int]] = []
+    literal_start = 0
+    pos = raw.find('$')
+    while pos >= 0:
+        index = next((i for i in range(start, len(names)) if raw.startswith(names[i], pos + 1)), None)
+        if index is None:
+            pos = raw.find('$', pos + 1)
+            continue
+        if pos > literal_start:
+            tokens.append(raw[literal_start:pos])
+        tokens.append(index)
+        literal_start = pos + 1 + len(names[index])
+        pos = raw.find('$', literal_start)
+    if literal_start < len(raw):
+        tokens.append(raw[literal_start:])
+    return tuple(tokens)
+
+
+def _render(template: Template, names: Tuple[str, ...], resolve: Callable[[int], str]) -> str:
+    parts = []
+    for token in template:
+        if isinstance(token, str):
+            parts.append(token)
+            continue
+        value = resolve(token)
+        if '$' in value and token + 1 < len(names):
+            # As with the former sequential replacement, a value can contain the placeholders substituted after it
+            value = _render(compile_template(value, names, token + 1), names, resolve)
+        parts.append(value)
+    return ''.join(parts)
+
+
+class _SnapshotValues:
+    """
+    The lazily computed placeholder values of a snapshot.
+    """
+
+    def __init__(self, snap: PrinterSnapshot, companion_config: CompanionLocalConfig) -> None:
+        self.snap: PrinterSnapshot = snap
+        self.companion_config: CompanionLocalConfig = companion_config
+        self._memo: Dict[Hashable, Any] = {}
+
+    def get(self, name: str, cfg: DeviceNotificationEntry) -> Any:
+        if name == 'printer_name':
+            return cfg.machine_name
+        if name in _SNAPSHOT_VALUES:
+            return self._memoized(name, lambda: _SNAPSHOT_VALUES[name](self.snap))
+
+        eta_sources = tuple(cfg.settings.eta_sources)
+        if name == 'remaining_avg':
+            def remaining_avg() -> str:
+                remaining = self.snap.remaining_time_avg(list(eta_sources))
+                return format_time_duration(remaining) if remaining else '--:--'
+            return self._memoized((name, eta_sources), remaining_avg)
+
+        # Get the time format based on device preferences
+        eta_format = get_eta_format(cfg, self.companion_config)
+        formatter = eta_formatted if name == 'eta' else adaptive_eta_formatted
+        return self._memoized((name, eta_sources, eta_format), lambda: formatter(self._eta(eta_sources), eta_format))
+
+    def _eta(self, eta_sources: Tuple[str, ...]) -> Optional[datetime]:
+        def compute() -> Optional[datetime]:
+            eta = self.snap.calc_eta(list(eta_sources))
+            return eta.astimezone(self.companion_config.timezone) if eta is not None else None
+        return self._memoized(('eta_datetime', eta_sources), compute)
+
+    def _memoized(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+
+# All devices are evaluated against the same snapshot in a row, so the values of the last snapshot are kept
+_last_values: Optional[_SnapshotValues] = None
+
+
+def _snapshot_values(snap: PrinterSnapshot, companion_config: CompanionLocalConfig) -> _SnapshotValues:
+    global _last_values
+    if _last_values is None or _last_values.snap is not snap or _last_values.companion_config is not companion_config:
+        _last_values = _SnapshotValues(snap, companion_config)
+    return _last_values
 
 
 def get_eta_format(cfg: DeviceNotificationEntry, companion_config: CompanionLocalConfig) -> str:
@@ -0,0 +1,97 @@
+import asyncio
+import unittest
+
+from mobileraker.data.dtos.mobileraker.notification_config_dto import NotificationSnap
+from mobileraker.service.app_config_store import AppConfigStore
+
+DEVICE_ID = '5f4d11e8-ad41-4126-88ff-7593b68555d9'
+
+
+def device_json():
+    return {
+        "created": "2022-11-25T23:03:47.656260",
+        "lastModified": "2022-11-26T19:46:59.083649",
+        "fcmToken": "token",
+        "machineName": "V2",
+        "language": "en",
+        "settings": {"created": "2022-11-25T23:03:47.656261", "lastModified": "2022-11-26T19:46:59.083595",
+                     "progress": 0.05, "states": ["paused", "complete"]},
+        "snap": {"progress": 0.0, "state": "standby"},
+        "apns": {"created": "", "lastModified": "", "liveActivity": "abc"},
+    }
+
+
+class FakeJrpc:
+    def __init__(self):
+        self.namespace = {DEVICE_ID: device_json()}
+        self.calls = 0
+
+    def register_connection_listener(self, listener):
+        self.listener = listener
+
+    async def send_and_receive_method(self, method, params=None, timeout=10.0):
+        self.calls += 1
+        return {"result": {"value": self.namespace}}, None
+
+
+class TestAppConfigStore(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.jrpc = FakeJrpc()
+        self.store = AppConfigStore(self.jrpc, 'test_app_cfg', max_age=60)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_configs_are_cached_until_stale(self):
+        first = self.loop.run_until_complete(self.store.get_configs())
+        second = self.loop.run_until_complete(self.store.get_configs())
+        self.assertEqual(self.jrpc.calls, 1)
+        self.assertIs(first[0], second[0])
+
+        self.jrpc.listener(True)
+        self.loop.run_until_complete(self.store.get_configs())
+        self.assertEqual(self.jrpc.calls, 2)
+
+    def test_unchanged_devices_are_not_parsed_again(self):
+        first = self.loop.run_until_complete(self.store.get_configs())[0]
+        self.jrpc.namespace = {DEVICE_ID: device_json()}
+        self.store.invalidate()
+        self.assertIs(self.loop.run_until_complete(self.store.get_configs())[0], first)
+
+        changed = device_json()
+        changed['language'] = 'de'
+        self.jrpc.namespace = {DEVICE_ID: changed}
+        self.store.invalidate()
+        refreshed = self.loop.run_until_complete(self.store.get_configs())[0]
+        self.assertIsNot(refreshed, first)
+        self.assertEqual(refreshed.language, 'de')
+
+    def test_own_writes_are_merged(self):
+        cfg = self.loop.run_until_complete(self.store.get_configs())[0]
+        snap = cfg.snap.copy_with(state='printing')
+        self.store.update_snap(DEVICE_ID, snap)
+        self.store.remove_apns(DEVICE_ID)
+
+        cfg = self.loop.run_until_complete(self.store.get_configs())[0]
+        self.assertIsInstance(cfg.snap, NotificationSnap)
+        self.assertEqual(cfg.snap.state, 'printing')
+        self.assertIsNone(cfg.apns)
+        self.assertEqual(self.jrpc.calls, 1)
+
+    def test_failed_write_refreshes_the_configs(self):
+        self.loop.run_until_complete(self.store.get_configs())
+        # The write timed out, but Moonraker applied it
+        written = device_json()
+        written['snap'] = {"progress": 0.0, "state": "printing"}
+        self.jrpc.namespace = {DEVICE_ID: written}
+        self.store.write_failed(DEVICE_ID)
+
+        cfg = self.loop.run_until_complete(self.store.get_configs())[0]
+        self.assertEqual(self.jrpc.calls, 2)
+        self.assertEqual(cfg.snap.state, 'printing')
+
+
+if __name__ == '__main__':
+    unittest.main()
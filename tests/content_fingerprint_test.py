@@ -0,0 +1,69 @@
+import asyncio
+import hashlib
+import unittest
+from unittest.mock import MagicMock, patch
+
+from benchmarks.fixtures import notification_evaluator
+from mobileraker.data.dtos.mobileraker.notification_config_dto import DeviceNotificationEntry, NotificationSnap
+from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
+from mobileraker.service.data_sync_service import DataSyncService
+from mobileraker.util.functions import content_fingerprint, fingerprint_matches
+
+
+def sha256(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class TestContentFingerprint(unittest.TestCase):
+
+    def test_fingerprint(self):
+        self.assertEqual(content_fingerprint(None), '')
+        self.assertEqual(content_fingerprint(''), '')
+        self.assertEqual(len(content_fingerprint('$MR$:Filament change')), 8)
+        self.assertEqual(content_fingerprint('$MR$:Filament change'), content_fingerprint('$MR$:Filament change'))
+        self.assertNotEqual(content_fingerprint('$MR$:Filament change'), content_fingerprint('$MR$:Print done'))
+
+    def test_stored_sha256_digests_still_match(self):
+        message = '$MR$:Filament change'
+        fingerprint = content_fingerprint(message)
+        self.assertTrue(fingerprint_matches(fingerprint, message, fingerprint))
+        self.assertTrue(fingerprint_matches(sha256(message), message, fingerprint))
+        self.assertFalse(fingerprint_matches(sha256('$MR$:Print done'), message, fingerprint))
+        self.assertFalse(fingerprint_matches('', message, fingerprint))
+        self.assertTrue(fingerprint_matches('', None, content_fingerprint(None)))
+
+    def test_custom_notification_is_not_repeated_after_the_upgrade(self):
+        evaluator = notification_evaluator()
+        snapshot = PrinterSnapshot(klippy_ready=True, print_state='printing')
+        snapshot.m117 = '$MR$:Filament change'
+        snapshot.m117_hash = content_fingerprint(snapshot.m117)
+        cfg = DeviceNotificationEntry()
+        cfg.machine_id = '00000000-0000-4000-8000-000000000000'
+        cfg.machine_name = 'Voron'
+
+        cfg.snap = NotificationSnap(m117=sha256(snapshot.m117))
+        self.assertIsNone(evaluator.evaluate_custom_notification(cfg, snapshot, True))
+        cfg.snap = NotificationSnap(m117=sha256('$MR$:Print done'))
+        self.assertIsNotNone(evaluator.evaluate_custom_notification(cfg, snapshot, True))
+
+    def test_fingerprints_are_only_computed_for_changed_messages(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        service = DataSyncService(MagicMock(), 'printer', loop, 2)
+        snapshots = []
+        service.register_snapshot_listener(snapshots.append)
+        with patch('mobileraker.service.data_sync_service.content_fingerprint',
+                   side_effect=content_fingerprint) as fingerprint:
+            service._parse_objects({"display_status": {"message": "$MR$:Filament change"}})
+            service._parse_objects({"virtual_sdcard": {"progress": 0.5}})
+            service._parse_objects({"display_status": {"message": "$MR$:Print done"}})
+        self.assertEqual(len(snapshots), 3)
+        self.assertEqual(fingerprint.call_count, 2)
+        self.assertEqual(snapshots[0].m117_hash, content_fingerprint("$MR$:Filament change"))
+        self.assertEqual(snapshots[1].m117_hash, snapshots[0].m117_hash)
+        self.assertEqual(snapshots[2].m117_hash, content_fingerprint("$MR$:Print done"))
+        self.assertEqual(snapshots[2].gcode_response_hash, '')
+
+
+if __name__ == '__main__':
+    unittest.main()
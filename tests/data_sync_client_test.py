@@ -1,9 +1,11 @@
 import asyncio
+import time
 import unittest
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from unittest.mock import MagicMock
 
 from mobileraker.client.moonraker_client import MoonrakerClient
-from mobileraker.data.dtos.moonraker.printer_objects import DisplayStatus, PrintStats, ServerInfo, VirtualSDCard
+from mobileraker.data.dtos.moonraker.printer_objects import DisplayStatus, FilamentSensor, PrintStats, ServerInfo, VirtualSDCard
 from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
 from mobileraker.service.data_sync_service import DataSyncService
 
@@ -71,6 +73,81 @@ class TestDataSyncService(unittest.TestCase):
         self.assertIsNone(self.data_sync_service.display_status.message)
         self.assertEqual(self.data_sync_service.virtual_sdcard.progress, 0)
 
+    def test_snapshots_share_unchanged_objects(self):
+        self.data_sync_service._parse_objects({
+            "display_status": {"message": "Printing in progress"},
+            "filament_switch_sensor runout": {"enabled": True, "filament_detected": True},
+        })
+        first = self.data_sync_service.take_snapshot()
+        self.data_sync_service._parse_objects({"virtual_sdcard": {"progress": 0.5}})
+        second = self.data_sync_service.take_snapshot()
+        self.assertIs(second.print_stats, first.print_stats)
+        self.assertIs(second.filament_sensors, first.filament_sensors)
+        self.assertIsNot(second.virtual_sdcard, first.virtual_sdcard)
+
+        # A changed sensor replaces the dict, the snapshots taken before keep their state
+        self.data_sync_service._parse_objects({"filament_switch_sensor runout": {"filament_detected": False}})
+        third = self.data_sync_service.take_snapshot()
+        self.assertIsNot(third.filament_sensors, second.filament_sensors)
+        self.assertTrue(second.filament_sensors["runout"].filament_detected)
+        self.assertFalse(third.filament_sensors["runout"].filament_detected)
+
+    def test_no_op_updates_return_the_same_instance(self):
+        print_stats = PrintStats().updateWith({"filename": "test.gcode", "state": "printing", "print_duration": 10})
+        self.assertIs(print_stats.updateWith({"state": "printing", "print_duration": 10}), print_stats)
+
+        updated = print_stats.updateWith({"print_duration": 20})
+        self.assertIsNot(updated, print_stats)
+        self.assertEqual(updated.print_duration, 20)
+        self.assertEqual(updated.filename, "test.gcode")
+        # The update is applied to a shallow copy, the previous instance keeps its state
+        self.assertEqual(print_stats.print_duration, 10)
+
+        display_status = DisplayStatus(message="Printing in progress")
+        self.assertIs(display_status.updateWith({"message": "Printing in progress "}), display_status)
+
+    def test_repeated_identical_status_does_not_notify(self):
+        snapshots = []
+        self.data_sync_service.register_snapshot_listener(snapshots.append)
+        suppressed = self.data_sync_service._metrics.get('sync.suppressed_updates')
+        self.data_sync_service._parse_objects({"display_status": {"message": "Printing in progress"}})
+        display_status = self.data_sync_service.display_status
+
+        self.data_sync_service._parse_objects({"display_status": {"message": "Printing in progress"}})
+        self.assertIs(self.data_sync_service.display_status, display_status)
+        self.assertEqual(len(snapshots), 1)
+        self.assertEqual(self.data_sync_service._metrics.get('sync.suppressed_updates'), suppressed + 1)
+
+    def test_gcode_move_only_update_does_not_notify(self):
+        snapshots = []
+        self.data_sync_service.register_snapshot_listener(snapshots.append)
+        suppressed = self.data_sync_service._metrics.get('sync.suppressed_updates')
+        self.data_sync_service._parse_objects({"gcode_move": {"gcode_position": [10.0, 20.0, 0.6, 100.0]}})
+        self.assertEqual(snapshots, [])
+        self.assertEqual(self.data_sync_service._metrics.get('sync.suppressed_updates'), suppressed + 1)
+
+        # The next relevant update carries the deferred gcode_move state
+        self.data_sync_service._parse_objects({"virtual_sdcard": {"progress": 0.5}})
+        self.assertEqual(len(snapshots), 1)
+        self.assertIs(snapshots[0].gcode_move, self.data_sync_service.gcode_move)
+        self.assertEqual(snapshots[0].virtual_sdcard.progress, 0.5)
+
+    def test_changed_field_notifies(self):
+        snapshots = []
+        self.data_sync_service.register_snapshot_listener(snapshots.append)
+        suppressed = self.data_sync_service._metrics.get('sync.suppressed_updates')
+        self.data_sync_service._parse_objects({"virtual_sdcard": {"progress": 0.5}})
+        self.data_sync_service._parse_objects({"virtual_sdcard": {"progress": 0.51}})
+        self.assertEqual([snapshot.virtual_sdcard.progress for snapshot in snapshots], [0.5, 0.51])
+        self.assertEqual(self.data_sync_service._metrics.get('sync.suppressed_updates'), suppressed)
+
+    def test_full_query_always_notifies(self):
+        snapshots = []
+        self.data_sync_service.register_snapshot_listener(snapshots.append)
+        self.data_sync_service._parse_objects({"virtual_sdcard": {"progress": 0.5}})
+        self.data_sync_service._parse_objects({"virtual_sdcard": {"progress": 0.5}}, force_notify=True)
+        self.assertEqual(len(snapshots), 2)
+
     def test_resync_with_parse_objects(self):
         # Simulate status objects returned by the MoonrakerClient
         status_objects = {
@@ -151,5 +228,123 @@ class TestDataSyncService(unittest.TestCase):
     # Add more unit tests for other methods if needed
 
 
+class FakeJrpc:
+    '''
+    Answers the requests of a resync, like a Moonraker whose Klippy is ready once klippy_state is "ready".
+    '''
+
+    def __init__(self) -> None:
+        self.klippy_state: str = 'ready'
+        self.calls: List[Tuple[str, Optional[Dict[str, Any]]]] = []
+        self.method_listeners: Dict[str, Callable] = {}
+        self.connection_listeners: List[Callable[[bool], None]] = []
+        # Set to block server.info until the event is set
+        self.server_info_gate: Optional[asyncio.Event] = None
+
+    def register_method_listener(self, method: str, callback: Callable) -> None:
+        self.method_listeners[method] = callback
+
+    def register_connection_listener(self, listener: Callable[[bool], None]) -> None:
+        self.connection_listeners.append(listener)
+
+    def calls_of(self, method: str) -> List[Optional[Dict[str, Any]]]:
+        return [params for called, params in self.calls if called == method]
+
+    async def send_method(self, method: str, callback: Any, params: Optional[Dict[str, Any]] = None) -> None:
+        self.calls.append((method, params))
+
+    async def send_and_receive_method(self, method: str, params: Optional[Dict[str, Any]] = None):
+        self.calls.append((method, params))
+        if method == 'server.info':
+            if self.server_info_gate is not None:
+                await self.server_info_gate.wait()
+            return {'result': {'klippy_state': self.klippy_state}}, None
+        if self.klippy_state != 'ready':
+            return None, 'Klippy Host not connected'
+        if method == 'printer.objects.list':
+            return {'result': {'objects': ['print_stats', 'virtual_sdcard', 'display_status', 'toolhead',
+                                           'gcode_move', 'filament_switch_sensor runout']}}, None
+        if method == 'printer.objects.query':
+            return {'result': {'status': {'print_stats': {'state': 'standby'}}}}, None
+        return None, 'Method not found'
+
+
+class TestDataSyncServiceResync(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.jrpc = FakeJrpc()
+        self.service = DataSyncService(self.jrpc, 'resync_test', self.loop, 3)
+        self.metrics = self.service._metrics
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_concurrent_resyncs_join_one_run(self):
+        joined = self.metrics.get('sync.resyncs_joined')
+        resyncs = self.metrics.get('sync.resyncs')
+
+        async def run():
+            await asyncio.gather(self.service.resync(), self.service.resync(), self.service.resync())
+
+        self.loop.run_until_complete(run())
+        self.assertTrue(self.service.klippy_ready)
+        self.assertEqual(len(self.jrpc.calls_of('server.info')), 1)
+        self.assertEqual(len(self.jrpc.calls_of('printer.objects.subscribe')), 1)
+        self.assertEqual(self.metrics.get('sync.resyncs'), resyncs + 1)
+        self.assertEqual(self.metrics.get('sync.resyncs_joined'), joined + 2)
+
+    def test_klippy_ready_cuts_the_backoff_short(self):
+        self.jrpc.klippy_state = 'startup'
+
+        async def run():
+            resync = self.loop.create_task(self.service.resync())
+            await asyncio.sleep(0.05)
+            self.assertEqual(len(self.jrpc.calls_of('server.info')), 1)
+            # The backoff of the first retry is at least one second
+            self.jrpc.klippy_state = 'ready'
+            self.jrpc.method_listeners['notify_klippy_ready']({'method': 'notify_klippy_ready'})
+            await resync
+
+        started = time.monotonic()
+        self.loop.run_until_complete(run())
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertTrue(self.service.klippy_ready)
+        self.assertEqual(len(self.jrpc.calls_of('server.info')), 2)
+        self.assertEqual(len(self.jrpc.calls_of('printer.objects.subscribe')), 1)
+
+    def test_subscribes_to_field_lists(self):
+        self.loop.run_until_complete(self.service.resync())
+        query, = self.jrpc.calls_of('printer.objects.query')
+        subscribe, = self.jrpc.calls_of('printer.objects.subscribe')
+        self.assertEqual(query, subscribe)
+        # None would subscribe to every field of the object
+        for name, fields in query['objects'].items():
+            self.assertIsInstance(fields, list, name)
+        self.assertEqual(query['objects']['print_stats'], PrintStats.SUBSCRIPTION_FIELDS)
+        self.assertEqual(query['objects']['filament_switch_sensor runout'], FilamentSensor.SUBSCRIPTION_FIELDS)
+        self.assertNotIn('toolhead', query['objects'])
+
+    def test_disconnect_cancels_the_running_resync(self):
+        self.jrpc.server_info_gate = asyncio.Event()
+
+        async def run():
+            resync = self.loop.create_task(self.service.resync())
+            await asyncio.sleep(0.05)
+            task = self.service._resync_task
+            self.assertFalse(task.done())
+            for listener in self.jrpc.connection_listeners:
+                listener(False)
+            await asyncio.wait_for(resync, timeout=1)
+            self.assertTrue(task.done())
+            # Moonraker answering late has no effect, the resync does not continue
+            self.jrpc.server_info_gate.set()
+            await asyncio.sleep(0.05)
+
+        self.loop.run_until_complete(run())
+        self.assertFalse(self.service.klippy_ready)
+        self.assertEqual(self.jrpc.calls_of('printer.objects.query'), [])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,63 @@
+import asyncio
+import unittest
+
+from mobileraker.service.database_write_buffer import DatabaseWriteBuffer
+
+
+class FakeJrpc:
+    def __init__(self):
+        self.sent = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send_and_receive_method(self, method, params=None, timeout=10.0):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        self.sent.append((method, params))
+        if params["key"] == "broken":
+            return {}, "Key 'broken' in namespace 'mobileraker' not found"
+        return {"result": params}, None
+
+
+class TestDatabaseWriteBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.jrpc = FakeJrpc()
+        self.buffer = DatabaseWriteBuffer(self.jrpc, 'test_db', max_concurrency=2)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_writes_to_the_same_key_are_coalesced(self):
+        results = []
+        self.buffer.post_item("mobileraker", "fcm.a.snap", 1, results.append)
+        self.buffer.post_item("mobileraker", "fcm.b.snap", 2)
+        self.buffer.post_item("mobileraker", "fcm.a.snap", 3, results.append)
+        self.buffer.delete_item("mobileraker", "fcm.b.snap")
+        self.loop.run_until_complete(self.buffer.flush())
+
+        self.assertEqual(self.jrpc.sent, [
+            ("server.database.post_item", {"namespace": "mobileraker", "key": "fcm.a.snap", "value": 3}),
+            ("server.database.delete_item", {"namespace": "mobileraker", "key": "fcm.b.snap"}),
+        ])
+        self.assertEqual(results, [None])
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_flush_is_bounded_and_reports_errors(self):
+        errors = []
+        for i in range(6):
+            self.buffer.post_item("mobileraker", f"fcm.{i}.snap", i)
+        self.buffer.delete_item("mobileraker", "broken", errors.append)
+        self.loop.run_until_complete(self.buffer.flush())
+
+        self.assertEqual(len(self.jrpc.sent), 7)
+        self.assertEqual(self.jrpc.max_in_flight, 2)
+        self.assertEqual(len(errors), 1)
+        self.assertIsNotNone(errors[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
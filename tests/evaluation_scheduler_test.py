@@ -0,0 +1,79 @@
+import asyncio
+import unittest
+
+from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
+from mobileraker.service.evaluation_scheduler import EvaluationScheduler
+
+
+class TestEvaluationScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.evaluated = []
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _scheduler(self, name, delay=0.01, timeout=60):
+        async def evaluate(snapshot):
+            await asyncio.sleep(delay)
+            self.evaluated.append(snapshot)
+        return EvaluationScheduler(evaluate, name, self.loop, timeout)
+
+    def test_latest_snapshot_wins(self):
+        scheduler = self._scheduler('test_latest_wins')
+        snaps = [PrinterSnapshot(True, 'printing') for _ in range(50)]
+
+        async def run():
+            scheduler.submit(snaps[0])
+            # Let the first evaluation start before flooding the scheduler
+            await asyncio.sleep(0)
+            for snap in snaps[1:]:
+                scheduler.submit(snap)
+            while scheduler.is_running:
+                await asyncio.sleep(0.01)
+
+        self.loop.run_until_complete(run())
+
+        # First snapshot starts right away, everything in between collapses into the last one
+        self.assertEqual(self.evaluated, [snaps[0], snaps[-1]])
+        self.assertEqual(scheduler.metrics.get('eval.submitted'), 50)
+        self.assertEqual(scheduler.metrics.get('eval.merged'), 48)
+        self.assertEqual(scheduler.metrics.get('eval.completed'), 2)
+        self.assertEqual(scheduler.metrics.get('eval.pending'), 0)
+
+    def test_timeout_drops_snapshot_and_continues(self):
+        scheduler = self._scheduler('test_timeout', delay=1, timeout=0.05)
+        snap = PrinterSnapshot(True, 'printing')
+
+        async def run():
+            scheduler.submit(snap)
+            while scheduler.is_running:
+                await asyncio.sleep(0.01)
+
+        self.loop.run_until_complete(run())
+
+        self.assertEqual(self.evaluated, [])
+        self.assertEqual(scheduler.metrics.get('eval.dropped'), 1)
+        self.assertFalse(scheduler.is_running)
+
+    def test_close_cancels_the_evaluation_and_drops_the_pending_snapshot(self):
+        scheduler = self._scheduler('test_close', delay=1)
+
+        async def run():
+            scheduler.submit(PrinterSnapshot(True, 'printing'))
+            await asyncio.sleep(0)
+            scheduler.submit(PrinterSnapshot(True, 'printing'))
+            scheduler.close()
+            await asyncio.sleep(0.01)
+
+        self.loop.run_until_complete(run())
+
+        self.assertEqual(self.evaluated, [])
+        self.assertFalse(scheduler.is_running)
+        self.assertEqual(scheduler.metrics.get('eval.dropped'), 1)
+        self.assertEqual(scheduler.metrics.get('eval.pending'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
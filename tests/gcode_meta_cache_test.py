@@ -0,0 +1,92 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from typing import Any, Dict, List, Optional, Tuple
+from unittest.mock import MagicMock
+
+from mobileraker.data.dtos.moonraker.printer_objects import GCodeFile
+from mobileraker.service.data_sync_service import DataSyncService
+from mobileraker.service.gcode_meta_cache import GCodeMetaCache
+
+
+def benchy(modified: float, estimated_time: int) -> GCodeFile:
+    return GCodeFile(filename='benchy.gcode', modified=modified, size=1000, estimated_time=estimated_time)
+
+
+class TestGCodeMetaCache(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.persist_path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.remove, self.persist_path)
+        GCodeMetaCache('printer', persist_path=self.persist_path).put(benchy(100.0, 4000))
+
+    def test_restored_entries_are_verified_before_use(self):
+        cache = GCodeMetaCache('printer', persist_path=self.persist_path)
+        self.assertEqual(len(cache), 1)
+        self.assertIsNone(cache.get('benchy.gcode'))
+        self.assertIsNotNone(cache.unverified('benchy.gcode'))
+
+        cache.verify('benchy.gcode', 100.0, 1000)
+        self.assertIsNone(cache.unverified('benchy.gcode'))
+        self.assertEqual(cache.get('benchy.gcode').estimated_time, 4000)
+
+    def test_restored_entry_of_a_modified_file_is_evicted(self):
+        cache = GCodeMetaCache('printer', persist_path=self.persist_path)
+        # benchy.gcode was uploaded again while the companion was stopped
+        cache.verify('benchy.gcode', 200.0, 1000)
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get('benchy.gcode'))
+        self.assertEqual(len(GCodeMetaCache('printer', persist_path=self.persist_path)), 0)
+
+    def test_saves_are_debounced_and_flushed(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        cache = GCodeMetaCache('printer', persist_path=self.persist_path, save_delay=60)
+        cache.verify('benchy.gcode', 100.0, 1000)
+
+        async def put_files() -> None:
+            for i in range(10):
+                cache.put(GCodeFile(filename=f'cube_{i}.gcode', modified=100.0, size=10))
+
+        loop.run_until_complete(put_files())
+        self.assertEqual(len(GCodeMetaCache('printer', persist_path=self.persist_path)), 1)
+        cache.flush()
+        self.assertEqual(len(GCodeMetaCache('printer', persist_path=self.persist_path)), 11)
+
+    def test_resync_verifies_only_the_looked_up_file(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        calls: List[Tuple[str, Optional[Dict[str, Any]]]] = []
+
+        async def send_and_receive_method(method: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Any, Optional[str]]:
+            calls.append((method, params))
+            if method == 'server.files.get_directory':
+                return {'result': {'dirs': [], 'files': [
+                    {'filename': 'benchy.gcode', 'modified': 200.0, 'size': 1000},
+                    {'filename': 'cube.gcode', 'modified': 50.0, 'size': 10}]}}, None
+            if method == 'server.files.metadata':
+                return {'result': benchy(200.0, 6000).to_json()}, None
+            return None, 'not implemented'
+
+        jrpc = MagicMock()
+        jrpc.send_and_receive_method.side_effect = send_and_receive_method
+        cache = GCodeMetaCache('printer', persist_path=self.persist_path)
+        cache.verify('benchy.gcode', 100.0, 1000)
+        # A reconnect, benchy.gcode was uploaded again while disconnected
+        cache.mark_unverified()
+        service = DataSyncService(jrpc, 'printer', loop, 2, meta_cache=cache)
+        meta = loop.run_until_complete(service._fetch_gcode_meta('benchy.gcode'))
+        self.assertEqual(meta.estimated_time, 6000)
+        self.assertEqual([method for method, _ in calls], ['server.files.get_directory', 'server.files.metadata'])
+        self.assertEqual(calls[0][1], {'path': 'gcodes', 'extended': False})
+
+        calls.clear()
+        meta = loop.run_until_complete(service._fetch_gcode_meta('benchy.gcode'))
+        self.assertEqual(meta.estimated_time, 6000)
+        self.assertEqual(calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
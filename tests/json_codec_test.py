@@ -0,0 +1,86 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from typing import Any
+
+from mobileraker.client.moonraker_client import MoonrakerClient
+from mobileraker.client.session_recorder import SessionRecorder, load_recording
+from mobileraker.util.json_codec import JsonCodec, StdlibJsonCodec, available_codecs, get_codec
+
+FRAMES = [
+    '{"jsonrpc": "2.0", "method": "notify_status_update", "params": [{"print_stats": {"print_duration": 1800.25, '
+    '"state": "printing"}, "virtual_sdcard": {"progress": 0.5, "file_position": 6000}}, 1042.75]}',
+    '{"jsonrpc": "2.0", "method": "notify_status_update", "params": [{"display_status": {"message": "Düse heizt 🔥"}},'
+    ' 1043.0]}',
+    '{"jsonrpc": "2.0", "id": 7, "result": {"filename": "benchy.gcode", "modified": 1700000000.123, "size": 1000,'
+    ' "thumbnails": [], "first_layer_height": null, "estimated_time": 4000}}',
+    '{"jsonrpc": "2.0", "id": 8, "error": {"code": 404, "message": "Metadata not available for <cube.gcode>"}}',
+    # A Moonraker without orjson emits NaN/Infinity, e.g. for unconfigured sensors
+    '{"jsonrpc": "2.0", "method": "notify_status_update", "params": [{"temperature_sensor chamber": '
+    '{"temperature": NaN, "measured_max_temp": -Infinity}}, 1044.0]}',
+]
+
+
+def canonical(obj: Any) -> str:
+    # NaN != NaN, compare the canonical stdlib encoding instead
+    return json.dumps(obj, sort_keys=True)
+
+
+class TestJsonCodec(unittest.TestCase):
+
+    def test_codec_selection(self):
+        codecs = available_codecs()
+        self.assertEqual(list(codecs)[-1], 'json')
+        self.assertEqual(get_codec().name, next(iter(codecs)))
+        self.assertIsInstance(get_codec('json'), StdlibJsonCodec)
+        # Unknown or not installed codecs fall back to the preferred one
+        self.assertEqual(get_codec('simdjson').name, next(iter(codecs)))
+
+    def test_recorded_frames_decode_like_the_json_module(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'printer.jsonl.gz')
+            recorder = SessionRecorder(path, 'printer')
+            for frame in FRAMES:
+                recorder.record('in', frame)
+            recorder.close()
+            _, recorded = load_recording(path)
+
+        self.assertEqual(len(recorded), len(FRAMES))
+        for name, codec_cls in available_codecs().items():
+            codec: JsonCodec = codec_cls()
+            for _, _, raw in recorded:
+                expected = canonical(json.loads(raw))
+                self.assertEqual(canonical(codec.loads(raw)), expected, name)
+                self.assertEqual(canonical(codec.loads(raw.encode('utf-8'))), expected, name)
+
+    def test_round_trip(self):
+        for name, codec_cls in available_codecs().items():
+            codec: JsonCodec = codec_cls()
+            for frame in FRAMES[:-1]:
+                obj = json.loads(frame)
+                encoded = codec.dumps(obj)
+                self.assertIsInstance(encoded, str, name)
+                self.assertEqual(json.loads(encoded), obj, name)
+
+    def test_documents_rejected_by_the_fast_codecs_fall_back(self):
+        for name, codec_cls in available_codecs().items():
+            codec: JsonCodec = codec_cls()
+            self.assertEqual(json.loads(codec.dumps({1: 'a'})), {'1': 'a'}, name)
+            with self.assertRaises(ValueError, msg=name):
+                codec.loads('{"jsonrpc": "2.0", "id": ')
+
+    def test_invalid_frame_does_not_stop_the_client(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        client = MoonrakerClient('ws://localhost/websocket', None, 'printer', loop)
+        received = []
+        client.register_method_listener('notify_status_update', received.append)
+        loop.run_until_complete(client._process_message('{"jsonrpc": "2.0", "method": '))
+        loop.run_until_complete(client._process_message(FRAMES[-1]))
+        self.assertEqual(len(received), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import threading
+import unittest
+
+from mobileraker.client.mjpeg_stream_reader import MjpegStreamReader
+
+
+def jpeg(payload: bytes) -> bytes:
+    return b'\xff\xd8' + payload + b'\xff\xd9'
+
+
+def part(frame: bytes) -> bytes:
+    return b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %i\r\n\r\n' % len(frame) + frame + b'\r\n'
+
+
+class TestMjpegStreamReader(unittest.TestCase):
+
+    def setUp(self):
+        self.reader = MjpegStreamReader('http://localhost/stream', 'test', max_frame_bytes=64)
+
+    def read(self, chunks):
+        self.reader._read(iter(chunks), threading.Event())
+
+    def test_keeps_the_latest_frame(self):
+        self.read([part(jpeg(b'first')) + part(jpeg(b'second'))])
+        self.assertEqual(self.reader.latest_frame(), jpeg(b'second'))
+
+    def test_frames_split_across_chunks(self):
+        stream = part(jpeg(b'first')) + part(jpeg(b'second'))
+        # Split inside the markers as well
+        for size in (1, 2, 3, 7):
+            self.reader._frame = None
+            self.read([stream[i:i + size] for i in range(0, len(stream), size)])
+            self.assertEqual(self.reader.latest_frame(), jpeg(b'second'))
+
+    def test_drops_oversized_frames(self):
+        self.read([part(jpeg(b'x' * 100)), part(jpeg(b'small'))])
+        self.assertEqual(self.reader.latest_frame(), jpeg(b'small'))
+
+    def test_no_frame_if_stale(self):
+        self.read([part(jpeg(b'first'))])
+        self.reader._frame_time -= 10
+        self.assertIsNone(self.reader.latest_frame(max_age=2))
+
+    def test_wait_for_frame_without_running_stream(self):
+        self.assertIsNone(self.reader.wait_for_frame(timeout=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
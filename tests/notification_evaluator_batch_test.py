@@ -0,0 +1,132 @@
+import unittest
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+from unittest.mock import patch
+
+from benchmarks.fixtures import device_json, machine_id, notification_evaluator
+from mobileraker.data.dtos.mobileraker.notification_config_dto import DeviceNotificationEntry
+from mobileraker.data.dtos.moonraker.printer_objects import FilamentSensor, GCodeFile, PrintStats, VirtualSDCard
+from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
+from mobileraker.service.notification_evaluator import NotificationEvaluationResult, NotificationEvaluator
+from mobileraker.util.functions import content_fingerprint, generate_notifcation_id_from_uuid
+
+
+def device(index: int, version: str = '2.8.0-android', live_activity: str = '', snap: Optional[Dict[str, Any]] = None,
+           **extra: Any) -> DeviceNotificationEntry:
+    json = device_json('Voron', index)
+    json['settings']['progress'] = 0.1
+    json['snap'] = snap or json['snap']
+    json['apns'] = {'created': '', 'lastModified': '', 'liveActivity': live_activity} if live_activity else None
+    json['version'] = version
+    json.update(extra)
+    return DeviceNotificationEntry.fromJSON(machine_id(index), json)
+
+
+class RecordingProxy:
+    '''
+    Records the attributes read from the wrapped object.
+    '''
+
+    def __init__(self, obj: Any, prefix: str, read: Set[str]) -> None:
+        self._obj = obj
+        self._prefix = prefix
+        self._read = read
+
+    def __getattr__(self, name: str) -> Any:
+        self._read.add(self._prefix + name)
+        value = getattr(self._obj, name)
+        if name in ('settings', 'snap'):
+            return RecordingProxy(value, f'{name}.', self._read)
+        return value
+
+
+def printing_snapshot() -> PrinterSnapshot:
+    snapshot = PrinterSnapshot(klippy_ready=True, print_state='printing')
+    snapshot.print_stats = PrintStats(filename='benchy.gcode', print_duration=1800, filament_used=2400, state='printing')
+    snapshot.virtual_sdcard = VirtualSDCard(file_position=6000, progress=0.5)
+    snapshot.current_file = GCodeFile(filename='benchy.gcode', gcode_start_byte=1000, gcode_end_byte=11000,
+                                      estimated_time=4000, filament_total=5200)
+    snapshot.m117 = '$MR$:Check the first layer|$printer_name is at $progress'
+    snapshot.m117_hash = content_fingerprint(snapshot.m117)
+    snapshot.filament_sensors = {'runout': FilamentSensor('runout', 'filament_switch_sensor', enabled=True,
+                                                          filament_detected=False)}
+    return snapshot.freeze()
+
+
+def as_json(result: NotificationEvaluationResult) -> List[Any]:
+    return [[notification.toJSON() for notification in result.notifications], result.has_live_activity,
+            result.has_progress_notification, result.has_progressbar_notification]
+
+
+class TestBatchedEvaluation(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.evaluator = notification_evaluator()
+
+    def test_batched_results_equal_the_per_device_results(self):
+        cfgs = [
+            device(0), device(1), device(2, version='2.8.0-ios'), device(3, version='2.8.0-ios'),
+            device(4, version='2.8.0-ios', live_activity='activity-4'),
+            device(5, version='2.8.0-ios', live_activity='activity-5'),
+            device(6, snap={'progress': 0.3, 'state': 'printing', 'filament_sensors': ['runout']}),
+            device(7, snap={'progress': 0.3, 'state': 'printing', 'filament_sensors': ['runout']}),
+            device(8, timeFormat='12h'), device(9, version='2.6.0-android'),
+        ]
+        exclude_sensors: List[List[str]] = [[] for _ in cfgs]
+        exclude_sensors[1] = ['runout']
+        last = PrinterSnapshot(klippy_ready=True, print_state='standby')
+
+        snapshot = printing_snapshot()
+        with patch.object(self.evaluator, 'evaluate_all_notifications_for_device',
+                          wraps=self.evaluator.evaluate_all_notifications_for_device) as evaluate:
+            batched = self.evaluator.evaluate_all_notifications_for_devices(cfgs, snapshot, last, exclude_sensors)
+        # The devices 3, 5 and 7 are equivalent to 2, 4 and 6
+        self.assertEqual(evaluate.call_count, 7)
+
+        for cfg, excluded, result in zip(cfgs, exclude_sensors, batched):
+            expected = self.evaluator.evaluate_all_notifications_for_device(cfg, snapshot, last, excluded)
+            self.assertEqual(as_json(result), as_json(expected), cfg.machine_id)
+            self.assertTrue(result.notifications)
+
+    def test_evaluation_key_covers_every_read_attribute(self):
+        read: Set[str] = set()
+        cfgs = [
+            device(0, snap={'progress': 0.3, 'state': 'printing'}),
+            device(1, version='2.8.0-ios', live_activity='activity-1'),
+            device(2, version='2.6.0-android', timeFormat='12h'),
+        ]
+        cfgs[0].snap.last_progress_progressbar = datetime.now() - timedelta(hours=1)
+        snapshot = printing_snapshot()
+        for cfg in cfgs:
+            for last in (None, PrinterSnapshot(klippy_ready=True, print_state='paused'), snapshot):
+                self.evaluator.evaluate_all_notifications_for_device(RecordingProxy(cfg, '', read), snapshot, last,
+                                                                     ['runout'])
+
+        keyed = {*NotificationEvaluator.EVALUATED_CFG_FIELDS,
+                 *(f'settings.{field}' for field in NotificationEvaluator.EVALUATED_SETTINGS_FIELDS),
+                 *(f'snap.{field}' for field in NotificationEvaluator.EVALUATED_SNAP_FIELDS),
+                 # Not part of the key, the copies get their own ids, channels and live activity token
+                 'machine_id', 'apns', 'settings', 'snap'}
+        self.assertEqual(read - keyed, set(), "Add the attributes to the EVALUATED_*_FIELDS")
+        self.assertIn('snap.state', read)
+
+    def test_copies_get_the_ids_of_their_device(self):
+        cfgs = [device(0, version='2.8.0-android'), device(1, version='2.8.0-android')]
+        batched = self.evaluator.evaluate_all_notifications_for_devices(cfgs, printing_snapshot(), None, [[], []])
+        expected = self.evaluator.evaluate_all_notifications_for_device(cfgs[1], printing_snapshot(), None, [])
+        self.assertEqual([n.id for n in batched[1].notifications], [n.id for n in expected.notifications])
+        # Every notification type is copied
+        self.assertEqual({n.id for n in batched[1].notifications},
+                         {generate_notifcation_id_from_uuid(cfgs[1].machine_id, offset)
+                          for offset in NotificationEvaluator.ID_OFFSETS})
+
+    def test_copies_are_not_shared(self):
+        cfgs = [device(0), device(1)]
+        batched = self.evaluator.evaluate_all_notifications_for_devices(cfgs, printing_snapshot(), None, [[], []])
+        for first, second in zip(batched[0].notifications, batched[1].notifications):
+            self.assertIsNot(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
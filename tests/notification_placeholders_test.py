@@ -0,0 +1,134 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from mobileraker.data.dtos.mobileraker.notification_config_dto import DeviceNotificationEntry, NotificationSettings
+from mobileraker.data.dtos.moonraker.printer_objects import GCodeFile, PrintStats, VirtualSDCard
+from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
+from mobileraker.util.configs import CompanionLocalConfig
+from mobileraker.util.i18n import languages
+from mobileraker.util.notification_placeholders import (adaptive_eta_formatted, eta_formatted, format_time_duration,
+                                                         get_eta_format, replace_placeholders)
+
+NOW = datetime(2024, 5, 4, 13, 37, 0)
+
+
+class FixedClockSnapshot(PrinterSnapshot):
+    '''
+    A snapshot with a fixed clock for the eta, counting how often it is calculated.
+    '''
+    eta_calculations = 0
+
+    def calc_eta(self, sources: List[str]) -> Optional[datetime]:
+        self.eta_calculations += 1
+        remaining = self.remaining_time_avg(sources)
+        return NOW + timedelta(seconds=remaining) if remaining else None
+
+
+def legacy_replace_placeholders(raw: str, cfg: DeviceNotificationEntry, snap: PrinterSnapshot,
+                                companion_config: CompanionLocalConfig, additional_data: Optional[Dict[str, str]] = None) -> str:
+    '''
+    The former implementation, one str.replace per placeholder.
+    '''
+    eta = snap.calc_eta(cfg.settings.eta_sources)
+    if eta is not None:
+        eta = eta.astimezone(companion_config.timezone)
+    progress = snap.print_progress_by_fileposition_relative if snap.print_state == 'printing' else None
+    remaining_time_avg = snap.remaining_time_avg(cfg.settings.eta_sources)
+    eta_format = get_eta_format(cfg, companion_config)
+    data = {
+        'printer_name': cfg.machine_name,
+        'progress': f'{progress:.0%}' if progress is not None else None,
+        'file': snap.filename if snap.filename is not None else 'UNKNOWN',
+        'eta': eta_formatted(eta, eta_format),
+        'a_eta': adaptive_eta_formatted(eta, eta_format),
+        'remaining_avg': format_time_duration(remaining_time_avg) if remaining_time_avg else '--:--',
+        'remaining_file': format_time_duration(snap.remaining_time_by_file) if snap.remaining_time_by_file else '--:--',
+        'remaining_filament': format_time_duration(snap.remaining_time_by_filament) if snap.remaining_time_by_filament else '--:--',
+        'remaining_slicer': format_time_duration(snap.remaining_time_by_slicer) if snap.remaining_time_by_slicer else '--:--',
+        'cur_layer': snap.current_layer,
+        'max_layer': snap.max_layer,
+    }
+    for name, value in list(data.items()) + list((additional_data or {}).items()):
+        raw = raw.replace(f"${name}", str(value) if value is not None else '')
+    return raw
+
+
+def printing_snapshot(filename: str = 'benchy.gcode') -> FixedClockSnapshot:
+    snap = FixedClockSnapshot(klippy_ready=True, print_state='printing')
+    snap.virtual_sdcard = VirtualSDCard(file_position=5500, progress=0.45)
+    snap.print_stats = PrintStats(filename=filename, print_duration=1800, total_layer=120, current_layer=54,
+                                  state='printing')
+    snap.current_file = GCodeFile(filename=filename, gcode_start_byte=1000, gcode_end_byte=11000,
+                                  estimated_time=4000)
+    return snap
+
+
+def device(name: str = 'Voron', time_format: Optional[str] = '24h', eta_sources: Optional[List[str]] = None) -> DeviceNotificationEntry:
+    cfg = DeviceNotificationEntry()
+    cfg.machine_name = name
+    cfg.settings = NotificationSettings()
+    if eta_sources is not None:
+        cfg.settings.eta_sources = eta_sources
+    if time_format is None:
+        delattr(cfg, 'time_format')
+    else:
+        cfg.time_format = time_format
+    return cfg
+
+
+class TestReplacePlaceholders(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        fd, cls.config_path = tempfile.mkstemp(suffix='.conf')
+        with os.fdopen(fd, 'w') as f:
+            f.write('[general]\ntimezone: Europe/Berlin\neta_format: %%H:%%M\n')
+        cls.config = CompanionLocalConfig(cls.config_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.config_path)
+
+    def assertSameAsLegacy(self, raw, cfg, snap, additional_data=None):
+        self.assertEqual(replace_placeholders(raw, cfg, snap, self.config, additional_data),
+                         legacy_replace_placeholders(raw, cfg, snap, self.config, additional_data), raw)
+
+    def test_all_translations_match_the_legacy_replacement(self):
+        snaps = [printing_snapshot(), PrinterSnapshot(klippy_ready=True, print_state='standby')]
+        cfgs = [device(), device(time_format='12h', eta_sources=['slicer']), device(time_format=None)]
+        for translations in languages.values():
+            for raw in translations.values():
+                for snap in snaps:
+                    for cfg in cfgs:
+                        self.assertSameAsLegacy(raw, cfg, snap, {'$sensor': 'Runout'})
+
+    def test_edge_cases_match_the_legacy_replacement(self):
+        cfg = device()
+        for raw in ['', 'no placeholders', '$', '$$', 'costs $5', '$filename', '$file$file', '$$file', '$eta$a_eta',
+                    '$progress%', '$$sensor and $sensor', '$remaining_avg/$remaining_file/$remaining_slicer']:
+            self.assertSameAsLegacy(raw, cfg, printing_snapshot(), {'$sensor': 'Runout'})
+        # Values are substituted with the placeholders that come after them, as before
+        self.assertSameAsLegacy('$file: $progress', cfg, printing_snapshot(filename='print_$eta_$printer_name.gcode'))
+        self.assertSameAsLegacy('$printer_name', device(name='Printer $progress'), printing_snapshot())
+
+    def test_values_are_shared_by_devices(self):
+        snap = printing_snapshot()
+        for name in ('A', 'B', 'C'):
+            replace_placeholders('$printer_name: $eta $a_eta', device(name=name), snap, self.config)
+        self.assertEqual(snap.eta_calculations, 1)
+
+        replace_placeholders('$eta', device(eta_sources=['slicer']), snap, self.config)
+        self.assertEqual(snap.eta_calculations, 2)
+
+    def test_only_referenced_values_are_computed(self):
+        snap = printing_snapshot()
+        self.assertEqual(replace_placeholders('State of $printer_name changed', device(), snap, self.config),
+                         'State of Voron changed')
+        self.assertEqual(snap.eta_calculations, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import unittest
+
+from mobileraker.client.pending_requests import PendingRequests
+from mobileraker.util.metrics import Metrics
+
+
+class TestPendingRequests(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.metrics = Metrics('test')
+        self.pending = PendingRequests(self.loop, self.metrics, logging.getLogger('test'), tick=0.01)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_ids_are_unique_and_increasing(self):
+        ids = [self.pending.next_id() for _ in range(100)]
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertGreater(ids[0], 0)
+
+    def test_pop_resolves_entry(self):
+        async def run():
+            future = self.pending.add_future(1, 10)
+            self.assertEqual(self.metrics.get('jrpc.in_flight'), 1)
+            self.assertIs(self.pending.pop(1), future)
+            self.assertIsNone(self.pending.pop(1))
+
+        self.loop.run_until_complete(run())
+        self.assertEqual(len(self.pending), 0)
+        self.assertEqual(self.metrics.get('jrpc.in_flight'), 0)
+
+    def test_expired_requests_are_removed(self):
+        callback_calls = []
+
+        async def run():
+            future = self.pending.add_future(1, 0.02)
+            self.pending.add_callback(2, lambda msg, err: callback_calls.append(msg), 0.02)
+            with self.assertRaises(asyncio.TimeoutError):
+                await future
+            await asyncio.sleep(0.05)
+
+        self.loop.run_until_complete(run())
+        self.assertEqual(len(self.pending), 0)
+        self.assertEqual(callback_calls, [])
+        self.assertEqual(self.metrics.get('jrpc.timeouts'), 2)
+
+    def test_fail_all_fails_waiting_futures(self):
+        async def run():
+            future = self.pending.add_future(1, 10)
+            self.pending.add_callback(2, lambda msg, err: None, 10)
+            self.pending.fail_all(ConnectionError('closed'))
+            with self.assertRaises(ConnectionError):
+                await future
+
+        self.loop.run_until_complete(run())
+        self.assertEqual(len(self.pending), 0)
+        self.assertEqual(self.metrics.get('jrpc.failed'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from mobileraker.data.dtos.moonraker.printer_objects import GCodeFile, PrintStats, VirtualSDCard
+from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
+
+
+def printing_snapshot() -> PrinterSnapshot:
+    snapshot = PrinterSnapshot(klippy_ready=True, print_state='printing')
+    snapshot.print_stats = PrintStats(filename='benchy.gcode', print_duration=1800, state='printing')
+    snapshot.virtual_sdcard = VirtualSDCard(file_position=6000, progress=0.5)
+    snapshot.current_file = GCodeFile(filename='benchy.gcode', gcode_start_byte=1000, gcode_end_byte=11000,
+                                      estimated_time=4000)
+    return snapshot
+
+
+class TestPrinterSnapshot(unittest.TestCase):
+
+    def test_derived_values_are_cached(self):
+        snapshot = printing_snapshot()
+        self.assertEqual(snapshot.progress, 50)
+        self.assertEqual(snapshot.remaining_time_avg(['file', 'slicer']), 2000)
+        self.assertIn('progress', snapshot._cache)
+        self.assertIn(('_remaining_time_avg', ('file', 'slicer')), snapshot._cache)
+        # A cached value is served from the cache
+        snapshot._cache['progress'] = 42
+        self.assertEqual(snapshot.progress, 42)
+
+    def test_setting_an_attribute_drops_the_cache(self):
+        snapshot = printing_snapshot()
+        self.assertEqual(snapshot.progress, 50)
+        snapshot.virtual_sdcard = VirtualSDCard(file_position=8500, progress=0.75)
+        self.assertEqual(snapshot.progress, 75)
+
+    def test_frozen_snapshot_is_immutable(self):
+        snapshot = printing_snapshot().freeze()
+        self.assertTrue(snapshot.frozen)
+        with self.assertRaises(AttributeError):
+            snapshot.print_state = 'complete'
+        self.assertEqual(snapshot.print_state, 'printing')
+        self.assertEqual(snapshot.remaining_time_by_slicer, 2200)
+
+
+if __name__ == '__main__':
+    unittest.main()
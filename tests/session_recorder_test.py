@@ -0,0 +1,78 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from mobileraker.client.session_recorder import REDACTED, SessionRecorder, load_recording
+
+
+class TestSessionRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'printer.jsonl.gz')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_round_trip(self):
+        recorder = SessionRecorder(self.path, 'printer')
+        recorder.record('out', '{"jsonrpc":"2.0","method":"server.info","id":1}')
+        recorder.record('in', b'{"jsonrpc":"2.0","id":1,"result":{}}')
+        recorder.close()
+
+        header, frames = load_recording(self.path)
+        self.assertEqual(header['printer'], 'printer')
+        self.assertEqual([(d, raw) for _, d, raw in frames], [
+            ('out', '{"jsonrpc":"2.0","method":"server.info","id":1}'),
+            ('in', '{"jsonrpc":"2.0","id":1,"result":{}}'),
+        ])
+        self.assertLessEqual(frames[0][0], frames[1][0])
+
+    def test_truncated_recording_is_loaded(self):
+        recorder = SessionRecorder(self.path, 'printer')
+        for i in range(100):
+            recorder.record('in', '{"jsonrpc":"2.0","method":"notify_status_update","params":[{}, %i]}' % i)
+        recorder.close()
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        with open(self.path, 'wb') as f:
+            f.write(data[:len(data) - 20])
+
+        _, frames = load_recording(self.path)
+        self.assertLess(len(frames), 100)
+
+    def test_device_tokens_are_redacted(self):
+        device = {"fcmToken": "secret-fcm", "machineName": "V2", "apns": {"liveActivity": "secret-apns"}}
+        response = {"jsonrpc": "2.0", "id": 1, "result": {"namespace": "mobileraker", "key": "fcm",
+                                                          "value": {"5f4d11e8-ad41-4126-88ff-7593b68555d9": device}}}
+        recorder = SessionRecorder(self.path, 'printer')
+        recorder.record('in', json.dumps(response))
+        recorder.close()
+
+        _, frames = load_recording(self.path)
+        raw = frames[0][2]
+        self.assertNotIn('secret', raw)
+        recorded = json.loads(raw)['result']['value']['5f4d11e8-ad41-4126-88ff-7593b68555d9']
+        self.assertEqual(recorded, {"fcmToken": REDACTED, "machineName": "V2", "apns": {"liveActivity": REDACTED}})
+
+    def test_frames_are_written_by_the_writer_thread(self):
+        recorder = SessionRecorder(self.path, 'printer')
+        recorder.record('in', '{"jsonrpc":"2.0","method":"notify_status_update","params":[{}, 1]}')
+        self.assertTrue(recorder._thread.is_alive())
+        recorder.close()
+        self.assertFalse(recorder._thread.is_alive())
+        # Frames recorded after close are ignored
+        recorder.record('in', '{}')
+        self.assertEqual(len(load_recording(self.path)[1]), 1)
+
+    def test_rejects_foreign_files(self):
+        with gzip.open(self.path, 'wt') as f:
+            f.write('{"foo": 1}\n')
+        with self.assertRaises(ValueError):
+            load_recording(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
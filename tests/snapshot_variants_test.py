@@ -0,0 +1,56 @@
+import unittest
+
+from mobileraker.data.dtos.mobileraker.notification_config_dto import DeviceNotificationEntry
+from mobileraker.service.snapshot_variants import SnapshotVariantPolicy
+
+
+def images(full: int = 100, medium: int = 40, thumbnail: int = 10):
+    return {'full': 'f' * full, 'medium': 'm' * medium, 'thumbnail': 't' * thumbnail}
+
+
+def device(version):
+    cfg = DeviceNotificationEntry()
+    cfg.version = version
+    return cfg
+
+
+class TestSnapshotVariantPolicy(unittest.TestCase):
+
+    def test_variants_to_render(self):
+        self.assertEqual([v.name for v in SnapshotVariantPolicy('full', 'full').variants], ['full'])
+        self.assertEqual([v.name for v in SnapshotVariantPolicy('full', 'medium').variants], ['full', 'medium'])
+        # Everything smaller than the largest preferred variant can be needed to fit a budget
+        self.assertEqual([v.name for v in SnapshotVariantPolicy('medium', 'medium', budget=100).variants],
+                         ['medium', 'thumbnail'])
+
+    def test_preferred_by_platform(self):
+        policy = SnapshotVariantPolicy(android='full', ios='medium')
+        self.assertEqual(policy.preferred(device('2.8.0-ios')), 'medium')
+        self.assertEqual(policy.preferred(device('2.8.0-android')), 'full')
+        self.assertEqual(policy.preferred(device(None)), 'full')
+
+    def test_assign_without_budget(self):
+        result = SnapshotVariantPolicy().assign([images(), None, images()], ['full', 'full', 'medium'])
+        self.assertEqual([len(i) if i else None for i in result], [100, None, 40])
+
+    def test_budget_shrinks_the_largest_images_first(self):
+        policy = SnapshotVariantPolicy(budget=150)
+        result = policy.assign([images(), images(), images()], ['full', 'full', 'full'])
+        # 300 -> 240 -> 180 -> 120
+        self.assertEqual([len(i) for i in result], [40, 40, 40])
+
+        result = policy.assign([images(), images()], ['full', 'medium'])
+        self.assertEqual([len(i) for i in result], [100, 40])
+
+    def test_budget_drops_images_as_last_resort(self):
+        result = SnapshotVariantPolicy(budget=15).assign([images(), images()], ['full', 'full'])
+        self.assertEqual([len(i) if i else None for i in result], [None, 10])
+
+    def test_skips_variants_that_were_not_rendered(self):
+        partial = {'full': 'f' * 100, 'thumbnail': 't' * 10}
+        result = SnapshotVariantPolicy(budget=50).assign([partial], ['full'])
+        self.assertEqual(result, ['t' * 10])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+import asyncio
+import time
+import unittest
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
+
+from PIL import Image
+
+from mobileraker.client.webcam_snapshot_client import SnapshotVariant, WebcamSnapshotClient
+from mobileraker.service.webcam_manager import WebcamManager
+
+
+def jpeg(width: int = 320, height: int = 240) -> bytes:
+    buffer = BytesIO()
+    Image.new('RGB', (width, height)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def webcam(rotation: int = 0) -> Dict[str, Any]:
+    return {'name': 'cam', 'uid': 'cam-uid', 'enabled': True, 'service': 'mjpegstreamer-adaptive',
+            'stream_url': '/webcam/?action=stream', 'snapshot_url': '/webcam/?action=snapshot',
+            'rotation': rotation, 'flip_horizontal': False, 'flip_vertical': False}
+
+
+class StubStreamReader:
+    '''
+    Stands in for MjpegStreamReader, serves the configured frame without opening a connection.
+    '''
+
+    def __init__(self, uri: str, name: str) -> None:
+        self.uri: str = uri
+        self.name: str = name
+        self.frame: Optional[bytes] = None
+        self.running: bool = False
+        self.stops: int = 0
+
+    def start(self) -> None:
+        self.running = True
+
+    def stop(self) -> None:
+        self.running = False
+        self.stops += 1
+
+    def latest_frame(self, max_age: float = 2.0) -> Optional[bytes]:
+        return self.frame
+
+    def wait_for_frame(self, timeout: float, max_age: float = 2.0) -> Optional[bytes]:
+        return self.frame
+
+
+class FakeJrpc:
+    def __init__(self) -> None:
+        self.moonraker_uri: str = 'ws://printer.local/websocket'
+        self.webcam: Optional[Dict[str, Any]] = webcam()
+        self.calls: int = 0
+        self.listeners: Dict[str, Any] = {}
+
+    def register_method_listener(self, method: str, callback: Any) -> None:
+        self.listeners[method] = callback
+
+    async def send_and_receive_method(self, method: str, params: Optional[Dict[str, Any]] = None):
+        self.calls += 1
+        if self.webcam is None:
+            return None, 'Webcam not found'
+        return {'result': {'webcam': self.webcam}}, None
+
+
+class TestWebcamManager(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        patcher = patch('mobileraker.client.webcam_snapshot_client.MjpegStreamReader', StubStreamReader)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.jrpc = FakeJrpc()
+        self.manager = WebcamManager(self.jrpc, use_stream=True)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def get_client(self) -> Optional[WebcamSnapshotClient]:
+        return self.loop.run_until_complete(self.manager.get_webcam_client('cam-uid'))
+
+    def expire(self) -> None:
+        client, ts = self.manager._client_cache['cam-uid']
+        self.manager._client_cache['cam-uid'] = (client, ts - self.manager._CACHE_TTL)
+
+    def test_stream_client_is_cached(self):
+        client = self.get_client()
+        self.assertEqual(client.stream_uri, 'http://printer.local/webcam/?action=stream')
+        self.assertIsInstance(client._stream, StubStreamReader)
+        self.assertIs(self.get_client(), client)
+        self.assertEqual(self.jrpc.calls, 1)
+
+    def test_expired_client_is_reused_if_the_config_is_unchanged(self):
+        client = self.get_client()
+        client._stream.start()
+        self.expire()
+        self.assertIs(self.get_client(), client)
+        self.assertEqual(self.jrpc.calls, 2)
+        self.assertTrue(client._stream.running)
+        self.assertEqual(client._stream.stops, 0)
+
+    def test_expired_client_is_closed_if_the_config_changed(self):
+        client = self.get_client()
+        client._stream.start()
+        self.expire()
+        self.jrpc.webcam = webcam(rotation=90)
+        replacement = self.get_client()
+        self.assertIsNot(replacement, client)
+        self.assertEqual(replacement.rotation, 90)
+        self.assertFalse(client._stream.running)
+
+    def test_expired_client_is_closed_if_the_webcam_is_gone(self):
+        client = self.get_client()
+        client._stream.start()
+        self.expire()
+        self.jrpc.webcam = None
+        self.assertIsNone(self.get_client())
+        self.assertFalse(client._stream.running)
+        self.assertNotIn('cam-uid', self.manager._client_cache)
+
+    def test_stop_streams_keeps_the_clients(self):
+        client = self.get_client()
+        client._stream.start()
+        self.manager.stop_streams()
+        self.assertFalse(client._stream.running)
+        self.assertIs(self.get_client(), client)
+
+    def test_webcams_changed_notification_clears_the_cache(self):
+        client = self.get_client()
+        client._stream.start()
+        self.jrpc.listeners['notify_webcams_changed']({'jsonrpc': '2.0', 'method': 'notify_webcams_changed',
+                                                       'params': [{'webcams': []}]})
+        self.assertFalse(client._stream.running)
+        self.assertEqual(self.manager._client_cache, {})
+        self.assertIsNot(self.get_client(), client)
+
+
+class TestWebcamSnapshotClientStream(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        patcher = patch('mobileraker.client.webcam_snapshot_client.MjpegStreamReader', StubStreamReader)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = WebcamSnapshotClient('http://printer.local/snapshot', stream_uri='http://printer.local/stream')
+        self.fetched: List[float] = []
+
+    def tearDown(self):
+        self.loop.close()
+        WebcamSnapshotClient.close_shared()
+
+    def capture(self) -> Dict[str, bytes]:
+        def fetch(timeout: float) -> Optional[bytes]:
+            self.fetched.append(timeout)
+            return jpeg()
+
+        with patch.object(self.client, '_fetch', side_effect=fetch):
+            return self.loop.run_until_complete(
+                self.client.capture_variants([SnapshotVariant('snapshot', 1024, 85)], timeout=1))
+
+    def test_captures_from_the_stream(self):
+        frame = jpeg()
+        self.client._stream.frame = frame
+        images = self.capture()
+        self.assertTrue(self.client._stream.running)
+        # The frame fits, it is passed through without a snapshot request
+        self.assertIs(images['snapshot'], frame)
+        self.assertEqual(self.fetched, [])
+
+    def test_falls_back_to_the_snapshot_without_a_frame(self):
+        started = time.monotonic()
+        images = self.capture()
+        self.assertIn('snapshot', images)
+        self.assertEqual(len(self.fetched), 1)
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_stop_stream(self):
+        self.client._stream.frame = jpeg()
+        self.capture()
+        self.client.stop_stream()
+        self.assertFalse(self.client._stream.running)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from mobileraker.data.dtos.moonraker.printer_objects import VirtualSDCard
+from mobileraker.data.dtos.moonraker.printer_snapshot import PrinterSnapshot
+from mobileraker.service.webcam_prefetch import NotificationPredictor
+
+
+def printing(progress: float) -> PrinterSnapshot:
+    snapshot = PrinterSnapshot(klippy_ready=True, print_state='printing')
+    snapshot.virtual_sdcard = VirtualSDCard(progress=progress)
+    return snapshot
+
+
+class TestNotificationPredictor(unittest.TestCase):
+
+    def setUp(self):
+        self.predictor = NotificationPredictor(increments=5, interval=600, lead=10)
+
+    def observe(self, samples):
+        for now, progress in samples:
+            self.predictor.observe(printing(progress), now)
+
+    def test_predicts_the_next_increment(self):
+        last = printing(0.10)
+        # 0.1% per second, the 15% boundary is 10 seconds away
+        self.observe([(0, 0.13), (10, 0.14)])
+        self.assertAlmostEqual(self.predictor.rate, 0.1)
+        self.assertTrue(self.predictor.notification_expected(last, printing(0.14)))
+
+    def test_no_prediction_if_the_boundary_is_far_away(self):
+        last = printing(0.10)
+        self.observe([(0, 0.10), (10, 0.11)])
+        self.assertFalse(self.predictor.notification_expected(last, printing(0.11)))
+
+    def test_no_prediction_without_a_printing_speed(self):
+        last = printing(0.10)
+        self.observe([(0, 0.149)])
+        self.assertIsNone(self.predictor.rate)
+        self.assertFalse(self.predictor.notification_expected(last, printing(0.149)))
+
+    def test_samples_reset_when_a_new_print_starts(self):
+        self.observe([(0, 0.80), (10, 0.90), (20, 0.01)])
+        self.assertIsNone(self.predictor.rate)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from io import BytesIO
+
+from PIL import Image
+
+from mobileraker.client.webcam_snapshot_client import SnapshotVariant, WebcamSnapshotClient
+
+
+def jpeg(width: int, height: int) -> bytes:
+    # Red top left quadrant on a black frame, to check the orientation
+    image = Image.new('RGB', (width, height))
+    image.paste((255, 0, 0), (0, 0, width // 2, height // 2))
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def red_corner(content: bytes) -> str:
+    image = Image.open(BytesIO(content)).convert('RGB')
+    w, h = image.size
+    corners = {'top_left': (w // 4, h // 4), 'top_right': (3 * w // 4, h // 4),
+               'bottom_left': (w // 4, 3 * h // 4), 'bottom_right': (3 * w // 4, 3 * h // 4)}
+    return next(name for name, xy in corners.items() if image.getpixel(xy)[0] > 128)
+
+
+class TestWebcamSnapshotClientProcessing(unittest.TestCase):
+
+    def client(self, rotation: int = 0, flip_horizontal: bool = False, flip_vertical: bool = False):
+        client = WebcamSnapshotClient('http://localhost/snapshot', rotation=rotation)
+        client.flip_horizontal = flip_horizontal
+        client.flip_vertical = flip_vertical
+        return client
+
+    def test_passes_fitting_jpeg_through(self):
+        content = jpeg(640, 480)
+        self.assertIs(self.client()._process(content, 1024, 85), content)
+
+    def test_scales_down_to_max_width(self):
+        result = self.client()._process(jpeg(2592, 1944), 1024, 85)
+        self.assertEqual(Image.open(BytesIO(result)).size, (1024, 768))
+
+    def test_right_angle_rotations_are_clockwise_and_not_cropped(self):
+        content = jpeg(640, 480)
+        expected = {90: ((480, 640), 'top_right'), 180: ((640, 480), 'bottom_right'), 270: ((480, 640), 'bottom_left')}
+        for rotation, (size, corner) in expected.items():
+            result = self.client(rotation=rotation)._process(content, 1024, 85)
+            self.assertEqual(Image.open(BytesIO(result)).size, size, rotation)
+            self.assertEqual(red_corner(result), corner, rotation)
+
+    def test_rotation_keeps_the_pixel_budget(self):
+        result = self.client(rotation=90)._process(jpeg(2048, 1536), 1024, 85)
+        self.assertEqual(Image.open(BytesIO(result)).size, (768, 1024))
+
+    def test_flips_before_rotation(self):
+        content = jpeg(640, 480)
+        self.assertEqual(red_corner(self.client(flip_horizontal=True)._process(content, 1024, 85)), 'top_right')
+        self.assertEqual(red_corner(self.client(flip_vertical=True)._process(content, 1024, 85)), 'bottom_left')
+        # Mirrored to the top right, then rotated clockwise to the bottom right
+        self.assertEqual(red_corner(self.client(rotation=90, flip_horizontal=True)._process(content, 1024, 85)),
+                         'bottom_right')
+
+    def test_renders_all_variants_from_one_frame(self):
+        variants = [SnapshotVariant('small', 320, 60), SnapshotVariant('full', 1024, 85)]
+        result = self.client(rotation=90)._process_variants(jpeg(2048, 1536), variants)
+        self.assertEqual(Image.open(BytesIO(result['full'])).size, (768, 1024))
+        self.assertEqual(Image.open(BytesIO(result['small'])).size, (240, 320))
+        self.assertEqual(red_corner(result['small']), 'top_right')
+
+    def test_passes_fitting_variants_through(self):
+        content = jpeg(640, 480)
+        result = self.client()._process_variants(
+            content, [SnapshotVariant('full', 1024, 85), SnapshotVariant('small', 320, 60)])
+        self.assertIs(result['full'], content)
+        self.assertEqual(Image.open(BytesIO(result['small'])).size, (320, 240))
+
+    def test_invalid_image(self):
+        self.assertIsNone(self.client()._process(b'no image', 1024, 85))
+
+
+class TestWebcamSnapshotClientSharedResources(unittest.TestCase):
+
+    def tearDown(self):
+        WebcamSnapshotClient.close_shared()
+
+    def test_pools_are_created_lazily_and_released_on_close(self):
+        WebcamSnapshotClient.close_shared()
+        self.assertIsNone(WebcamSnapshotClient._shared_fetch_executor)
+        self.assertIsNone(WebcamSnapshotClient._shared_session)
+
+        client = WebcamSnapshotClient('http://localhost/snapshot')
+        pool = client._fetch_pool()
+        self.assertIs(client._fetch_pool(), pool)
+        self.assertIs(WebcamSnapshotClient('http://localhost/other')._fetch_pool(), pool)
+
+        WebcamSnapshotClient.close_shared()
+        self.assertIsNone(WebcamSnapshotClient._shared_fetch_executor)
+        with self.assertRaises(RuntimeError):
+            pool.submit(print)
+        self.assertIsNot(client._fetch_pool(), pool)
+
+
+if __name__ == '__main__':
+    unittest.main()